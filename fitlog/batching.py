@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Background batch writer: coalesces small writes into bulk storage writes
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .metrics import metrics
+from .pipeline import DEFAULT_BATCH_SIZE
+from .storage import Record, StorageBackend
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Longest time a record waits for its batch to fill
+DEFAULT_MAX_DELAY = 1.0
+
+# Records held before add() refuses more (backpressure)
+DEFAULT_MAX_PENDING = 20 * DEFAULT_BATCH_SIZE
+
+
+class BatchWriter:
+    """Buffers prepared records and writes them from a single thread
+
+    A batch is written when it reaches `max_points` records or when its oldest
+    record has waited `max_delay` seconds, whichever comes first. The time from
+    add() to the end of the storage write is recorded as ingest_latency_seconds.
+    """
+
+    def __init__(
+        self,
+        writer: StorageBackend,
+        max_points: int = DEFAULT_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        self.writer = writer
+        self.max_points = max_points
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self.written = 0
+        self.failed = 0
+
+        self._cond = threading.Condition()
+        self._records: List[Record] = []
+        self._quarantined: List[Record] = []
+        # Enqueue time of each add() call in the current batch
+        self._arrivals: List[float] = []
+        self._closed = False
+
+        self._thread = threading.Thread(
+            target=self._run, name="fitlog-batch-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Records waiting to be written"""
+        with self._cond:
+            return len(self._records) + len(self._quarantined)
+
+    def add(
+        self, records: List[Record], quarantined: Optional[List[Record]] = None
+    ) -> bool:
+        """Queue records for writing; False if the buffer is full or closed"""
+        quarantined = quarantined or []
+        count = len(records) + len(quarantined)
+        if not count:
+            return True
+
+        with self._cond:
+            pending = len(self._records) + len(self._quarantined)
+            if self._closed or pending + count > self.max_pending:
+                return False
+
+            self._records.extend(records)
+            self._quarantined.extend(quarantined)
+            self._arrivals.append(time.perf_counter())
+            if pending + count >= self.max_points or pending == 0:
+                # Wake the writer to flush a full batch or start a delay timer
+                self._cond.notify()
+        return True
+
+    def _take_batch(self) -> Tuple[List[Record], List[Record], List[float]]:
+        records, self._records = self._records, []
+        quarantined, self._quarantined = self._quarantined, []
+        arrivals, self._arrivals = self._arrivals, []
+        return records, quarantined, arrivals
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    pending = len(self._records) + len(self._quarantined)
+                    if self._closed or pending >= self.max_points:
+                        break
+                    if not pending:
+                        self._cond.wait()
+                        continue
+                    remaining = self.max_delay - (
+                        time.perf_counter() - self._arrivals[0]
+                    )
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                if self._closed and not pending:
+                    return
+                batch = self._take_batch()
+
+            self._write(*batch)
+
+    def _write(
+        self, records: List[Record], quarantined: List[Record], arrivals: List[float]
+    ) -> None:
+        try:
+            self.written += self.writer.write_prepared(records, quarantined)
+        except Exception as e:
+            # The error is logged and counted by write_prepared
+            self.failed += len(records)
+            logger.error(f"Dropped batch of {len(records)} records: {e}")
+            return
+
+        done = time.perf_counter()
+        for enqueued in arrivals:
+            metrics.observe("ingest_latency_seconds", done - enqueued)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Flush what is buffered and stop; False if the flush did not finish"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
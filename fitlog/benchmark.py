@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the fetch, transform and write paths
+Runs without Google Fit credentials or a running InfluxDB
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import click
+
+from .fetch import DATA_SOURCES, GoogleFitClient
+from .influx_writer import InfluxWriter
+from .mock_data import MockDataGenerator
+from .sqlite_writer import SQLiteWriter
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE_PATH = "benchmarks/baseline.json"
+DEFAULT_THRESHOLD = 0.2
+
+# Number of points per canned Google Fit response (before scaling)
+CANNED_RESPONSE_SIZES = {
+    "steps": 5000,
+    "calories": 5000,
+    "weight": 500,
+    "heart_rate": 20000,
+    "sleep": 2000,
+}
+
+MOCK_DAYS = [1, 30, 365]
+
+
+def make_fit_response(data_type: str, count: int, start_ns: int = 0) -> Dict:
+    """Build a canned Google Fit datasets.get response"""
+    interval_ns = 60 * 1000000000
+    points = []
+    for i in range(count):
+        start = start_ns + i * interval_ns
+        if data_type == "sleep":
+            value = {"intVal": 4 + i % 3}
+        elif data_type == "steps":
+            value = {"intVal": i % 500}
+        else:
+            value = {"fpVal": 60.0 + (i % 40) * 0.5}
+        points.append(
+            {
+                "startTimeNanos": str(start),
+                "endTimeNanos": str(start + interval_ns),
+                "dataTypeName": DATA_SOURCES[data_type].split(":")[1],
+                "value": [value],
+            }
+        )
+    return {"dataSourceId": DATA_SOURCES[data_type], "point": points}
+
+
+class CannedFitService:
+    """Stand-in for the Google Fit discovery service returning canned responses"""
+
+    def __init__(self, responses: Dict[str, Dict]):
+        self.responses = responses
+        self.calls = 0
+        self._data_source = None
+
+    def users(self):
+        return self
+
+    def dataSources(self):
+        return self
+
+    def datasets(self):
+        return self
+
+    def get(self, userId: str, dataSourceId: str, datasetId: str):
+        self._data_source = dataSourceId
+        return self
+
+    def execute(self) -> Dict:
+        self.calls += 1
+        return self.responses.get(self._data_source, {})
+
+
+class NullWriteApi:
+    """Write API that discards records after they have been built"""
+
+    def __init__(self):
+        self.records = 0
+
+    def write(self, bucket: str, record, **kwargs) -> None:
+        self.records += len(record)
+
+
+class FakeInfluxServer:
+    """Local HTTP sink that accepts InfluxDB v2 write requests"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.bytes_received = 0
+        self.lines_received = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_received += len(body)
+                    server.lines_received += body.count(b"\n") + 1
+                self.send_response(204)
+                self.end_headers()
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"status": "pass"}')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeInfluxServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _parse_case(data_type: str, count: int) -> Callable[[], int]:
+    """Benchmark parsing a canned response through a fetch_* method"""
+    client = GoogleFitClient()
+    client.service = CannedFitService(
+        {DATA_SOURCES[data_type]: make_fit_response(data_type, count)}
+    )
+    fetcher = getattr(client, f"fetch_{data_type}")
+    return lambda: len(fetcher(0, 1))
+
+
+def _build_points_case(data: List[Dict]) -> Callable[[], int]:
+    """Benchmark write_health_data point construction with a discarding sink"""
+    writer = InfluxWriter(token="benchmark")
+    writer.write_api = NullWriteApi()
+    return lambda: writer.write_health_data(data)
+
+
+def _mock_case(days: int) -> Callable[[], int]:
+    """Benchmark mock data generation"""
+    generator = MockDataGenerator()
+
+    def run() -> int:
+        all_data = generator.generate_all_mock_data(days)
+        return sum(len(data) for data in all_data.values())
+
+    return run
+
+
+def _http_write_case(url: str, all_data: Dict[str, List[Dict]]) -> Callable[[], int]:
+    """Benchmark writes through the InfluxDB client to a local HTTP sink"""
+    writer = InfluxWriter(url=url, token="benchmark")
+
+    def run() -> int:
+        return sum(writer.write_health_data(data) for data in all_data.values())
+
+    return run
+
+
+def _sqlite_write_case(path: str, all_data: Dict[str, List[Dict]]) -> Callable[[], int]:
+    """Benchmark bulk writes to the embedded SQLite backend"""
+    writer = SQLiteWriter(path)
+
+    def run() -> int:
+        return sum(writer.write_health_data(data) for data in all_data.values())
+
+    return run
+
+
+def build_cases(
+    scale: float, sink_url: str, work_dir: str
+) -> Dict[str, Callable[[], int]]:
+    """Build all benchmark cases; setup cost is paid here, not in the timings"""
+    random.seed(0)
+    cases = {}
+
+    for data_type, size in CANNED_RESPONSE_SIZES.items():
+        cases[f"parse_{data_type}"] = _parse_case(data_type, max(1, int(size * scale)))
+
+    mock_data = MockDataGenerator().generate_all_mock_data(max(1, int(30 * scale)))
+    flat_data = [item for data in mock_data.values() for item in data]
+    cases["build_points"] = _build_points_case(flat_data)
+
+    for days in MOCK_DAYS:
+        cases[f"mock_{days}d"] = _mock_case(days)
+
+    cases["write_http"] = _http_write_case(sink_url, mock_data)
+    cases["write_sqlite"] = _sqlite_write_case(
+        os.path.join(work_dir, "benchmark.db"), mock_data
+    )
+
+    return cases
+
+
+def measure(func: Callable[[], int], repeat: int = 3) -> Dict:
+    """Measure throughput (best of `repeat`) and peak traced memory of a case"""
+    best = None
+    points = 0
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        points = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Memory is traced in a separate run so tracing overhead doesn't skew timings
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "points": points,
+        "seconds": best,
+        "points_per_sec": points / best if best else 0.0,
+        "peak_kib": peak / 1024,
+    }
+
+
+def compare_results(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """Return descriptions of results that regressed beyond the threshold"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+
+        if result["points_per_sec"] < base["points_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {result['points_per_sec']:.0f} points/s "
+                f"< baseline {base['points_per_sec']:.0f} points/s"
+            )
+
+        if result["peak_kib"] > base["peak_kib"] * (1 + threshold):
+            regressions.append(
+                f"{name}: peak memory {result['peak_kib']:.0f} KiB "
+                f"> baseline {base['peak_kib']:.0f} KiB"
+            )
+
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Dict]:
+    """Load baseline results, returning an empty dict if none were saved"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path: str, results: Dict[str, Dict]) -> None:
+    """Save benchmark results as JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def run_suite(
+    patterns: Optional[List[str]] = None, repeat: int = 3, scale: float = 1.0
+) -> Dict[str, Dict]:
+    """Run all benchmark cases matching any of the patterns"""
+    results = {}
+    with FakeInfluxServer() as sink, tempfile.TemporaryDirectory() as work_dir:
+        cases = build_cases(scale, sink.url, work_dir)
+        for name, func in cases.items():
+            if patterns and not any(pattern in name for pattern in patterns):
+                continue
+            results[name] = measure(func, repeat)
+            logger.info(
+                f"{name}: {results[name]['points_per_sec']:.0f} points/s, "
+                f"peak {results[name]['peak_kib']:.0f} KiB"
+            )
+    return results
+
+
+@click.command()
+@click.option(
+    "--case", "patterns", multiple=True, help="Only run cases containing this text"
+)
+@click.option("--repeat", default=3, help="Timed repetitions per case (best is kept)")
+@click.option("--scale", default=1.0, help="Multiplier for canned workload sizes")
+@click.option(
+    "--baseline",
+    default=DEFAULT_BASELINE_PATH,
+    help="Baseline results file to compare against",
+)
+@click.option("--save-baseline", is_flag=True, help="Save results as the new baseline")
+@click.option(
+    "--threshold",
+    default=DEFAULT_THRESHOLD,
+    help="Allowed regression ratio before failing (0.2 = 20%)",
+)
+@click.option("--output", default=None, help="Also write results to this JSON file")
+def main(
+    patterns: tuple,
+    repeat: int,
+    scale: float,
+    baseline: str,
+    save_baseline: bool,
+    threshold: float,
+    output: Optional[str],
+):
+    """Benchmark fetch parsing, point construction, mock generation and writes"""
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    # Keep per-day generator and per-write logging out of the measurements
+    logging.getLogger("fitlog").setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    results = run_suite(list(patterns), repeat, scale)
+
+    print(f"{'case':<20} {'points':>10} {'points/s':>14} {'peak KiB':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<20} {result['points']:>10} "
+            f"{result['points_per_sec']:>14.0f} {result['peak_kib']:>10.0f}"
+        )
+
+    if output:
+        save_results(output, results)
+
+    if save_baseline:
+        merged = load_baseline(baseline)
+        merged.update(results)
+        save_results(baseline, merged)
+        logger.info(f"Baseline saved to {baseline}")
+        return
+
+    regressions = compare_results(results, load_baseline(baseline), threshold)
+    if regressions:
+        for regression in regressions:
+            logger.error(f"Regression: {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
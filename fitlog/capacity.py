@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""
+Capacity model: project storage, write load, API use and run time for a
+sampling configuration, and check them against a Raspberry Pi-class host
+"""
+
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional
+
+import click
+from dotenv import load_dotenv
+
+from .benchmark import CannedFitService, FakeInfluxServer, make_fit_response
+from .fetch import DATA_SOURCES, GoogleFitClient
+from .influx_writer import InfluxWriter
+from .metrics import metrics
+from .pipeline import DEFAULT_BATCH_SIZE
+from .retention import RetentionPolicy, Tier, rollup_measurement
+from .sqlite_writer import SQLiteWriter
+from .storage import STORAGE_BACKENDS, Record, build_records
+from .timeutil import NANOS_PER_SECOND, parse_duration
+from .validation import VALIDATION_RULES
+
+# Load environment variables
+load_dotenv()
+
+# Log configuration
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Points per user per day for a typical smartwatch wearer; override with --rate
+DEFAULT_POINTS_PER_DAY = {
+    "steps": 600,
+    "calories": 600,
+    "weight": 1,
+    "heart_rate": 1440,
+    "sleep": 30,
+}
+
+# The cron job in scripts/setup_cron.sh runs once a day
+DEFAULT_INTERVAL = "1d"
+
+DEFAULT_HORIZON = "365d"
+
+DEFAULT_CALIBRATION_POINTS = 20000
+
+# Assumed round trip of one Google Fit datasets.get request
+DEFAULT_API_LATENCY = 0.3
+
+# Assumed daily request quota; check the Fitness API quota page of the project
+DEFAULT_API_QUOTA_PER_DAY = 86400
+
+GB = 1024**3
+MB = 1024**2
+
+
+class HostLimits(NamedTuple):
+    """Resources of the target host and the share fitlog may use"""
+
+    disk_bytes: int = 32 * GB
+    ram_bytes: int = 1 * GB
+    # The database needs most of the SD card and RAM
+    disk_budget: float = 0.5
+    ram_budget: float = 0.25
+    # A run should finish well before the next cron tick
+    tick_budget: float = 0.5
+    api_quota_per_day: int = DEFAULT_API_QUOTA_PER_DAY
+    quota_budget: float = 0.8
+
+
+# Raspberry Pi 3/4 with a 32 GB SD card running InfluxDB and Grafana
+PI_LIMITS = HostLimits()
+
+
+def sample_items(
+    measurement: str, count: int, start_ns: int = 0, seed: int = 0
+) -> List[Dict]:
+    """Plausible health data items one minute apart, for sizing and calibration"""
+    rng = random.Random(seed)
+    rule = VALIDATION_RULES[measurement]
+    items = []
+    value = (rule.min_value + rule.max_value) / 4
+    for i in range(count):
+        if measurement == "steps":
+            value = rng.randint(0, 200)
+        elif measurement == "sleep":
+            value = rng.randint(300, 3600)
+        elif rule.max_change is not None:
+            value = min(
+                rule.max_value,
+                max(rule.min_value, value + rng.uniform(-1, 1) * rule.max_change / 10),
+            )
+        else:
+            value = round(rng.uniform(0, rule.max_value / 100), 2)
+
+        item = {
+            "measurement": measurement,
+            "value": value,
+            "timestamp_ns": start_ns + i * 60 * NANOS_PER_SECOND,
+        }
+        if measurement == "sleep":
+            item["sleep_type"] = rng.choice([4, 5, 6])
+        items.append(item)
+    return items
+
+
+def line_sizes(
+    measurements: List[str],
+    policy: Optional[RetentionPolicy] = None,
+    sample: int = 1000,
+) -> Dict[str, float]:
+    """Mean line protocol bytes per point, including rollup measurements"""
+    sizes = {}
+    for measurement in measurements:
+        records, _ = build_records(sample_items(measurement, sample))
+        lines = [InfluxWriter.record_to_line(record) for record in records]
+        # +1 for the newline between lines
+        sizes[measurement] = sum(len(line) + 1 for line in lines) / len(lines)
+
+        if policy is None or measurement not in policy.measurements:
+            continue
+        for tier in policy.rollup_tiers:
+            target = rollup_measurement(measurement, tier)
+            record = Record(
+                target,
+                1700000000 * NANOS_PER_SECOND,
+                records[0].tags,
+                {"min": 61.0, "mean": 72.4, "max": 88.0, "count": 60},
+            )
+            sizes[target] = len(InfluxWriter.record_to_line(record)) + 1
+    return sizes
+
+
+def fields_per_point(measurement: str) -> int:
+    """Stored fields per point (SQLite keeps one row per field)"""
+    return 4 if measurement == "sleep" else 1
+
+
+def calibrate(storage: str, points: int = DEFAULT_CALIBRATION_POINTS) -> Dict:
+    """Measure write throughput against a local stand-in for the backend
+
+    InfluxDB is replaced by a local HTTP sink, so the result covers building,
+    validating and serializing points and the HTTP round trips, not the
+    database's own ingest cost. SQLite writes to a temporary file, which also
+    gives the on-disk size per stored field.
+    """
+    measurements = list(DEFAULT_POINTS_PER_DAY)
+    per_measurement = max(1, points // len(measurements))
+    data = {m: sample_items(m, per_measurement) for m in measurements}
+    total = sum(len(items) for items in data.values())
+
+    def write_all(writer) -> float:
+        started = time.perf_counter()
+        for items in data.values():
+            for start in range(0, len(items), DEFAULT_BATCH_SIZE):
+                writer.write_health_data(items[start : start + DEFAULT_BATCH_SIZE])
+        return time.perf_counter() - started
+
+    result: Dict = {"storage": storage, "points": total}
+    if storage == "sqlite":
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "calibration.db")
+            with SQLiteWriter(path) as writer:
+                seconds = write_all(writer)
+                writer.checkpoint()
+            rows = sum(len(items) * fields_per_point(m) for m, items in data.items())
+            result["disk_bytes_per_field"] = os.path.getsize(path) / rows
+    else:
+        with FakeInfluxServer() as sink:
+            with InfluxWriter(url=sink.url, token="calibration") as writer:
+                seconds = write_all(writer)
+
+    result["seconds"] = seconds
+    result["points_per_second"] = total / seconds if seconds else 0.0
+    return result
+
+
+def measure_fetch(points_per_tick: Dict[str, int]) -> Dict:
+    """API calls, parse time and peak memory of one fetch_all_data run
+
+    Google Fit is replaced by canned responses of the given sizes, so the time
+    is parsing and point building only; network latency is added by the
+    projection.
+    """
+    client = GoogleFitClient()
+    ranges = dict.fromkeys(points_per_tick, (0, 1))
+
+    def run() -> int:
+        client.service = CannedFitService(
+            {
+                DATA_SOURCES[measurement]: make_fit_response(measurement, count)
+                for measurement, count in points_per_tick.items()
+            }
+        )
+        all_data = client.fetch_all_data(ranges=ranges)
+        records, _ = build_records(
+            [item for items in all_data.values() for item in items]
+        )
+        return len(records)
+
+    # Timed without tracemalloc, which slows allocation-heavy code down
+    run()
+    started = time.perf_counter()
+    points = run()
+    seconds = time.perf_counter() - started
+
+    # Responses are built while tracing: a real run holds them decoded too
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "api_calls": client.service.calls,
+        "parse_seconds": seconds,
+        "peak_memory_bytes": peak_bytes,
+        "points": points,
+    }
+
+
+def tier_points_per_day(points_per_day: float, tier: Tier) -> float:
+    """Points per day in a tier: raw points, or at most one per rollup window"""
+    if not tier.window_seconds:
+        return points_per_day
+    return min(points_per_day, 86400 / tier.window_seconds)
+
+
+def project(
+    points_per_day: Dict[str, float],
+    interval_seconds: int,
+    users: int,
+    horizon_days: float,
+    sizes: Dict[str, float],
+    calibration: Dict,
+    fetch: Dict,
+    policy: Optional[RetentionPolicy] = None,
+    api_latency: float = DEFAULT_API_LATENCY,
+    cpu_factor: float = 1.0,
+) -> Dict:
+    """Project storage, write load, API use and run time for all users
+
+    Storage counts what is kept after `horizon_days`, honouring each tier's
+    retention. For InfluxDB it uses uncompressed line protocol size, an upper
+    bound on what the storage engine keeps; for SQLite the calibrated bytes
+    per stored field.
+    """
+    ticks_per_day = 86400 / interval_seconds
+    disk_bytes_per_field = calibration.get("disk_bytes_per_field")
+
+    rows = []
+    for measurement, per_day in points_per_day.items():
+        if policy is not None and measurement in policy.measurements:
+            tiers = policy.tiers
+        else:
+            tiers = [Tier("raw", 0, None)]
+
+        for tier in tiers:
+            target = rollup_measurement(measurement, tier)
+            tier_per_day = tier_points_per_day(per_day, tier) * users
+            kept_days = horizon_days
+            if tier.retention_seconds is not None:
+                kept_days = min(horizon_days, tier.retention_seconds / 86400)
+
+            if disk_bytes_per_field is not None:
+                fields = 4 if tier.window_seconds else fields_per_point(measurement)
+                bytes_per_point = disk_bytes_per_field * fields
+            else:
+                bytes_per_point = sizes[target]
+
+            rows.append(
+                {
+                    "measurement": target,
+                    "points_per_day": tier_per_day,
+                    "bytes_per_point": bytes_per_point,
+                    "bytes_per_day": tier_per_day * bytes_per_point,
+                    "stored_bytes": tier_per_day * kept_days * bytes_per_point,
+                }
+            )
+
+    points_per_tick = sum(points_per_day.values()) / ticks_per_day * users
+    throughput = calibration["points_per_second"] / cpu_factor
+    fetch_seconds = (
+        fetch["api_calls"] * api_latency + fetch["parse_seconds"] * cpu_factor
+    )
+    write_seconds = points_per_tick / throughput if throughput else 0.0
+
+    return {
+        "users": users,
+        "interval_seconds": interval_seconds,
+        "horizon_days": horizon_days,
+        "measurements": rows,
+        "stored_bytes": sum(row["stored_bytes"] for row in rows),
+        "bytes_per_day": sum(row["bytes_per_day"] for row in rows),
+        "points_per_tick": points_per_tick,
+        "write_points_per_second": points_per_tick * ticks_per_day / 86400,
+        "api_calls_per_tick": fetch["api_calls"] * users,
+        "api_calls_per_day": fetch["api_calls"] * users * ticks_per_day,
+        # Users are fetched one after another within a tick
+        "run_seconds": fetch_seconds * users + write_seconds,
+        "peak_memory_bytes": fetch["peak_memory_bytes"],
+    }
+
+
+def check_limits(projection: Dict, limits: HostLimits = PI_LIMITS) -> List[Dict]:
+    """Compare a projection with the host limits; one row per resource"""
+    checks = [
+        (
+            "storage",
+            projection["stored_bytes"],
+            limits.disk_bytes * limits.disk_budget,
+        ),
+        (
+            "memory per run",
+            projection["peak_memory_bytes"],
+            limits.ram_bytes * limits.ram_budget,
+        ),
+        (
+            "run time per tick",
+            projection["run_seconds"],
+            projection["interval_seconds"] * limits.tick_budget,
+        ),
+        (
+            "API calls per day",
+            projection["api_calls_per_day"],
+            limits.api_quota_per_day * limits.quota_budget,
+        ),
+    ]
+    return [
+        {"resource": name, "value": value, "limit": limit, "ok": value <= limit}
+        for name, value, limit in checks
+    ]
+
+
+def format_bytes(size: float) -> str:
+    """Human readable byte count"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def parse_rates(rates: tuple) -> Dict[str, float]:
+    """Parse measurement=points_per_day overrides"""
+    parsed = {}
+    for rate in rates:
+        measurement, _, value = rate.partition("=")
+        if measurement not in DEFAULT_POINTS_PER_DAY or not value:
+            raise click.BadParameter(
+                f"{rate!r} (expected measurement=points_per_day, measurement one "
+                f"of {', '.join(DEFAULT_POINTS_PER_DAY)})",
+                param_hint="--rate",
+            )
+        parsed[measurement] = float(value)
+    return parsed
+
+
+@click.command()
+@click.option(
+    "--measurement",
+    "-m",
+    "measurements",
+    multiple=True,
+    type=click.Choice(list(DEFAULT_POINTS_PER_DAY)),
+    help="Measurements collected (default: all)",
+)
+@click.option(
+    "--rate",
+    multiple=True,
+    help="Points per user per day, e.g. heart_rate=86400 for 1 Hz (repeatable)",
+)
+@click.option("--interval", default=DEFAULT_INTERVAL, help="Fetch interval (cron tick)")
+@click.option("--users", default=1, help="Number of users fetched per tick")
+@click.option("--horizon", default=DEFAULT_HORIZON, help="Storage projection period")
+@click.option(
+    "--storage",
+    envvar="FITLOG_STORAGE",
+    type=click.Choice(STORAGE_BACKENDS),
+    default="influxdb",
+    help="Storage backend to model",
+)
+@click.option(
+    "--calibration-points",
+    default=DEFAULT_CALIBRATION_POINTS,
+    help="Points written in the calibration run",
+)
+@click.option(
+    "--cpu-factor",
+    default=1.0,
+    help="How much slower the target host is than this one (e.g. 4 on a laptop)",
+)
+@click.option(
+    "--api-latency",
+    default=DEFAULT_API_LATENCY,
+    help="Seconds per Google Fit request",
+)
+@click.option(
+    "--api-quota",
+    default=DEFAULT_API_QUOTA_PER_DAY,
+    help="Google Fit requests allowed per day",
+)
+@click.option("--disk-gb", default=32.0, help="Target host disk (SD card) size")
+@click.option("--ram-mb", default=1024, help="Target host memory")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+def main(
+    measurements: tuple,
+    rate: tuple,
+    interval: str,
+    users: int,
+    horizon: str,
+    storage: str,
+    calibration_points: int,
+    cpu_factor: float,
+    api_latency: float,
+    api_quota: int,
+    disk_gb: float,
+    ram_mb: int,
+    as_json: bool,
+):
+    """Project storage, write load, API quota and run time for a configuration"""
+    try:
+        interval_seconds = parse_duration(interval)
+        horizon_days = parse_duration(horizon) / 86400
+    except ValueError as e:
+        raise click.UsageError(str(e)) from None
+
+    rates = {**DEFAULT_POINTS_PER_DAY, **parse_rates(rate)}
+    points_per_day = {m: rates[m] for m in measurements or DEFAULT_POINTS_PER_DAY}
+    ticks_per_day = 86400 / interval_seconds
+    points_per_tick = {
+        m: max(1, round(per_day / ticks_per_day))
+        for m, per_day in points_per_day.items()
+    }
+    policy = RetentionPolicy.from_env()
+    limits = HostLimits(
+        disk_bytes=int(disk_gb * GB),
+        ram_bytes=ram_mb * MB,
+        api_quota_per_day=api_quota,
+    )
+
+    # Calibration runs must not pollute the run metrics of the report
+    sizes = line_sizes(list(points_per_day), policy)
+    calibration = calibrate(storage, calibration_points)
+    fetch = measure_fetch(points_per_tick)
+    metrics.reset()
+
+    projection = project(
+        points_per_day,
+        interval_seconds,
+        users,
+        horizon_days,
+        sizes,
+        calibration,
+        fetch,
+        policy,
+        api_latency,
+        cpu_factor,
+    )
+    checks = check_limits(projection, limits)
+
+    if as_json:
+        print(
+            json.dumps(
+                {
+                    "calibration": calibration,
+                    "fetch": fetch,
+                    "projection": projection,
+                    "checks": checks,
+                },
+                indent=2,
+            )
+        )
+        return
+
+    print(
+        f"{users} user(s), fetch every {interval}, {storage}, "
+        f"calibrated at {calibration['points_per_second']:.0f} points/s"
+    )
+    print()
+    print(
+        f"{'measurement':<16} {'points/day':>12} {'bytes/point':>12} "
+        f"{'per day':>12} {'stored':>12}"
+    )
+    for row in projection["measurements"]:
+        print(
+            f"{row['measurement']:<16} {row['points_per_day']:>12.0f} "
+            f"{row['bytes_per_point']:>12.1f} "
+            f"{format_bytes(row['bytes_per_day']):>12} "
+            f"{format_bytes(row['stored_bytes']):>12}"
+        )
+    print()
+    print(
+        f"Storage after {horizon}: {format_bytes(projection['stored_bytes'])} "
+        f"(+{format_bytes(projection['bytes_per_day'])}/day)"
+    )
+    print(
+        f"Write load: {projection['points_per_tick']:.0f} points per tick, "
+        f"{projection['write_points_per_second']:.2f} points/s sustained"
+    )
+    print(
+        f"API: {projection['api_calls_per_tick']} calls per tick, "
+        f"{projection['api_calls_per_day']:.0f} per day"
+    )
+    print(
+        f"Run time per tick: {projection['run_seconds']:.1f}s, "
+        f"peak memory {format_bytes(projection['peak_memory_bytes'])}"
+    )
+    print()
+    for check in checks:
+        status = "ok" if check["ok"] else "EXCEEDS"
+        value, limit = check["value"], check["limit"]
+        if check["resource"] in ("storage", "memory per run"):
+            value, limit = format_bytes(value), format_bytes(limit)
+        elif check["resource"] == "run time per tick":
+            value, limit = f"{value:.1f}s", f"{limit:.0f}s"
+        else:
+            value, limit = f"{value:.0f}", f"{limit:.0f}"
+        print(f"{check['resource']:<18} {value:>12} / {limit:<12} {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Generate the Grafana dashboard's Flux queries and benchmark them against InfluxDB
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import click
+from dotenv import load_dotenv
+
+from .retention import RetentionPolicy, Tier, rollup_measurement
+from .timeutil import parse_duration
+
+# Load environment variables
+load_dotenv()
+
+# Log configuration
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DASHBOARD_PATH = "grafana/dashboards/health-overview.json"
+
+DEFAULT_RANGES = ["1d", "30d", "365d"]
+
+
+class Panel(NamedTuple):
+    """What a dashboard panel shows: one field aggregated per window"""
+
+    id: int
+    name: str
+    measurement: str
+    fn: str
+    every: str
+    # Divide aggregated values by this (e.g. seconds to hours)
+    divisor: Optional[float] = None
+
+
+PANELS = [
+    Panel(1, "steps", "steps", "sum", "1h"),
+    Panel(2, "weight", "weight", "mean", "1d"),
+    Panel(3, "heart_rate", "heart_rate", "mean", "1h"),
+    Panel(4, "sleep_hours", "sleep", "sum", "1d", divisor=3600.0),
+]
+
+# Rollup field that answers each aggregate exactly
+ROLLUP_FIELDS = {"min": "min", "max": "max", "mean": "mean"}
+
+
+def rollup_tier(panel: Panel, policy: Optional[RetentionPolicy]) -> Optional[Tier]:
+    """Coarsest rollup tier that answers the panel's aggregate exactly, if any
+
+    min and max can be taken over any rollup window that divides the panel's
+    window; a mean of means is only exact when the windows are equal.
+    """
+    if policy is None or panel.measurement not in policy.measurements:
+        return None
+    if panel.fn not in ROLLUP_FIELDS:
+        return None
+
+    every = parse_duration(panel.every)
+    candidates = [
+        tier
+        for tier in policy.rollup_tiers
+        if tier.window_seconds == every
+        or (panel.fn != "mean" and every % tier.window_seconds == 0)
+    ]
+    return max(candidates, key=lambda tier: tier.window_seconds, default=None)
+
+
+def panel_query(
+    panel: Panel, bucket: str, policy: Optional[RetentionPolicy] = None
+) -> str:
+    """Flux for a panel, restricted to one field and reading rollups when possible"""
+    measurement, field = panel.measurement, "value"
+    tier = rollup_tier(panel, policy)
+    if tier is not None:
+        measurement = rollup_measurement(panel.measurement, tier)
+        field = ROLLUP_FIELDS[panel.fn]
+
+    lines = [
+        f'from(bucket: "{bucket}")',
+        "  |> range(start: v.timeRangeStart, stop: v.timeRangeStop)",
+        f'  |> filter(fn: (r) => r._measurement == "{measurement}" '
+        f'and r._field == "{field}")',
+        f"  |> aggregateWindow(every: {panel.every}, fn: {panel.fn}, "
+        "createEmpty: false)",
+    ]
+    if panel.divisor:
+        # After aggregation, so it runs once per window instead of per point
+        lines.append(
+            f"  |> map(fn: (r) => ({{ r with _value: r._value / {panel.divisor} }}))"
+        )
+    lines.append(f'  |> yield(name: "{panel.name}")')
+    return "\n".join(lines)
+
+
+def load_dashboard(path: str = DASHBOARD_PATH) -> Dict:
+    """Load a dashboard JSON file"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def dashboard_queries(dashboard: Dict) -> Dict[str, str]:
+    """First target query of each panel, keyed by panel title"""
+    return {
+        panel["title"]: panel["targets"][0]["query"]
+        for panel in dashboard.get("panels", [])
+        if panel.get("targets")
+    }
+
+
+def generate_dashboard(
+    dashboard: Dict, bucket: str, policy: Optional[RetentionPolicy] = None
+) -> Dict:
+    """Replace the queries of known panels, keeping layout and styling"""
+    panels = {panel.id: panel for panel in PANELS}
+    for panel in dashboard.get("panels", []):
+        spec = panels.get(panel.get("id"))
+        if spec is None:
+            continue
+        for target in panel.get("targets", []):
+            target["query"] = panel_query(spec, bucket, policy)
+    return dashboard
+
+
+def replay_query(query: str, time_range: str) -> str:
+    """Substitute Grafana's time range variables with a range ending now"""
+    return query.replace("v.timeRangeStart", f"-{time_range}").replace(
+        "v.timeRangeStop", "now()"
+    )
+
+
+def bench_queries(
+    query_api, queries: Dict[str, str], ranges: List[str], repeat: int = 5
+) -> List[Dict]:
+    """Time each query over each range; returns one result row per pair"""
+    results = []
+    for name, query in queries.items():
+        for time_range in ranges:
+            flux = replay_query(query, time_range)
+            timings = []
+            rows = 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                tables = query_api.query(flux)
+                timings.append(time.perf_counter() - started)
+                rows = sum(len(table.records) for table in tables)
+
+            results.append(
+                {
+                    "query": name,
+                    "range": time_range,
+                    "best_ms": min(timings) * 1000,
+                    "median_ms": statistics.median(timings) * 1000,
+                    "rows": rows,
+                }
+            )
+    return results
+
+
+@click.group()
+def main():
+    """Generate and benchmark the Grafana dashboard queries"""
+
+
+@main.command()
+@click.option("--dashboard", default=DASHBOARD_PATH, help="Dashboard JSON to update")
+@click.option("--output", default=None, help="Write here instead of in place")
+def generate(dashboard: str, output: Optional[str]):
+    """Rewrite panel queries as field-pruned, rollup-aware Flux"""
+    bucket = os.getenv("INFLUXDB_BUCKET", "health_data")
+    policy = RetentionPolicy.from_env()
+
+    data = generate_dashboard(load_dashboard(dashboard), bucket, policy)
+    output = output or dashboard
+    with open(output, "w") as f:
+        json.dump(data, f, indent=2)
+
+    for panel in PANELS:
+        tier = rollup_tier(panel, policy)
+        source = rollup_measurement(panel.measurement, tier) if tier else "raw"
+        logger.info(f"{panel.name}: {panel.fn} per {panel.every} from {source}")
+    logger.info(f"Dashboard written: {output}")
+
+
+@main.command()
+@click.option("--dashboard", default=DASHBOARD_PATH, help="Dashboard JSON to replay")
+@click.option(
+    "--range",
+    "ranges",
+    multiple=True,
+    default=DEFAULT_RANGES,
+    help="Time range to replay each query over (repeatable)",
+)
+@click.option("--repeat", default=5, help="Runs per query and range")
+@click.option(
+    "--compare/--no-compare",
+    default=True,
+    help="Also replay the generated queries for comparison",
+)
+def bench(dashboard: str, ranges: tuple, repeat: int, compare: bool):
+    """Replay each panel's Flux against InfluxDB and report latency"""
+    from .influx_writer import InfluxWriter
+
+    writer = InfluxWriter()
+    queries = {
+        f"{title} [dashboard]": query
+        for title, query in dashboard_queries(load_dashboard(dashboard)).items()
+    }
+    if compare:
+        policy = RetentionPolicy.from_env()
+        for panel in PANELS:
+            queries[f"{panel.name} [generated]"] = panel_query(
+                panel, writer.bucket, policy
+            )
+
+    try:
+        results = bench_queries(
+            writer.client.query_api(), queries, list(ranges), repeat
+        )
+    finally:
+        writer.close()
+
+    print(f"{'query':<36} {'range':>6} {'best ms':>10} {'median ms':>10} {'rows':>8}")
+    for result in results:
+        print(
+            f"{result['query']:<36} {result['range']:>6} "
+            f"{result['best_ms']:>10.1f} {result['median_ms']:>10.1f} "
+            f"{result['rows']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
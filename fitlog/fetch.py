@@ -5,8 +5,9 @@ Script to fetch health data from Google Fit API and store it in InfluxDB
 
 import logging
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import click
 import pytz
@@ -15,8 +16,15 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
-from .influx_writer import InfluxWriter
+from .lifecycle import GracefulShutdown, PartialWriteError, write_all
+from .metrics import metrics
+from .pipeline import DEFAULT_QUEUE_SIZE, run_pipeline
+from .profiling import Profiler
+from .snapshot import SnapshotStore
+from .storage import STORAGE_BACKENDS, StorageBackend, create_writer
+from .timeutil import NANOS_PER_SECOND, LocalDayCache, datetime_to_ns, parse_duration
 
 # Load environment variables
 load_dotenv()
@@ -45,6 +53,19 @@ DATA_SOURCES = {
     "sleep": "derived:com.google.sleep.segment:com.google.android.gms:merged",
 }
 
+# Reverse lookup used to tag metrics with the data type
+DATA_TYPES = {source: data_type for data_type, source in DATA_SOURCES.items()}
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Incremental fetches re-read this much before the last stored point, so
+# points that Google Fit receives late from a device are still picked up.
+# Merged streams are often backfilled hours later, when a watch syncs after
+# the phone already reported that time.
+DEFAULT_SYNC_OVERLAP = "6h"
+SYNC_OVERLAP_SECONDS = parse_duration(DEFAULT_SYNC_OVERLAP)
+
 
 class GoogleFitClient:
     """Google Fit API client"""
@@ -53,11 +74,17 @@ class GoogleFitClient:
         self,
         credentials_path: str = "auth/client_secret.json",
         token_path: str = "auth/token.json",
+        max_retries: Optional[int] = None,
     ):
         self.credentials_path = credentials_path
         self.token_path = token_path
+        if max_retries is None:
+            max_retries = int(os.getenv("FETCH_MAX_RETRIES", "2"))
+        self.max_retries = max_retries
+        self.credentials = None
         self.service = None
         self.timezone = pytz.timezone(os.getenv("TIMEZONE", "Asia/Tokyo"))
+        self.days = LocalDayCache(self.timezone)
 
     def authenticate(self) -> None:
         """Execute OAuth authentication"""
@@ -86,150 +113,211 @@ class GoogleFitClient:
             with open(self.token_path, "w") as token:
                 token.write(creds.to_json())
 
-        self.service = build("fitness", "v1", credentials=creds)
+        self.credentials = creds
+        with metrics.timer("discovery_build_seconds"):
+            self.service = build("fitness", "v1", credentials=creds)
         logger.info("Google Fit API authentication completed")
 
+    def fork(self) -> "GoogleFitClient":
+        """Create a client with its own API service sharing these credentials
+
+        The service's HTTP transport is not thread-safe, so each thread that
+        fetches concurrently needs its own client.
+        """
+        if not self.service:
+            self.authenticate()
+
+        client = GoogleFitClient(
+            self.credentials_path, self.token_path, max_retries=self.max_retries
+        )
+        client.credentials = self.credentials
+        client.service = build("fitness", "v1", credentials=self.credentials)
+        return client
+
     def get_time_range(self, days_back: int = 1) -> tuple:
         """Calculate time range for data to fetch"""
-        now = datetime.now(self.timezone)
-        end_time = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        start_time = end_time - timedelta(days=days_back)
+        today = datetime.now(self.timezone).date()
+        start_day = today - timedelta(days=days_back)
+
+        # End of day (23:59:59.999999) in nanoseconds
+        start_ns = self.days.local_ns(start_day, 23, 59, 59, nanos=999999000)
+        end_ns = self.days.local_ns(today, 23, 59, 59, nanos=999999000)
+
+        return start_ns, end_ns
+
+    def parse_time(self, text: str, now_ns: int) -> int:
+        """Epoch ns of "now", a duration ago (e.g. 15m, 2h) or an ISO 8601 time"""
+        text = text.strip()
+        if text == "now":
+            return now_ns
+
+        try:
+            return now_ns - parse_duration(text) * NANOS_PER_SECOND
+        except ValueError:
+            pass
+
+        try:
+            dt = datetime.fromisoformat(
+                text[:-1] + "+00:00" if text.endswith("Z") else text
+            )
+        except ValueError:
+            raise ValueError(
+                f"Invalid time: {text!r} (expected ISO 8601, 'now' or e.g. 15m)"
+            ) from None
 
-        # Convert to nanoseconds
-        start_ns = int(start_time.timestamp() * 1000000000)
-        end_ns = int(end_time.timestamp() * 1000000000)
+        # Naive times are local
+        if dt.tzinfo is None:
+            dt = self.timezone.localize(dt)
+        return datetime_to_ns(dt)
 
+    def get_window(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        minutes: Optional[int] = None,
+        now_ns: Optional[int] = None,
+    ) -> Tuple[int, int]:
+        """Time range for --since/--until/--minutes, ending now by default"""
+        now_ns = now_ns or time.time_ns()
+        end_ns = self.parse_time(until, now_ns) if until else now_ns
+
+        if minutes is not None:
+            start_ns = end_ns - minutes * 60 * NANOS_PER_SECOND
+        elif since:
+            start_ns = self.parse_time(since, now_ns)
+        else:
+            raise ValueError("A window needs a start (since or minutes)")
+
+        if start_ns >= end_ns:
+            raise ValueError("Window start must be before its end")
         return start_ns, end_ns
 
     def fetch_dataset(
         self, data_source: str, start_time: int, end_time: int
     ) -> List[Dict]:
         """Fetch data from specified data source"""
-        try:
-            dataset_id = f"{start_time}-{end_time}"
-
-            result = (
-                self.service.users()
-                .dataSources()
-                .datasets()
-                .get(userId="me", dataSourceId=data_source, datasetId=dataset_id)
-                .execute()
-            )
+        data_type = DATA_TYPES.get(data_source, "unknown")
+        dataset_id = f"{start_time}-{end_time}"
+
+        with metrics.timer("fetch_dataset_seconds", data_type=data_type):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    request = (
+                        self.service.users()
+                        .dataSources()
+                        .datasets()
+                        .get(
+                            userId="me", dataSourceId=data_source, datasetId=dataset_id
+                        )
+                    )
+                    self._count_response_bytes(request, data_type)
 
-            return result.get("point", [])
+                    metrics.increment("fetch_requests_total", data_type=data_type)
+                    with metrics.timer("api_request_seconds", data_type=data_type):
+                        result = request.execute()
 
-        except Exception as e:
-            logger.error(f"Data fetch error ({data_source}): {e}")
-            return []
+                    points = result.get("point", [])
+                    metrics.increment(
+                        "fetch_points_total", len(points), data_type=data_type
+                    )
+                    return points
+
+                except (HttpError, OSError) as e:
+                    status = getattr(getattr(e, "resp", None), "status", None)
+                    retryable = status is None or int(status) in RETRYABLE_STATUSES
+                    if retryable and attempt < self.max_retries:
+                        metrics.increment("fetch_retries_total", data_type=data_type)
+                        logger.warning(
+                            f"Retrying fetch ({data_source}) after error: {e}"
+                        )
+                        time.sleep(2**attempt)
+                        continue
+
+                    metrics.increment("fetch_errors_total", data_type=data_type)
+                    logger.error(f"Data fetch error ({data_source}): {e}")
+                    return []
+
+                except Exception as e:
+                    metrics.increment("fetch_errors_total", data_type=data_type)
+                    logger.error(f"Data fetch error ({data_source}): {e}")
+                    return []
+
+        return []
+
+    @staticmethod
+    def _count_response_bytes(request, data_type: str) -> None:
+        """Count raw response bytes by wrapping the request's postproc hook"""
+        postproc = getattr(request, "postproc", None)
+        if postproc is None:
+            return
 
-    def fetch_steps(self, start_time: int, end_time: int) -> List[Dict]:
-        """Fetch steps data"""
-        points = self.fetch_dataset(DATA_SOURCES["steps"], start_time, end_time)
+        def counting_postproc(resp, content):
+            metrics.increment("fetch_bytes_total", len(content), data_type=data_type)
+            return postproc(resp, content)
 
-        steps_data = []
-        for point in points:
-            if point.get("value") and len(point["value"]) > 0:
-                timestamp = int(point["startTimeNanos"]) // 1000000000
-                steps = point["value"][0]["intVal"]
+        request.postproc = counting_postproc
 
-                steps_data.append(
-                    {"measurement": "steps", "timestamp": timestamp, "value": steps}
-                )
+    def _parse_points(
+        self, measurement: str, points: List[Dict], value_key: str
+    ) -> List[Dict]:
+        """Convert raw dataset points to records with nanosecond timestamps"""
+        with metrics.timer("parse_seconds", data_type=measurement):
+            return [
+                {
+                    "measurement": measurement,
+                    "timestamp_ns": int(point["startTimeNanos"]),
+                    "value": point["value"][0][value_key],
+                }
+                for point in points
+                if point.get("value")
+            ]
 
-        return steps_data
+    def fetch_steps(self, start_time: int, end_time: int) -> List[Dict]:
+        """Fetch steps data"""
+        points = self.fetch_dataset(DATA_SOURCES["steps"], start_time, end_time)
+        return self._parse_points("steps", points, "intVal")
 
     def fetch_calories(self, start_time: int, end_time: int) -> List[Dict]:
         """Fetch calorie consumption data"""
         points = self.fetch_dataset(DATA_SOURCES["calories"], start_time, end_time)
-
-        calories_data = []
-        for point in points:
-            if point.get("value") and len(point["value"]) > 0:
-                timestamp = int(point["startTimeNanos"]) // 1000000000
-                calories = point["value"][0]["fpVal"]
-
-                calories_data.append(
-                    {
-                        "measurement": "calories",
-                        "timestamp": timestamp,
-                        "value": calories,
-                    }
-                )
-
-        return calories_data
+        return self._parse_points("calories", points, "fpVal")
 
     def fetch_weight(self, start_time: int, end_time: int) -> List[Dict]:
         """Fetch weight data"""
         points = self.fetch_dataset(DATA_SOURCES["weight"], start_time, end_time)
-
-        weight_data = []
-        for point in points:
-            if point.get("value") and len(point["value"]) > 0:
-                timestamp = int(point["startTimeNanos"]) // 1000000000
-                weight = point["value"][0]["fpVal"]
-
-                weight_data.append(
-                    {"measurement": "weight", "timestamp": timestamp, "value": weight}
-                )
-
-        return weight_data
+        return self._parse_points("weight", points, "fpVal")
 
     def fetch_heart_rate(self, start_time: int, end_time: int) -> List[Dict]:
         """Fetch heart rate data"""
         points = self.fetch_dataset(DATA_SOURCES["heart_rate"], start_time, end_time)
-
-        heart_rate_data = []
-        for point in points:
-            if point.get("value") and len(point["value"]) > 0:
-                timestamp = int(point["startTimeNanos"]) // 1000000000
-                heart_rate = point["value"][0]["fpVal"]
-
-                heart_rate_data.append(
-                    {
-                        "measurement": "heart_rate",
-                        "timestamp": timestamp,
-                        "value": heart_rate,
-                    }
-                )
-
-        return heart_rate_data
+        return self._parse_points("heart_rate", points, "fpVal")
 
     def fetch_sleep(self, start_time: int, end_time: int) -> List[Dict]:
         """Fetch sleep data"""
         points = self.fetch_dataset(DATA_SOURCES["sleep"], start_time, end_time)
 
         sleep_data = []
-        for point in points:
-            if point.get("value") and len(point["value"]) > 0:
-                start_timestamp = int(point["startTimeNanos"]) // 1000000000
-                end_timestamp = int(point["endTimeNanos"]) // 1000000000
-                sleep_type = point["value"][0]["intVal"]
-                duration = end_timestamp - start_timestamp
-
-                sleep_data.append(
-                    {
-                        "measurement": "sleep",
-                        "timestamp": start_timestamp,
-                        "value": duration,
-                        "sleep_type": sleep_type,
-                    }
-                )
+        with metrics.timer("parse_seconds", data_type="sleep"):
+            for point in points:
+                if point.get("value"):
+                    start_ns = int(point["startTimeNanos"])
+                    end_ns = int(point["endTimeNanos"])
+
+                    sleep_data.append(
+                        {
+                            "measurement": "sleep",
+                            "timestamp_ns": start_ns,
+                            # Duration in seconds, keeping sub-second precision
+                            "value": (end_ns - start_ns) / NANOS_PER_SECOND,
+                            "sleep_type": point["value"][0]["intVal"],
+                        }
+                    )
 
         return sleep_data
 
-    def fetch_all_data(self, days_back: int = 1) -> Dict[str, List[Dict]]:
-        """Fetch all health data"""
-        if not self.service:
-            self.authenticate()
-
-        start_time, end_time = self.get_time_range(days_back)
-
-        logger.info(f"Starting data fetch: from {days_back} days ago to present")
-
-        all_data = {}
-
-        # Fetch each data type
-        data_fetchers = {
+    def get_fetchers(self) -> Dict[str, Callable[[int, int], List[Dict]]]:
+        """Fetch method per data type, each taking (start_ns, end_ns)"""
+        return {
             "steps": self.fetch_steps,
             "calories": self.fetch_calories,
             "weight": self.fetch_weight,
@@ -237,52 +325,258 @@ class GoogleFitClient:
             "sleep": self.fetch_sleep,
         }
 
-        for data_type, fetcher in data_fetchers.items():
+    def iter_data(
+        self,
+        days_back: int = 1,
+        ranges: Optional[Dict[str, Tuple[int, int]]] = None,
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Fetch each health data type, yielding it as soon as it is parsed
+
+        `ranges` maps data types to (start_ns, end_ns); without it every type
+        is fetched for the last `days_back` days.
+        """
+        if not self.service:
+            self.authenticate()
+
+        fetchers = self.get_fetchers()
+        if ranges is None:
+            time_range = self.get_time_range(days_back)
+            ranges = dict.fromkeys(fetchers, time_range)
+            logger.info(f"Starting data fetch: from {days_back} days ago to present")
+
+        # Fetch each data type
+        for data_type, (start_time, end_time) in ranges.items():
             try:
-                data = fetcher(start_time, end_time)
-                all_data[data_type] = data
+                minutes = (end_time - start_time) / NANOS_PER_SECOND / 60
+                logger.info(f"{data_type}: fetching {minutes:.0f} minutes")
+                data = fetchers[data_type](start_time, end_time)
                 logger.info(f"{data_type}: fetched {len(data)} data points")
             except Exception as e:
                 logger.error(f"{data_type} data fetch error: {e}")
-                all_data[data_type] = []
+                data = []
+            yield data_type, data
 
+    def fetch_all_data(
+        self,
+        days_back: int = 1,
+        ranges: Optional[Dict[str, Tuple[int, int]]] = None,
+        shutdown: Optional[GracefulShutdown] = None,
+    ) -> Dict[str, List[Dict]]:
+        """Fetch all health data, stopping early if shutdown is requested"""
+        fetch_started = time.perf_counter()
+        sources = self.iter_data(days_back, ranges)
+        if shutdown is not None:
+            sources = shutdown.until_requested(sources)
+        all_data = dict(sources)
+        metrics.observe("fetch_all_data_seconds", time.perf_counter() - fetch_started)
         return all_data
 
 
+def snap_to_last_sync(
+    writer: StorageBackend,
+    data_types: List[str],
+    start_ns: int,
+    end_ns: int,
+    overlap_ns: int = SYNC_OVERLAP_SECONDS * NANOS_PER_SECOND,
+) -> Dict[str, Tuple[int, int]]:
+    """Per data type range that starts just before its last stored point
+
+    The range is only ever narrowed, so frequent polling fetches the delta
+    since the previous run instead of the whole window.
+    """
+    ranges = {}
+    for data_type in data_types:
+        last_ns = writer.get_last_timestamp_ns(data_type, start_ns, end_ns)
+        if last_ns is None:
+            ranges[data_type] = (start_ns, end_ns)
+        else:
+            ranges[data_type] = (max(start_ns, last_ns - overlap_ns), end_ns)
+    return ranges
+
+
 @click.command()
 @click.option("--days", default=1, help="Number of days to fetch (how many days back)")
+@click.option(
+    "--since",
+    default=None,
+    help="Window start: ISO 8601 time (local if no offset) or a duration ago, e.g. 2h",
+)
+@click.option("--until", default=None, help="Window end (default: now)")
+@click.option("--minutes", type=int, default=None, help="Fetch only the last N minutes")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Start each data type just before its last stored point",
+)
+@click.option(
+    "--sync-overlap",
+    envvar="FITLOG_SYNC_OVERLAP",
+    default=DEFAULT_SYNC_OVERLAP,
+    help="With --incremental, re-read this long before the last stored point",
+)
 @click.option("--dry-run", is_flag=True, help="Execute without writing to database")
-def main(days: int, dry_run: bool):
+@click.option(
+    "--metrics-file",
+    envvar="FITLOG_METRICS_FILE",
+    default=None,
+    help="Write run metrics to this Prometheus text file",
+)
+@click.option(
+    "--internal-metrics/--no-internal-metrics",
+    default=True,
+    help="Write run metrics to the fitlog_internal measurement",
+)
+@click.option(
+    "--pipeline",
+    is_flag=True,
+    help="Write each data type while the next one is being fetched",
+)
+@click.option(
+    "--queue-size",
+    default=DEFAULT_QUEUE_SIZE,
+    help="Maximum batches waiting for the writer in pipeline mode",
+)
+@click.option(
+    "--storage",
+    envvar="FITLOG_STORAGE",
+    type=click.Choice(STORAGE_BACKENDS),
+    default="influxdb",
+    help="Storage backend to write to",
+)
+@click.option("--profile", is_flag=True, help="Profile the run per phase")
+@click.option(
+    "--profile-output",
+    default="fitlog-fetch-profile",
+    help="Path prefix for the profile report and dump",
+)
+def main(
+    days: int,
+    since: Optional[str],
+    until: Optional[str],
+    minutes: Optional[int],
+    incremental: bool,
+    sync_overlap: str,
+    dry_run: bool,
+    metrics_file: Optional[str],
+    internal_metrics: bool,
+    pipeline: bool,
+    queue_size: int,
+    storage: str,
+    profile: bool,
+    profile_output: str,
+):
     """Fetch data from Google Fit API and store in InfluxDB"""
+    if since and minutes is not None:
+        raise click.UsageError("--since and --minutes are mutually exclusive")
+    if until and not (since or minutes is not None):
+        raise click.UsageError("--until requires --since or --minutes")
     try:
-        # Initialize Google Fit client
-        fit_client = GoogleFitClient()
+        overlap_ns = parse_duration(sync_overlap) * NANOS_PER_SECOND
+    except ValueError as e:
+        raise click.UsageError(str(e)) from None
 
-        # Fetch data
-        all_data = fit_client.fetch_all_data(days)
+    profiler = Profiler(enabled=profile, output=profile_output)
+    writer = None
+    partial = None
+    try:
+        with profiler.run(), GracefulShutdown() as shutdown:
+            # Initialize Google Fit client
+            fit_client = GoogleFitClient()
+
+            # Time window: explicit, or whole days back from today
+            if since or minutes is not None:
+                try:
+                    start_ns, end_ns = fit_client.get_window(since, until, minutes)
+                except ValueError as e:
+                    raise click.UsageError(str(e)) from None
+            else:
+                start_ns, end_ns = fit_client.get_time_range(days)
 
-        if dry_run:
-            logger.info("Dry run mode: will not write to database")
-            for data_type, data in all_data.items():
-                logger.info(f"{data_type}: {len(data)} items")
-            return
+            data_types = list(fit_client.get_fetchers())
+            ranges = dict.fromkeys(data_types, (start_ns, end_ns))
+
+            writer = None if dry_run else create_writer(storage)
+            snapshot = SnapshotStore.from_env()
 
-        # Write to InfluxDB
-        influx_writer = InfluxWriter()
+            if incremental and writer is not None:
+                with profiler.phase("snap_to_last_sync"):
+                    ranges = snap_to_last_sync(
+                        writer, data_types, start_ns, end_ns, overlap_ns
+                    )
 
-        total_points = 0
-        for data_type, data in all_data.items():
-            if data:
-                points_written = influx_writer.write_health_data(data)
-                total_points += points_written
-                logger.info(f"{data_type}: wrote {points_written} items to InfluxDB")
+            with profiler.phase("authenticate"):
+                fit_client.authenticate()
+
+            if pipeline and writer is not None:
+                sources = fit_client.iter_data(days, ranges)
+                if snapshot is not None:
+                    sources = snapshot.tap(sources)
+
+                # Fetch and write concurrently
+                with profiler.phase("pipeline"):
+                    try:
+                        written = run_pipeline(
+                            sources,
+                            writer,
+                            queue_size=queue_size,
+                            profiler=profiler,
+                            shutdown=shutdown,
+                        )
+                    except PartialWriteError as e:
+                        partial = e
+                        written = e.report.written
 
-        logger.info(f"Processing completed for total {total_points} data points")
+            else:
+                # Fetch data
+                with profiler.phase("fetch_all_data"):
+                    all_data = fit_client.fetch_all_data(days, ranges, shutdown)
+
+                if snapshot is not None:
+                    with profiler.phase("update_snapshot"):
+                        for data in all_data.values():
+                            snapshot.update(data)
+
+                if writer is None:
+                    logger.info("Dry run mode: will not write to database")
+                    for data_type, data in all_data.items():
+                        logger.info(f"{data_type}: {len(data)} items")
+                    return
+
+                # Write to storage; a failed data type does not stop the others
+                try:
+                    written = write_all(writer, all_data, profiler, shutdown)
+                except PartialWriteError as e:
+                    partial = e
+                    written = e.report.written
+
+            total_points = sum(written.values())
+            logger.info(f"Processing completed for total {total_points} data points")
+            if shutdown.requested.is_set():
+                dropped = partial.report.total_dropped if partial else 0
+                logger.warning(
+                    f"Shut down early: flushed {total_points} points, dropped {dropped}"
+                )
+
+            if not shutdown.expired():
+                with profiler.phase("apply_retention"):
+                    writer.apply_retention()
+
+            if internal_metrics:
+                writer.write_internal_metrics(tags={"command": "fetch"})
+
+            if partial is not None:
+                raise partial
 
     except Exception as e:
         logger.error(f"Execution error: {e}")
         raise
 
+    finally:
+        if writer is not None:
+            writer.close()
+        if metrics_file:
+            metrics.write_prometheus(metrics_file)
+
 
 if __name__ == "__main__":
     main()
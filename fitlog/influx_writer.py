@@ -4,29 +4,72 @@ Module responsible for writing data to InfluxDB
 """
 
 import logging
+import math
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
+import click
 from dotenv import load_dotenv
-from influxdb_client import InfluxDBClient, Point
+from influxdb_client import InfluxDBClient, Point, WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
 
+from .profiling import Profiler
+from .storage import Record, StorageBackend, create_writer, fill_windows
+from .timeutil import NANOS_PER_SECOND, datetime_to_ns, seconds_to_ns
+
 # Load environment variables
 load_dotenv()
 
 # Log configuration
 logger = logging.getLogger(__name__)
 
+# Flux aggregate functions computed for each rollup window
+AGGREGATES = ["min", "mean", "max", "count"]
+
+
+def _escape_measurement(name: str) -> str:
+    return name.replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+
+def _escape_key(key) -> str:
+    return (
+        str(key)
+        .replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace("=", "\\=")
+        .replace(" ", "\\ ")
+    )
+
+
+def _format_field(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
 
-class InfluxWriter:
+
+class InfluxWriter(StorageBackend):
     """Class for writing data to InfluxDB"""
 
-    def __init__(self):
-        self.url = os.getenv("INFLUXDB_URL", "http://localhost:8086")
-        self.token = os.getenv("INFLUXDB_ADMIN_TOKEN")
-        self.org = os.getenv("INFLUXDB_ORG", "fitlog")
-        self.bucket = os.getenv("INFLUXDB_BUCKET", "health_data")
+    name = "influxdb"
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        token: Optional[str] = None,
+        org: Optional[str] = None,
+        bucket: Optional[str] = None,
+    ):
+        self.url = url or os.getenv("INFLUXDB_URL", "http://localhost:8086")
+        self.token = token or os.getenv("INFLUXDB_ADMIN_TOKEN")
+        self.org = org or os.getenv("INFLUXDB_ORG", "fitlog")
+        self.bucket = bucket or os.getenv("INFLUXDB_BUCKET", "health_data")
 
         if not self.token:
             raise ValueError("INFLUXDB_ADMIN_TOKEN environment variable is not set")
@@ -34,23 +77,35 @@ class InfluxWriter:
         self.client = InfluxDBClient(url=self.url, token=self.token, org=self.org)
 
         self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
+        self._closed = False
 
         logger.info(f"InfluxDB connection initialized: {self.url}")
 
     def __del__(self):
         """Close client in destructor"""
-        if hasattr(self, "client"):
+        if hasattr(self, "write_api"):
+            self.close()
+
+    def close(self) -> None:
+        """Flush the write API and close the InfluxDB client; safe to call twice"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.write_api.close()
+        finally:
             self.client.close()
 
     def create_point(
         self,
         measurement: str,
         value: float,
-        timestamp: int,
+        timestamp: Optional[int] = None,
         tags: Optional[Dict] = None,
         fields: Optional[Dict] = None,
+        timestamp_ns: Optional[int] = None,
     ) -> Point:
-        """Create InfluxDB Point object"""
+        """Create InfluxDB Point object (timestamp in seconds or timestamp_ns)"""
         point = Point(measurement)
 
         # Add tags
@@ -66,172 +121,38 @@ class InfluxWriter:
             for key, val in fields.items():
                 point.field(key, val)
 
-        # Set timestamp (convert from seconds to nanoseconds)
-        point.time(timestamp * 1000000000)
+        # Set timestamp, keeping nanosecond precision when available
+        if timestamp_ns is None:
+            timestamp_ns = seconds_to_ns(timestamp)
+        point.time(timestamp_ns, WritePrecision.NS)
 
         return point
 
-    def write_health_data(self, data: List[Dict]) -> int:
-        """Write health data to InfluxDB"""
-        if not data:
-            return 0
-
-        points = []
-
-        for item in data:
-            measurement = item.get("measurement")
-            value = item.get("value")
-            timestamp = item.get("timestamp")
-
-            if not all([measurement, value is not None, timestamp]):
-                logger.warning(f"Skipping incomplete data: {item}")
-                continue
-
-            # Processing by measurement type
-            if measurement == "steps":
-                point = self.create_point(
-                    measurement="steps",
-                    value=int(value),
-                    timestamp=timestamp,
-                    tags={"unit": "count"},
-                )
-
-            elif measurement == "calories":
-                point = self.create_point(
-                    measurement="calories",
-                    value=float(value),
-                    timestamp=timestamp,
-                    tags={"unit": "kcal"},
-                )
-
-            elif measurement == "weight":
-                point = self.create_point(
-                    measurement="weight",
-                    value=float(value),
-                    timestamp=timestamp,
-                    tags={"unit": "kg"},
-                )
-
-            elif measurement == "heart_rate":
-                point = self.create_point(
-                    measurement="heart_rate",
-                    value=float(value),
-                    timestamp=timestamp,
-                    tags={"unit": "bpm"},
-                )
-
-            elif measurement == "sleep":
-                # Sleep data requires special processing
-                sleep_type = item.get("sleep_type", 0)
-                sleep_type_name = self.get_sleep_type_name(sleep_type)
-
-                point = self.create_point(
-                    measurement="sleep",
-                    value=float(value),  # Sleep duration (seconds)
-                    timestamp=timestamp,
-                    tags={"unit": "seconds", "sleep_type": sleep_type_name},
-                    fields={
-                        "sleep_type_code": sleep_type,
-                        "duration_minutes": float(value) / 60,
-                        "duration_hours": float(value) / 3600,
-                    },
-                )
-
-            else:
-                logger.warning(f"Unknown measurement type: {measurement}")
-                continue
-
-            points.append(point)
-
-        # Write data
-        if points:
-            try:
-                self.write_api.write(bucket=self.bucket, record=points)
-                logger.info(f"Successfully wrote {len(points)} data points to InfluxDB")
-                return len(points)
-            except Exception as e:
-                logger.error(f"InfluxDB write error: {e}")
-                raise
-
-        return 0
-
-    def get_sleep_type_name(self, sleep_type: int) -> str:
-        """Get sleep type name from sleep type code"""
-        sleep_types = {
-            1: "awake",
-            2: "sleep",
-            3: "out_of_bed",
-            4: "light_sleep",
-            5: "deep_sleep",
-            6: "rem_sleep",
-        }
-        return sleep_types.get(sleep_type, "unknown")
-
-    def write_steps_data(self, steps_data: List[Dict]) -> int:
-        """Write steps data"""
-        return self.write_health_data(
-            [
-                {
-                    "measurement": "steps",
-                    "value": item["value"],
-                    "timestamp": item["timestamp"],
-                }
-                for item in steps_data
-            ]
-        )
-
-    def write_weight_data(self, weight_data: List[Dict]) -> int:
-        """Write weight data"""
-        return self.write_health_data(
-            [
-                {
-                    "measurement": "weight",
-                    "value": item["value"],
-                    "timestamp": item["timestamp"],
-                }
-                for item in weight_data
-            ]
+    @staticmethod
+    def record_to_line(record: Record) -> str:
+        """Serialize a record to InfluxDB line protocol"""
+        tags = "".join(
+            f",{_escape_key(key)}={_escape_key(val)}"
+            for key, val in sorted(record.tags.items())
+            if val != ""
         )
-
-    def write_calories_data(self, calories_data: List[Dict]) -> int:
-        """Write calories data"""
-        return self.write_health_data(
-            [
-                {
-                    "measurement": "calories",
-                    "value": item["value"],
-                    "timestamp": item["timestamp"],
-                }
-                for item in calories_data
-            ]
+        # InfluxDB rejects NaN/inf, so such fields are dropped
+        fields = ",".join(
+            f"{_escape_key(key)}={_format_field(val)}"
+            for key, val in record.fields.items()
+            if not (isinstance(val, float) and not math.isfinite(val))
         )
-
-    def write_heart_rate_data(self, heart_rate_data: List[Dict]) -> int:
-        """Write heart rate data"""
-        return self.write_health_data(
-            [
-                {
-                    "measurement": "heart_rate",
-                    "value": item["value"],
-                    "timestamp": item["timestamp"],
-                }
-                for item in heart_rate_data
-            ]
+        return (
+            f"{_escape_measurement(record.measurement)}{tags} {fields} {record.time_ns}"
         )
 
-    def write_sleep_data(self, sleep_data: List[Dict]) -> int:
-        """Write sleep data"""
-        return self.write_health_data(
-            [
-                {
-                    "measurement": "sleep",
-                    "value": item["value"],
-                    "timestamp": item["timestamp"],
-                    "sleep_type": item.get("sleep_type", 0),
-                }
-                for item in sleep_data
-            ]
+    def write_records(self, records: List[Record]) -> int:
+        """Write records to InfluxDB as line protocol"""
+        lines = [self.record_to_line(record) for record in records]
+        self.write_api.write(
+            bucket=self.bucket, record=lines, write_precision=WritePrecision.NS
         )
+        return len(lines)
 
     def test_connection(self) -> bool:
         """Test connection to InfluxDB"""
@@ -278,34 +199,158 @@ class InfluxWriter:
             logger.error(f"Data retrieval error: {e}")
             return []
 
+    def query_range(
+        self, measurement: str, start_ns: int, end_ns: int, field: str = "value"
+    ) -> List[Tuple[int, Any]]:
+        """Get (time_ns, value) pairs of a field in [start_ns, end_ns), by time"""
+        query_api = self.client.query_api()
+        query = f"""
+            from(bucket: "{self.bucket}")
+            |> range(start: time(v: {start_ns}), stop: time(v: {end_ns}))
+            |> filter(fn: (r) => r._measurement == "{measurement}" and r._field == "{field}")
+            |> group()
+            |> sort(columns: ["_time"])
+            |> keep(columns: ["_time", "_value"])
+        """
+
+        rows = []
+        for table in query_api.query(query):
+            for record in table.records:
+                rows.append((datetime_to_ns(record.get_time()), record.get_value()))
+        return rows
+
+    def get_last_timestamp_ns(
+        self, measurement: str, start_ns: int, end_ns: int
+    ) -> Optional[int]:
+        """Time of the latest point in [start_ns, end_ns), or None if empty"""
+        query_api = self.client.query_api()
+        query = f"""
+            from(bucket: "{self.bucket}")
+            |> range(start: time(v: {start_ns}), stop: time(v: {end_ns}))
+            |> filter(fn: (r) => r._measurement == "{measurement}" and r._field == "value")
+            |> group()
+            |> last()
+            |> keep(columns: ["_time", "_value"])
+        """
+
+        for table in query_api.query(query):
+            for record in table.records:
+                return datetime_to_ns(record.get_time())
+        return None
+
+    def count_windows(
+        self, measurement: str, start_ns: int, end_ns: int, window_ns: int
+    ) -> List[Tuple[int, int]]:
+        """Count points per epoch-aligned window in [start_ns, end_ns)"""
+        query_api = self.client.query_api()
+        query = f"""
+            from(bucket: "{self.bucket}")
+            |> range(start: time(v: {start_ns}), stop: time(v: {end_ns}))
+            |> filter(fn: (r) => r._measurement == "{measurement}" and r._field == "value")
+            |> group()
+            |> aggregateWindow(every: {window_ns}ns, fn: count, timeSrc: "_start")
+            |> keep(columns: ["_time", "_value"])
+        """
+
+        counts = {}
+        for table in query_api.query(query):
+            for record in table.records:
+                counts[datetime_to_ns(record.get_time())] = int(record.get_value())
+        return fill_windows(start_ns, end_ns, window_ns, counts)
+
+    def aggregate_windows(
+        self, measurement: str, start_ns: int, end_ns: int, window_ns: int
+    ) -> List[Tuple[int, float, float, float, int]]:
+        """(window_start_ns, min, mean, max, count) of non-empty windows, by time"""
+        query_api = self.client.query_api()
+        source = f"""
+            data = from(bucket: "{self.bucket}")
+            |> range(start: time(v: {start_ns}), stop: time(v: {end_ns}))
+            |> filter(fn: (r) => r._measurement == "{measurement}" and r._field == "value")
+            |> group()
+        """
+        query = source + "".join(
+            f"""
+            data
+            |> aggregateWindow(every: {window_ns}ns, fn: {fn}, createEmpty: false, timeSrc: "_start")
+            |> keep(columns: ["_time", "_value"])
+            |> yield(name: "{fn}")
+            """
+            for fn in AGGREGATES
+        )
 
-def main():
-    """Main function for test execution"""
-    try:
-        writer = InfluxWriter()
-
-        # Connection test
-        if writer.test_connection():
-            print("InfluxDB connection successful")
-        else:
-            print("InfluxDB connection failed")
-            return
-
-        # Write test data
-        test_data = [
-            {
-                "measurement": "steps",
-                "value": 8500,
-                "timestamp": int(datetime.now().timestamp()),
-            }
+        windows: Dict[int, Dict[str, Any]] = {}
+        for table in query_api.query(query):
+            for record in table.records:
+                window = windows.setdefault(datetime_to_ns(record.get_time()), {})
+                window[record.values["result"]] = record.get_value()
+
+        return [
+            (
+                window_start,
+                window["min"],
+                window["mean"],
+                window["max"],
+                int(window["count"]),
+            )
+            for window_start, window in sorted(windows.items())
         ]
 
-        points_written = writer.write_health_data(test_data)
-        print(f"Test data write completed: {points_written} items")
+    def delete_before(self, measurement: str, cutoff_ns: int) -> None:
+        """Delete all points of a measurement older than cutoff_ns"""
+        self.client.delete_api().delete(
+            start="1970-01-01T00:00:00Z",
+            stop=datetime.fromtimestamp(cutoff_ns / NANOS_PER_SECOND, tz=timezone.utc),
+            predicate=f'_measurement="{measurement}"',
+            bucket=self.bucket,
+            org=self.org,
+        )
 
-        # Get latest data
-        latest_steps = writer.get_latest_data("steps", 5)
-        print(f"Latest steps data: {len(latest_steps)} items")
+
+@click.command()
+@click.option("--profile", is_flag=True, help="Profile the run per phase")
+@click.option(
+    "--profile-output",
+    default="fitlog-influx-test-profile",
+    help="Path prefix for the profile report and dump",
+)
+def main(profile: bool, profile_output: str):
+    """Main function for test execution"""
+    profiler = Profiler(enabled=profile, output=profile_output)
+    try:
+        with profiler.run():
+            with profiler.phase("connect"):
+                writer = create_writer()
+
+            # Closing flushes InfluxDB writes and releases the SQLite connection
+            with writer:
+                # Connection test
+                with profiler.phase("test_connection"):
+                    connected = writer.test_connection()
+
+                if connected:
+                    print(f"{writer.name} connection successful")
+                else:
+                    print(f"{writer.name} connection failed")
+                    return
+
+                # Write test data
+                test_data = [
+                    {
+                        "measurement": "steps",
+                        "value": 8500,
+                        "timestamp_ns": time.time_ns(),
+                    }
+                ]
+
+                with profiler.phase("write_health_data:steps"):
+                    points_written = writer.write_health_data(test_data)
+                print(f"Test data write completed: {points_written} items")
+
+                # Get latest data
+                with profiler.phase("get_latest_data"):
+                    latest_steps = writer.get_latest_data("steps", 5)
+                print(f"Latest steps data: {len(latest_steps)} items")
 
     except Exception as e:
         logger.error(f"Test execution error: {e}")
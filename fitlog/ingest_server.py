@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+HTTP ingestion service: accepts pushed health records as JSON or line protocol
+"""
+
+import hmac
+import http.client
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+from dotenv import load_dotenv
+
+from .batching import DEFAULT_MAX_DELAY, BatchWriter
+from .lifecycle import GracefulShutdown
+from .metrics import metrics, percentile
+from .pipeline import DEFAULT_BATCH_SIZE
+from .storage import SLEEP_TYPES, STORAGE_BACKENDS, StorageBackend, create_writer
+from .timeutil import NANOS_PER_SECOND
+
+# Load environment variables
+load_dotenv()
+
+# Log configuration
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8087
+
+# Largest accepted request body
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# Line protocol timestamp precision -> nanoseconds per unit
+PRECISIONS = {"ns": 1, "us": 1000, "ms": 1000000, "s": NANOS_PER_SECOND}
+
+SLEEP_TYPE_CODES = {name: code for code, name in SLEEP_TYPES.items()}
+
+# Known sleep type codes, plus 0 for a segment of unspecified type
+VALID_SLEEP_TYPES = {0, *SLEEP_TYPES}
+
+# Timestamps must fit InfluxDB's signed 64-bit nanoseconds
+MAX_TIMESTAMP_NS = 2**63 - 1
+MAX_TIMESTAMP_SECONDS = MAX_TIMESTAMP_NS // NANOS_PER_SECOND
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_item(item: Dict) -> None:
+    """Raise ValueError unless the fields of a pushed item have usable types
+
+    Missing fields are left to build_records, which skips incomplete items;
+    present ones must be finite numbers (integers for timestamp_ns), timestamps
+    and values must fit in 64 bits, and sleep_type must be a known code. One
+    bad item would otherwise fail the whole batch it is written with.
+    """
+    measurement = item.get("measurement")
+    if measurement is not None and not isinstance(measurement, str):
+        raise ValueError(f"'measurement' must be a string: {measurement!r}")
+
+    value = item.get("value")
+    if value is not None and not (_is_number(value) and abs(value) <= MAX_TIMESTAMP_NS):
+        raise ValueError(f"'value' must be a finite number: {value!r}")
+
+    timestamp_ns = item.get("timestamp_ns")
+    if timestamp_ns is not None and not (
+        isinstance(timestamp_ns, int)
+        and not isinstance(timestamp_ns, bool)
+        and 0 <= timestamp_ns <= MAX_TIMESTAMP_NS
+    ):
+        raise ValueError(
+            f"'timestamp_ns' must be an integer of nanoseconds: {timestamp_ns!r}"
+        )
+
+    timestamp = item.get("timestamp")
+    if timestamp is not None and not (
+        _is_number(timestamp) and 0 <= timestamp <= MAX_TIMESTAMP_SECONDS
+    ):
+        raise ValueError(f"'timestamp' must be a number of seconds: {timestamp!r}")
+
+    sleep_type = item.get("sleep_type")
+    if sleep_type is not None and not (
+        isinstance(sleep_type, int)
+        and not isinstance(sleep_type, bool)
+        and sleep_type in VALID_SLEEP_TYPES
+    ):
+        raise ValueError(
+            f"'sleep_type' must be a sleep type code "
+            f"{sorted(VALID_SLEEP_TYPES)}: {sleep_type!r}"
+        )
+
+
+def _sleep_type(fields: Dict, tags: Dict) -> int:
+    """Sleep type code of a line from its sleep_type_code field or sleep_type tag"""
+    if "sleep_type_code" in fields:
+        code = fields["sleep_type_code"]
+        # Written without the i suffix, an integer code arrives as a float
+        if isinstance(code, float) and code.is_integer():
+            code = int(code)
+        return code
+    name = tags.get("sleep_type")
+    if name is None:
+        return 0
+    if name not in SLEEP_TYPE_CODES:
+        raise ValueError(f"Unknown sleep_type tag: {name!r}")
+    return SLEEP_TYPE_CODES[name]
+
+
+def _split_unescaped(text: str, separator: str) -> List[str]:
+    """Split on separator outside backslash escapes and double-quoted strings"""
+    if "\\" not in text and '"' not in text:
+        return text.split(separator)
+
+    parts = []
+    current = []
+    quoted = False
+    escaped = False
+    for char in text:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\":
+            current.append(char)
+            escaped = True
+        elif char == '"':
+            current.append(char)
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    for char in ("\\", ",", "=", " ", '"'):
+        text = text.replace("\\" + char, char)
+    return text
+
+
+def _parse_field_value(text: str):
+    if text.startswith('"'):
+        return _unescape(text[1:-1])
+    if text in ("t", "T", "true", "True", "TRUE"):
+        return True
+    if text in ("f", "F", "false", "False", "FALSE"):
+        return False
+    if text[-1:] in ("i", "u"):
+        return int(text[:-1])
+    return float(text)
+
+
+def parse_line_protocol(
+    body: str, precision: str = "ns", now_ns: Optional[int] = None
+) -> List[Dict]:
+    """Parse InfluxDB line protocol into health data items
+
+    Each line needs a `value` field; lines without a timestamp get now_ns.
+    Sleep lines take their type from a sleep_type_code field or a sleep_type tag.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    multiplier = PRECISIONS[precision]
+    now_ns = now_ns or time.time_ns()
+
+    items = []
+    for line_number, line in enumerate(body.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        parts = _split_unescaped(line, " ")
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Line {line_number}: expected 'series fields [time]'")
+
+        try:
+            series = _split_unescaped(parts[0], ",")
+            tags = {}
+            for pair in series[1:]:
+                key, _, value = pair.partition("=")
+                tags[_unescape(key)] = _unescape(value)
+            fields = {}
+            for pair in _split_unescaped(parts[1], ","):
+                key, _, value = pair.partition("=")
+                fields[_unescape(key)] = _parse_field_value(value)
+            timestamp_ns = int(parts[2]) * multiplier if len(parts) == 3 else now_ns
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from None
+
+        if "value" not in fields:
+            raise ValueError(f"Line {line_number}: missing 'value' field")
+
+        item = {
+            "measurement": _unescape(series[0]),
+            "value": fields["value"],
+            "timestamp_ns": timestamp_ns,
+        }
+        try:
+            if item["measurement"] == "sleep":
+                item["sleep_type"] = _sleep_type(fields, tags)
+            check_item(item)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from None
+        items.append(item)
+
+    return items
+
+
+def parse_json(body: bytes) -> List[Dict]:
+    """Parse a JSON list of items, or {"records": [...]}"""
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}") from None
+
+    if isinstance(payload, dict):
+        payload = payload.get("records")
+    if not isinstance(payload, list) or not all(
+        isinstance(item, dict) for item in payload
+    ):
+        raise ValueError('Expected a list of records or {"records": [...]}')
+    for index, item in enumerate(payload):
+        try:
+            check_item(item)
+        except ValueError as e:
+            raise ValueError(f"Record {index}: {e}") from None
+    return payload
+
+
+class IngestServer:
+    """Threaded HTTP server that validates pushed records and batches writes
+
+    POST /ingest takes JSON; POST /write and /api/v2/write take line protocol
+    (the latter so InfluxDB clients and exporters can point at fitlog). Records
+    are built and validated on the request thread with the same rules as
+    write_health_data, then handed to a BatchWriter.
+    """
+
+    def __init__(
+        self,
+        writer: StorageBackend,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        token: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        self.writer = writer
+        self.token = token
+        self.batcher = BatchWriter(writer, max_points=batch_size, max_delay=max_delay)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate sends; with Nagle on, keep-alive
+            # clients wait for a delayed ACK (~40 ms) on every response
+            disable_nagle_algorithm = True
+
+            def _send(self, status: int, body: bytes = b"", content_type=None):
+                self.send_response(status)
+                if self.close_connection:
+                    # Tells keep-alive clients to reconnect for the next request
+                    self.send_header("Connection", "close")
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, payload: Dict) -> None:
+                self._send(status, json.dumps(payload).encode(), "application/json")
+
+            def _authorized(self) -> bool:
+                if not server.token:
+                    return True
+                scheme, _, credentials = self.headers.get(
+                    "Authorization", ""
+                ).partition(" ")
+                return scheme in ("Bearer", "Token") and hmac.compare_digest(
+                    credentials.encode(), server.token.encode()
+                )
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                # The body is left unread on every early answer, so the
+                # connection cannot be reused
+                if not self._authorized():
+                    self.close_connection = True
+                    self._send_json(401, {"error": "Unauthorized"})
+                    return
+
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.close_connection = True
+                    self._send_json(400, {"error": "Invalid Content-Length"})
+                    return
+                if length > MAX_BODY_BYTES:
+                    self.close_connection = True
+                    self._send_json(413, {"error": "Request body too large"})
+                    return
+                body = self.rfile.read(length)
+
+                status, payload = server.handle_write(
+                    url.path, body, parse_qs(url.query)
+                )
+                if status == 204:
+                    self._send(204)
+                else:
+                    self._send_json(status, payload)
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path == "/health":
+                    self._send_json(
+                        200,
+                        {
+                            "status": "ok",
+                            "pending": server.batcher.pending,
+                            "written": server.batcher.written,
+                            "failed": server.batcher.failed,
+                        },
+                    )
+                elif path == "/metrics":
+                    self._send(
+                        200,
+                        metrics.to_prometheus().encode(),
+                        "text/plain; version=0.0.4",
+                    )
+                else:
+                    self._send_json(404, {"error": "Not found"})
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def handle_write(
+        self, path: str, body: bytes, params: Dict[str, List[str]]
+    ) -> Tuple[int, Dict]:
+        """Parse, validate and queue one request; returns (status, response)"""
+        if path == "/ingest":
+            data_format = "json"
+        elif path in ("/write", "/api/v2/write"):
+            data_format = "line_protocol"
+        else:
+            return 404, {"error": "Not found"}
+
+        try:
+            if data_format == "json":
+                items = parse_json(body)
+            else:
+                precision = params.get("precision", ["ns"])[0]
+                items = parse_line_protocol(body.decode("utf-8"), precision)
+        except (ValueError, UnicodeDecodeError, OverflowError) as e:
+            metrics.increment("ingest_requests_total", format=data_format, status=400)
+            return 400, {"error": str(e)}
+
+        try:
+            records, quarantined = (
+                self.writer.prepare_records(items) if items else ([], [])
+            )
+        except (ValueError, TypeError, OverflowError) as e:
+            metrics.increment("ingest_requests_total", format=data_format, status=400)
+            return 400, {"error": f"Invalid record: {e}"}
+        if not self.batcher.add(records, quarantined):
+            metrics.increment("ingest_requests_total", format=data_format, status=503)
+            return 503, {"error": "Write buffer full, retry later"}
+
+        metrics.increment("ingest_requests_total", format=data_format, status=202)
+        metrics.increment("ingest_points_total", len(records))
+
+        # InfluxDB's write endpoint answers 204 No Content
+        if path == "/api/v2/write":
+            return 204, {}
+        return 202, {
+            "received": len(items),
+            "accepted": len(records),
+            "quarantined": len(quarantined),
+            "skipped": len(items) - len(records) - len(quarantined),
+        }
+
+    def __enter__(self) -> "IngestServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="fitlog-ingest", daemon=True
+        )
+        self._thread.start()
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Stop accepting requests and flush buffered records"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+        self.httpd.server_close()
+        return self.batcher.close(timeout)
+
+
+def make_payloads(
+    requests: int, records: int, data_format: str, start_ns: Optional[int] = None
+) -> List[Tuple[str, bytes]]:
+    """(path, body) pairs of heart rate samples, one second apart"""
+    start_ns = start_ns or time.time_ns() - requests * records * NANOS_PER_SECOND
+    payloads = []
+    for request in range(requests):
+        first = start_ns + request * records * NANOS_PER_SECOND
+        samples = [
+            (first + i * NANOS_PER_SECOND, random.randint(60, 100))
+            for i in range(records)
+        ]
+        if data_format == "json":
+            body = json.dumps(
+                [
+                    {"measurement": "heart_rate", "value": value, "timestamp_ns": ts}
+                    for ts, value in samples
+                ]
+            ).encode()
+            payloads.append(("/ingest", body))
+        else:
+            body = "\n".join(
+                f"heart_rate,unit=bpm value={value} {ts}" for ts, value in samples
+            ).encode()
+            payloads.append(("/write", body))
+    return payloads
+
+
+def load_test(
+    url: str,
+    payloads: List[Tuple[str, bytes]],
+    concurrency: int = 4,
+    token: Optional[str] = None,
+) -> Dict:
+    """Send payloads over keep-alive connections; returns throughput and latency"""
+    split = urlsplit(url)
+    headers = {"Content-Type": "application/octet-stream"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    latencies: List[float] = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(chunk: List[Tuple[str, bytes]]) -> None:
+        connection = http.client.HTTPConnection(split.hostname, split.port)
+        local = []
+        try:
+            for path, body in chunk:
+                started = time.perf_counter()
+                connection.request("POST", path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                local.append(time.perf_counter() - started)
+                if response.status >= 300:
+                    errors.append(response.status)
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(local)
+
+    threads = [
+        threading.Thread(target=client, args=(payloads[i::concurrency],))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "wall_seconds": wall_seconds,
+        "requests_per_second": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+    }
+
+
+@click.group()
+def main():
+    """Push ingestion service for health records"""
+
+
+@main.command()
+@click.option("--host", envvar="FITLOG_INGEST_HOST", default=DEFAULT_HOST)
+@click.option("--port", envvar="FITLOG_INGEST_PORT", default=DEFAULT_PORT)
+@click.option(
+    "--storage",
+    envvar="FITLOG_STORAGE",
+    type=click.Choice(STORAGE_BACKENDS),
+    default="influxdb",
+    help="Storage backend to write to",
+)
+@click.option("--batch-size", default=DEFAULT_BATCH_SIZE, help="Points per write")
+@click.option(
+    "--max-delay",
+    default=DEFAULT_MAX_DELAY,
+    help="Seconds a record may wait for its batch to fill",
+)
+def serve(host: str, port: int, storage: str, batch_size: int, max_delay: float):
+    """Accept pushed records and write them in batches"""
+    token = os.getenv("FITLOG_INGEST_TOKEN")
+    if not token:
+        logger.warning(
+            "FITLOG_INGEST_TOKEN is not set; accepting unauthenticated writes"
+        )
+
+    with create_writer(storage) as writer, GracefulShutdown() as shutdown:
+        server = IngestServer(writer, host, port, token, batch_size, max_delay)
+        server.start()
+        logger.info(f"Ingest server listening on {server.url}")
+        while not shutdown.requested.wait(1.0):
+            pass
+
+        # Stop accepting requests, then flush what is buffered until the deadline
+        written = server.batcher.written
+        failed = server.batcher.failed
+        finished = server.close(shutdown.remaining())
+        flushed = server.batcher.written - written
+        dropped = server.batcher.pending + server.batcher.failed - failed
+        logger.info(
+            f"Ingest server stopped: flushed {flushed} points, dropped {dropped}"
+            + ("" if finished else " (flush deadline passed)")
+        )
+
+
+@main.command()
+@click.option("--url", default=None, help="Server to load (default: in-process)")
+@click.option("--requests", "request_count", default=2000, help="Requests to send")
+@click.option("--records", default=100, help="Records per request")
+@click.option("--concurrency", default=4, help="Parallel client connections")
+@click.option(
+    "--format",
+    "data_format",
+    type=click.Choice(["json", "line_protocol"]),
+    default="json",
+)
+def bench(
+    url: Optional[str],
+    request_count: int,
+    records: int,
+    concurrency: int,
+    data_format: str,
+):
+    """Measure requests/s and latency of the ingest path"""
+    payloads = make_payloads(request_count, records, data_format)
+
+    if url:
+        result = load_test(url, payloads, concurrency, os.getenv("FITLOG_INGEST_TOKEN"))
+    else:
+        # In-process server writing to a local InfluxDB write sink
+        from .benchmark import FakeInfluxServer
+        from .influx_writer import InfluxWriter
+
+        metrics.reset()
+        with FakeInfluxServer() as sink:
+            writer = InfluxWriter(url=sink.url, token="benchmark")
+            with IngestServer(writer, port=0) as server:
+                result = load_test(server.url, payloads, concurrency)
+            writer.close()
+
+        ingest = [
+            entry["fields"]
+            for entry in metrics.snapshot()
+            if entry["name"] == "ingest_latency_seconds"
+        ]
+        if ingest:
+            fields = ingest[0]
+            result["end_to_end_mean"] = fields["sum"] / fields["count"]
+            result["end_to_end_max"] = fields["max"]
+
+    print(
+        f"{result['requests']} requests ({result['errors']} errors) in "
+        f"{result['wall_seconds']:.2f}s: {result['requests_per_second']:.0f} req/s, "
+        f"{result['requests_per_second'] * records:.0f} points/s"
+    )
+    print(
+        f"request latency p50 {result['latency_p50'] * 1000:.1f}ms, "
+        f"p95 {result['latency_p95'] * 1000:.1f}ms, "
+        f"p99 {result['latency_p99'] * 1000:.1f}ms"
+    )
+    if "end_to_end_mean" in result:
+        print(
+            f"end-to-end (request to stored) mean "
+            f"{result['end_to_end_mean'] * 1000:.1f}ms, "
+            f"max {result['end_to_end_max'] * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Run lifecycle: graceful shutdown on signals and per-measurement write reports
+"""
+
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .profiling import Profiler
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Seconds allowed for flushing buffered points after SIGTERM
+DEFAULT_SHUTDOWN_TIMEOUT = 10.0
+
+
+class GracefulShutdown:
+    """Turns SIGTERM/SIGINT into a flag that long-running work checks
+
+    The first signal requests shutdown: no new data is fetched or accepted, and
+    what is already buffered is written until `timeout` seconds have passed.
+    A second signal raises KeyboardInterrupt to stop immediately. Handlers are
+    only installed when entered on the main thread.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        signals: Tuple[int, ...] = (signal.SIGTERM, signal.SIGINT),
+    ):
+        if timeout is None:
+            timeout = float(
+                os.getenv("FITLOG_SHUTDOWN_TIMEOUT", DEFAULT_SHUTDOWN_TIMEOUT)
+            )
+        self.timeout = timeout
+        self.signals = signals
+        self.requested = threading.Event()
+        self.deadline: Optional[float] = None
+        self._previous: Dict[int, object] = {}
+
+    def __enter__(self) -> "GracefulShutdown":
+        if threading.current_thread() is threading.main_thread():
+            for signum in self.signals:
+                self._previous[signum] = signal.signal(signum, self._handle)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous.clear()
+
+    def _handle(self, signum, frame) -> None:
+        if self.requested.is_set():
+            raise KeyboardInterrupt
+        logger.warning(
+            f"Received {signal.Signals(signum).name}, flushing for up to "
+            f"{self.timeout:.0f}s (signal again to stop immediately)"
+        )
+        self.request()
+
+    def request(self) -> None:
+        """Request shutdown and start the flush deadline"""
+        if not self.requested.is_set():
+            self.deadline = time.monotonic() + self.timeout
+            self.requested.set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left to flush, or None if shutdown was not requested"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        """True once the flush deadline has passed"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def until_requested(
+        self, sources: Iterable[Tuple[str, List]]
+    ) -> Iterator[Tuple[str, List]]:
+        """Pass (data_type, data) batches through until shutdown is requested"""
+        for data_type, data in sources:
+            yield data_type, data
+            if self.requested.is_set():
+                logger.warning("Shutdown requested: not fetching remaining data")
+                return
+
+
+def restore_default_signals() -> None:
+    """Pool initializer so forked workers exit on SIGTERM/SIGINT as usual"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
+class WriteReport:
+    """Points written and dropped per data type during a run"""
+
+    def __init__(self):
+        self.written: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+        self.errors: List[Exception] = []
+
+    def add_written(self, data_type: str, points: int) -> None:
+        self.written[data_type] = self.written.get(data_type, 0) + points
+
+    def add_dropped(
+        self, data_type: str, points: int, error: Optional[Exception] = None
+    ) -> None:
+        self.dropped[data_type] = self.dropped.get(data_type, 0) + points
+        if error is not None:
+            self.errors.append(error)
+
+    @property
+    def total_written(self) -> int:
+        return sum(self.written.values())
+
+    @property
+    def total_dropped(self) -> int:
+        return sum(self.dropped.values())
+
+
+class PartialWriteError(RuntimeError):
+    """Raised after a run in which some data could not be written
+
+    The other data types were still written; `report` has the counts.
+    """
+
+    def __init__(self, report: WriteReport):
+        dropped = ", ".join(
+            f"{data_type}: {points}" for data_type, points in report.dropped.items()
+        )
+        super().__init__(
+            f"Wrote {report.total_written} points, dropped "
+            f"{report.total_dropped} ({dropped})"
+        )
+        self.report = report
+
+
+def write_all(
+    writer,
+    all_data: Dict[str, List[Dict]],
+    profiler: Optional[Profiler] = None,
+    shutdown: Optional[GracefulShutdown] = None,
+) -> Dict[str, int]:
+    """Write each data type, continuing past failures
+
+    Returns points written per data type. If any data type failed, or the
+    shutdown deadline passed before it was written, the rest are still written
+    and PartialWriteError is raised at the end.
+    """
+    profiler = profiler or Profiler()
+    report = WriteReport()
+
+    for data_type, data in all_data.items():
+        if not data:
+            continue
+        if shutdown is not None and shutdown.expired():
+            report.add_dropped(data_type, len(data))
+            continue
+
+        try:
+            with profiler.phase(f"write_health_data:{data_type}"):
+                points_written = writer.write_health_data(data)
+        except Exception as e:
+            # write_health_data has logged and counted the error
+            report.add_dropped(data_type, len(data), e)
+            continue
+
+        report.add_written(data_type, points_written)
+        logger.info(f"{data_type}: wrote {points_written} items to storage")
+
+    if report.dropped:
+        raise PartialWriteError(report)
+    return report.written
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Internal metrics (timers and counters) for fetch/write runs
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Measurement that internal metrics are written to
+INTERNAL_MEASUREMENT = "fitlog_internal"
+
+# Prefix for metric names in the Prometheus text format
+PROMETHEUS_PREFIX = "fitlog_"
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, tags: Dict[str, str]) -> MetricKey:
+    return name, tuple(sorted((key, str(val)) for key, val in tags.items()))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(fraction * len(sorted_values))))
+    return sorted_values[rank]
+
+
+class Metrics:
+    """Registry of counters and timers collected during a run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[MetricKey, float] = {}
+        self._timers: Dict[MetricKey, List[float]] = {}
+
+    def reset(self) -> None:
+        """Discard all collected metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def increment(self, name: str, value: float = 1, **tags) -> None:
+        """Add value to a counter"""
+        key = _key(name, tags)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **tags) -> None:
+        """Record a duration for a timer"""
+        key = _key(name, tags)
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                # count, sum, max
+                self._timers[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **tags) -> Iterator[None]:
+        """Time the enclosed block, recording it even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **tags)
+
+    def counter_value(self, name: str, **tags) -> float:
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get(_key(name, tags), 0)
+
+    def snapshot(self) -> List[Dict]:
+        """Collected metrics as a list of {name, type, tags, fields} entries"""
+        entries = []
+        with self._lock:
+            for (name, tags), value in sorted(self._counters.items()):
+                entries.append(
+                    {
+                        "name": name,
+                        "type": "counter",
+                        "tags": dict(tags),
+                        "fields": {"value": float(value)},
+                    }
+                )
+            for (name, tags), (count, total, maximum) in sorted(self._timers.items()):
+                entries.append(
+                    {
+                        "name": name,
+                        "type": "timer",
+                        "tags": dict(tags),
+                        "fields": {
+                            "count": int(count),
+                            "sum": total,
+                            "max": maximum,
+                            "mean": total / count,
+                        },
+                    }
+                )
+        return entries
+
+    def to_prometheus(self) -> str:
+        """Render collected metrics in the Prometheus text exposition format"""
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def labels(tags: Dict[str, str]) -> str:
+            if not tags:
+                return ""
+            pairs = ",".join(
+                '{}="{}"'.format(
+                    key,
+                    val.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+                )
+                for key, val in tags.items()
+            )
+            return "{" + pairs + "}"
+
+        def add(name: str, metric_type: str, sample: str) -> None:
+            families.setdefault(name, (metric_type, []))[1].append(sample)
+
+        for entry in self.snapshot():
+            name = PROMETHEUS_PREFIX + entry["name"]
+            tags = labels(entry["tags"])
+            fields = entry["fields"]
+            if entry["type"] == "counter":
+                add(name, "counter", f"{name}{tags} {fields['value']}")
+            else:
+                add(name, "summary", f"{name}_count{tags} {fields['count']}")
+                add(name, "summary", f"{name}_sum{tags} {fields['sum']}")
+                add(f"{name}_max", "gauge", f"{name}_max{tags} {fields['max']}")
+
+        lines = []
+        for name, (metric_type, samples) in families.items():
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}last_run_timestamp_seconds gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}last_run_timestamp_seconds {time.time()}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Write metrics to a Prometheus text file (e.g. for a textfile collector)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write atomically so a scraper never reads a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        logger.info(f"Metrics written to {path}")
+
+
+# Default registry shared by the fetch and write paths
+metrics = Metrics()
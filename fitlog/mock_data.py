@@ -5,15 +5,28 @@ Generates realistic health data without requiring Google Fit API authentication
 """
 
 import logging
+import multiprocessing
 import random
-from datetime import datetime, timedelta
-from typing import Dict, List
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
 import click
 import pytz
 from dotenv import load_dotenv
 
-from .influx_writer import InfluxWriter
+from .lifecycle import (
+    GracefulShutdown,
+    PartialWriteError,
+    restore_default_signals,
+    write_all,
+)
+from .metrics import metrics, percentile
+from .pipeline import DEFAULT_BATCH_SIZE
+from .profiling import Profiler
+from .snapshot import SnapshotStore
+from .storage import STORAGE_BACKENDS, create_writer
+from .timeutil import NANOS_PER_SECOND, LocalDayCache
 
 # Load environment variables
 load_dotenv()
@@ -28,18 +41,27 @@ logger = logging.getLogger(__name__)
 class MockDataGenerator:
     """Mock health data generator for demonstration purposes"""
 
-    def __init__(self, timezone_str: str = "Asia/Tokyo"):
+    def __init__(self, timezone_str: str = "Asia/Tokyo", seed: Optional[int] = None):
         self.timezone = pytz.timezone(timezone_str)
+        self.days = LocalDayCache(self.timezone)
+
+        # Per-person baseline; generators sharing a seed describe the same person
+        rng = random.Random(seed)
+        self.base_weight = rng.uniform(60.0, 80.0)
+        # Slow trend in kg per day, so day-to-day changes stay realistic
+        self.weight_trend = rng.uniform(-0.01, 0.01)
+
+    def _today(self) -> date:
+        return datetime.now(self.timezone).date()
 
-    def generate_steps_data(self, days: int = 7) -> List[Dict]:
+    def generate_steps_data(self, days: int = 7, start_day: int = 0) -> List[Dict]:
         """Generate mock step count data"""
         data = []
-        now = datetime.now(self.timezone)
+        today = self._today()
 
-        for day in range(days):
+        for day in range(start_day, start_day + days):
             # Generate data for each hour of the day
-            day_start = now - timedelta(days=day)
-            day_start = day_start.replace(hour=6, minute=0, second=0, microsecond=0)
+            day_date = today - timedelta(days=day)
 
             daily_steps = 0
             hourly_base_steps = (
@@ -47,7 +69,7 @@ class MockDataGenerator:
             )  # Spread over ~18 active hours
 
             for hour in range(18):  # 6 AM to 11 PM
-                hour_time = day_start + timedelta(hours=hour)
+                hour_time = self.days.local_ns(day_date, 6 + hour)
 
                 # More steps during active hours (morning, lunch, evening)
                 if hour in [1, 2, 6, 7, 11, 12]:  # 7-8 AM, 12-1 PM, 5-6 PM
@@ -66,60 +88,52 @@ class MockDataGenerator:
                     {
                         "measurement": "steps",
                         "value": steps,
-                        "timestamp": int(hour_time.timestamp()),
+                        "timestamp_ns": hour_time,
                     }
                 )
 
-            logger.info(
-                f"Generated {daily_steps} steps for {day_start.strftime('%Y-%m-%d')}"
-            )
+            logger.info(f"Generated {daily_steps} steps for {day_date.isoformat()}")
 
         return data
 
-    def generate_weight_data(self, days: int = 7) -> List[Dict]:
+    def generate_weight_data(self, days: int = 7, start_day: int = 0) -> List[Dict]:
         """Generate mock weight data"""
         data = []
-        now = datetime.now(self.timezone)
+        today = self._today()
 
-        # Base weight with slight variations
-        base_weight = random.uniform(60.0, 80.0)
-
-        for day in range(days):
-            day_time = now - timedelta(days=day)
+        for day in range(start_day, start_day + days):
             # Weight measurements typically in the morning
-            day_time = day_time.replace(
-                hour=7, minute=random.randint(0, 30), second=0, microsecond=0
+            day_time = self.days.local_ns(
+                today - timedelta(days=day), 7, random.randint(0, 30)
             )
 
             # Small daily variations
             weight_variation = random.uniform(-0.5, 0.5)
-            weight = base_weight + weight_variation + (random.uniform(-0.1, 0.1) * day)
+            weight = self.base_weight + weight_variation + self.weight_trend * day
             weight = round(weight, 1)
 
             data.append(
                 {
                     "measurement": "weight",
                     "value": weight,
-                    "timestamp": int(day_time.timestamp()),
+                    "timestamp_ns": day_time,
                 }
             )
 
         return data
 
-    def generate_heart_rate_data(self, days: int = 7) -> List[Dict]:
+    def generate_heart_rate_data(self, days: int = 7, start_day: int = 0) -> List[Dict]:
         """Generate mock heart rate data"""
         data = []
-        now = datetime.now(self.timezone)
+        today = self._today()
 
-        for day in range(days):
-            day_start = now - timedelta(days=day)
+        for day in range(start_day, start_day + days):
+            day_date = today - timedelta(days=day)
 
             # Generate heart rate data every 30 minutes during active hours
             for hour in range(6, 23):  # 6 AM to 11 PM
                 for minute in [0, 30]:
-                    measure_time = day_start.replace(
-                        hour=hour, minute=minute, second=0, microsecond=0
-                    )
+                    measure_time = self.days.local_ns(day_date, hour, minute)
 
                     # Base heart rate varies by time of day
                     if 6 <= hour <= 8:  # Morning
@@ -139,22 +153,21 @@ class MockDataGenerator:
                         {
                             "measurement": "heart_rate",
                             "value": heart_rate,
-                            "timestamp": int(measure_time.timestamp()),
+                            "timestamp_ns": measure_time,
                         }
                     )
 
         return data
 
-    def generate_sleep_data(self, days: int = 7) -> List[Dict]:
+    def generate_sleep_data(self, days: int = 7, start_day: int = 0) -> List[Dict]:
         """Generate mock sleep data"""
         data = []
-        now = datetime.now(self.timezone)
+        today = self._today()
 
-        for day in range(days):
+        for day in range(start_day, start_day + days):
             # Sleep period: 11 PM to 7 AM next day
-            sleep_start = now - timedelta(days=day)
-            sleep_start = sleep_start.replace(
-                hour=23, minute=random.randint(0, 30), second=0, microsecond=0
+            sleep_start = self.days.local_ns(
+                today - timedelta(days=day), 23, random.randint(0, 30)
             )
 
             # Sleep duration: 6-9 hours
@@ -186,50 +199,48 @@ class MockDataGenerator:
                     {
                         "measurement": "sleep",
                         "value": segment_duration,
-                        "timestamp": int(current_time.timestamp()),
+                        "timestamp_ns": current_time,
                         "sleep_type": 4,  # Light sleep
                     }
                 )
-                current_time += timedelta(seconds=segment_duration)
+                current_time += segment_duration * NANOS_PER_SECOND
 
             # Deep sleep period
             data.append(
                 {
                     "measurement": "sleep",
                     "value": deep_sleep_duration,
-                    "timestamp": int(current_time.timestamp()),
+                    "timestamp_ns": current_time,
                     "sleep_type": 5,  # Deep sleep
                 }
             )
-            current_time += timedelta(seconds=deep_sleep_duration)
+            current_time += deep_sleep_duration * NANOS_PER_SECOND
 
             # REM sleep period
             data.append(
                 {
                     "measurement": "sleep",
                     "value": rem_sleep_duration,
-                    "timestamp": int(current_time.timestamp()),
+                    "timestamp_ns": current_time,
                     "sleep_type": 6,  # REM sleep
                 }
             )
 
         return data
 
-    def generate_calories_data(self, days: int = 7) -> List[Dict]:
+    def generate_calories_data(self, days: int = 7, start_day: int = 0) -> List[Dict]:
         """Generate mock calorie consumption data"""
         data = []
-        now = datetime.now(self.timezone)
+        today = self._today()
 
-        for day in range(days):
-            day_start = now - timedelta(days=day)
+        for day in range(start_day, start_day + days):
+            day_date = today - timedelta(days=day)
 
             # Generate calorie data every 2 hours during active time
             daily_calories = 0
 
             for hour in range(6, 23, 2):  # Every 2 hours from 6 AM to 11 PM
-                measure_time = day_start.replace(
-                    hour=hour, minute=0, second=0, microsecond=0
-                )
+                measure_time = self.days.local_ns(day_date, hour)
 
                 # Calorie burn varies by time (higher during activity periods)
                 if hour in [7, 12, 18]:  # Meal/activity times
@@ -245,66 +256,271 @@ class MockDataGenerator:
                     {
                         "measurement": "calories",
                         "value": calories,
-                        "timestamp": int(measure_time.timestamp()),
+                        "timestamp_ns": measure_time,
                     }
                 )
 
             logger.info(
-                f"Generated {daily_calories} calories for {day_start.strftime('%Y-%m-%d')}"
+                f"Generated {daily_calories} calories for {day_date.isoformat()}"
             )
 
         return data
 
-    def generate_all_mock_data(self, days: int = 7) -> Dict[str, List[Dict]]:
-        """Generate all types of mock health data"""
+    def generate_all_mock_data(
+        self, days: int = 7, start_day: int = 0
+    ) -> Dict[str, List[Dict]]:
+        """Generate all types of mock health data
+
+        Covers `days` days ending `start_day` days before today, so day ranges
+        can be generated independently and combined.
+        """
         logger.info(f"Generating mock health data for {days} days")
 
         return {
-            "steps": self.generate_steps_data(days),
-            "weight": self.generate_weight_data(days),
-            "heart_rate": self.generate_heart_rate_data(days),
-            "sleep": self.generate_sleep_data(days),
-            "calories": self.generate_calories_data(days),
+            "steps": self.generate_steps_data(days, start_day),
+            "weight": self.generate_weight_data(days, start_day),
+            "heart_rate": self.generate_heart_rate_data(days, start_day),
+            "sleep": self.generate_sleep_data(days, start_day),
+            "calories": self.generate_calories_data(days, start_day),
         }
 
 
+def split_days(days: int, shards: int) -> List[Tuple[int, int]]:
+    """Split `days` into up to `shards` contiguous (start_day, days) ranges"""
+    shards = max(1, min(shards, days))
+    size, extra = divmod(days, shards)
+    ranges = []
+    start_day = 0
+    for shard in range(shards):
+        shard_days = size + (1 if shard < extra else 0)
+        ranges.append((start_day, shard_days))
+        start_day += shard_days
+    return ranges
+
+
+def _ingest_shard(
+    storage: Optional[str], start_day: int, days: int, batch_size: int, seed: int
+) -> Dict:
+    """Worker process: generate a day range and write it in batches"""
+    random.seed(seed + start_day)
+    generator = MockDataGenerator(seed=seed)
+
+    generate_started = time.perf_counter()
+    all_data = generator.generate_all_mock_data(days, start_day)
+    generate_seconds = time.perf_counter() - generate_started
+
+    generated = sum(len(data) for data in all_data.values())
+    points = 0
+    latencies = []
+
+    if storage is not None:
+        with create_writer(storage) as writer:
+            for data in all_data.values():
+                for start in range(0, len(data), batch_size):
+                    batch_started = time.perf_counter()
+                    points += writer.write_health_data(data[start : start + batch_size])
+                    latencies.append(time.perf_counter() - batch_started)
+
+    return {
+        "generated": generated,
+        "points": points,
+        "generate_seconds": generate_seconds,
+        "latencies": latencies,
+    }
+
+
+def run_parallel_ingest(
+    days: int,
+    workers: int,
+    storage: Optional[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    seed: Optional[int] = None,
+) -> Dict:
+    """Generate and write mock data with one process per day shard
+
+    Each worker runs its own generator and writer, so ingest is limited by
+    the storage backend rather than by one Python process. Pass storage=None
+    to only generate. Returns totals, throughput and batch write latency.
+    """
+    seed = random.randrange(2**32) if seed is None else seed
+    shards = split_days(days, workers)
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(len(shards), initializer=restore_default_signals) as pool:
+        results = pool.starmap(
+            _ingest_shard,
+            [
+                (storage, start_day, shard_days, batch_size, seed)
+                for start_day, shard_days in shards
+            ],
+        )
+    wall_seconds = time.perf_counter() - started
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    for latency in latencies:
+        metrics.observe("mock_batch_write_seconds", latency)
+
+    points = sum(result["points"] for result in results)
+    if points:
+        metrics.increment("points_written_total", points)
+
+    return {
+        "workers": len(shards),
+        "generated": sum(result["generated"] for result in results),
+        "points": points,
+        "batches": len(latencies),
+        "wall_seconds": wall_seconds,
+        "points_per_second": points / wall_seconds if wall_seconds else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else 0.0,
+    }
+
+
 @click.command()
 @click.option("--days", default=7, help="Number of days of mock data to generate")
 @click.option(
     "--dry-run", is_flag=True, help="Show generated data without writing to database"
 )
-def main(days: int, dry_run: bool):
+@click.option(
+    "--metrics-file",
+    envvar="FITLOG_METRICS_FILE",
+    default=None,
+    help="Write run metrics to this Prometheus text file",
+)
+@click.option(
+    "--internal-metrics/--no-internal-metrics",
+    default=True,
+    help="Write run metrics to the fitlog_internal measurement",
+)
+@click.option(
+    "--storage",
+    envvar="FITLOG_STORAGE",
+    type=click.Choice(STORAGE_BACKENDS),
+    default="influxdb",
+    help="Storage backend to write to",
+)
+@click.option(
+    "--workers",
+    default=1,
+    help="Generate and write day shards in this many processes (stress test)",
+)
+@click.option(
+    "--batch-size",
+    default=DEFAULT_BATCH_SIZE,
+    help="Points per write request when using --workers",
+)
+@click.option("--profile", is_flag=True, help="Profile the run per phase")
+@click.option(
+    "--profile-output",
+    default="fitlog-mock-profile",
+    help="Path prefix for the profile report and dump",
+)
+def main(
+    days: int,
+    dry_run: bool,
+    metrics_file: Optional[str],
+    internal_metrics: bool,
+    storage: str,
+    workers: int,
+    batch_size: int,
+    profile: bool,
+    profile_output: str,
+):
     """Generate mock health data for demonstration purposes"""
+    profiler = Profiler(enabled=profile, output=profile_output)
+    writer = None
+    partial = None
     try:
-        # Generate mock data
-        generator = MockDataGenerator()
-        all_data = generator.generate_all_mock_data(days)
-
-        if dry_run:
-            logger.info("DRY RUN MODE: Generated mock data (not writing to database)")
-            for data_type, data in all_data.items():
-                logger.info(f"{data_type}: {len(data)} data points")
-            return
-
-        # Write to InfluxDB
-        influx_writer = InfluxWriter()
-
-        total_points = 0
-        for data_type, data in all_data.items():
-            if data:
-                points_written = influx_writer.write_health_data(data)
-                total_points += points_written
-                logger.info(f"{data_type}: {points_written} points written to InfluxDB")
-
-        logger.info(f"Successfully wrote {total_points} mock data points to InfluxDB")
-        logger.info(
-            "Mock data generation completed! You can now view dashboards in Grafana."
-        )
+        with profiler.run(), GracefulShutdown() as shutdown:
+            if workers > 1:
+                # Sharded stress ingest; workers generate and write in parallel
+                with profiler.phase("parallel_ingest"):
+                    summary = run_parallel_ingest(
+                        days, workers, None if dry_run else storage, batch_size
+                    )
+
+                logger.info(
+                    f"{summary['workers']} workers: generated "
+                    f"{summary['generated']} points, wrote {summary['points']} "
+                    f"in {summary['batches']} batches in "
+                    f"{summary['wall_seconds']:.2f}s "
+                    f"({summary['points_per_second']:.0f} points/s)"
+                )
+                if dry_run:
+                    logger.info("DRY RUN MODE: nothing was written")
+                    return
+
+                logger.info(
+                    "Batch write latency: "
+                    f"p50 {summary['latency_p50'] * 1000:.1f}ms, "
+                    f"p95 {summary['latency_p95'] * 1000:.1f}ms, "
+                    f"p99 {summary['latency_p99'] * 1000:.1f}ms, "
+                    f"max {summary['latency_max'] * 1000:.1f}ms"
+                )
+                writer = create_writer(storage)
+
+            else:
+                # Generate mock data
+                generator = MockDataGenerator()
+                with profiler.phase("generate_all_mock_data"):
+                    with metrics.timer("generate_seconds"):
+                        all_data = generator.generate_all_mock_data(days)
+
+                snapshot = SnapshotStore.from_env()
+                if snapshot is not None:
+                    with profiler.phase("update_snapshot"):
+                        for data in all_data.values():
+                            snapshot.update(data)
+
+                if dry_run:
+                    logger.info(
+                        "DRY RUN MODE: Generated mock data (not writing to database)"
+                    )
+                    for data_type, data in all_data.items():
+                        logger.info(f"{data_type}: {len(data)} data points")
+                    return
+
+                # Write to storage
+                writer = create_writer(storage)
+
+                # A failed data type does not stop the others
+                try:
+                    written = write_all(writer, all_data, profiler, shutdown)
+                except PartialWriteError as e:
+                    partial = e
+                    written = e.report.written
+
+                logger.info(
+                    f"Successfully wrote {sum(written.values())} mock data points "
+                    "to storage"
+                )
+
+            logger.info(
+                "Mock data generation completed! You can now view dashboards in Grafana."
+            )
+
+            if not shutdown.expired():
+                with profiler.phase("apply_retention"):
+                    writer.apply_retention()
+
+            if internal_metrics:
+                writer.write_internal_metrics(tags={"command": "mock"})
+
+            if partial is not None:
+                raise partial
 
     except Exception as e:
         logger.error(f"Mock data generation failed: {e}")
         raise
 
+    finally:
+        if writer is not None:
+            writer.close()
+        if metrics_file:
+            metrics.write_prometheus(metrics_file)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Pipelined fetch/write: batches are written while the next source is fetched
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .lifecycle import GracefulShutdown, PartialWriteError, WriteReport
+from .metrics import metrics
+from .profiling import Profiler
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Default number of batches that may wait for the writer
+DEFAULT_QUEUE_SIZE = 4
+
+# Default maximum number of points per queued batch
+DEFAULT_BATCH_SIZE = 5000
+
+_DONE = object()
+
+
+def run_pipeline(
+    sources: Iterable[Tuple[str, List[Dict]]],
+    writer,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    profiler: Optional[Profiler] = None,
+    shutdown: Optional[GracefulShutdown] = None,
+) -> Dict[str, int]:
+    """Write each (data_type, data) batch on a writer thread as it is produced
+
+    The calling thread consumes `sources` (e.g. GoogleFitClient.iter_data) while
+    a single writer thread drains a bounded queue, so API and database time
+    overlap and at most `queue_size` batches are held in memory. Each data type
+    is built and validated as a whole before it is split into batches, so
+    duplicate and rate-of-change checks see the same points as a serial write.
+    Returns the number of points written per data type. A failed batch does
+    not stop the others; PartialWriteError is raised at the end instead. On
+    shutdown no further sources are read and queued batches are written until
+    the deadline.
+    """
+    profiler = profiler or Profiler()
+    batches: queue.Queue = queue.Queue(maxsize=queue_size)
+    report = WriteReport()
+    # Set when the caller is interrupted; queued batches are then dropped
+    abort = threading.Event()
+    unprepared: List[Tuple[str, int, Exception]] = []
+
+    def consume() -> None:
+        while True:
+            item = batches.get()
+            if item is _DONE:
+                return
+
+            data_type, records, quarantined = item
+            if abort.is_set() or (shutdown is not None and shutdown.expired()):
+                # Keep draining so the producer never blocks on a full queue
+                report.add_dropped(data_type, len(records) + len(quarantined))
+                continue
+
+            try:
+                with profiler.phase(f"write_health_data:{data_type}"):
+                    points_written = writer.write_prepared(records, quarantined)
+                report.add_written(data_type, points_written)
+                logger.info(f"{data_type}: wrote {points_written} items to storage")
+            except Exception as e:
+                report.add_dropped(data_type, len(records) + len(quarantined), e)
+
+    thread = threading.Thread(target=consume, name="fitlog-writer", daemon=True)
+    thread.start()
+
+    if shutdown is not None:
+        sources = shutdown.until_requested(sources)
+
+    try:
+        for data_type, data in sources:
+            if not data:
+                continue
+            try:
+                with profiler.phase(f"prepare_records:{data_type}"):
+                    records, quarantined = writer.prepare_records(data)
+            except Exception as e:
+                logger.error(f"{data_type}: could not build records: {e}")
+                # The report belongs to the writer thread until it is joined
+                unprepared.append((data_type, len(data), e))
+                continue
+
+            # Quarantined records go with the first batch
+            for start in range(0, max(len(records), 1), batch_size):
+                wait_started = time.perf_counter()
+                batches.put(
+                    (
+                        data_type,
+                        records[start : start + batch_size],
+                        quarantined if start == 0 else [],
+                    )
+                )
+                metrics.observe(
+                    "pipeline_queue_wait_seconds", time.perf_counter() - wait_started
+                )
+    except BaseException:
+        abort.set()
+        raise
+    finally:
+        batches.put(_DONE)
+        thread.join()
+
+    for data_type, points, error in unprepared:
+        report.add_dropped(data_type, points, error)
+    if report.dropped:
+        raise PartialWriteError(report)
+
+    return report.written
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Low-overhead profiling for the fitlog CLI entry points
+"""
+
+import cProfile
+import logging
+import signal
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Sampling interval of the stack sampler (seconds of CPU time)
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class StackSampler:
+    """Statistical profiler sampling the main thread's stack on SIGPROF"""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: Dict[str, int] = {}
+        self._previous_handler = None
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+    def _handle(self, signum, frame) -> None:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+            frame = frame.f_back
+        stack = ";".join(reversed(names))
+        self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def start(self) -> None:
+        self._previous_handler = signal.signal(signal.SIGPROF, self._handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def dump(self, path: str) -> None:
+        """Write samples as collapsed stacks (flamegraph.pl / speedscope input)"""
+        with open(path, "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit: int = 15) -> List[tuple]:
+        """Functions with the most self samples"""
+        totals: Dict[str, int] = {}
+        for stack, count in self.samples.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            totals[leaf] = totals.get(leaf, 0) + count
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class Profiler:
+    """Per-phase wall/CPU breakdown plus a profile dump for a CLI run"""
+
+    def __init__(self, enabled: bool = False, output: str = "fitlog-profile"):
+        self.enabled = enabled
+        self.output = output
+        self.phases: Dict[str, List[float]] = {}
+        self._sampler: Optional[StackSampler] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Attribute wall and CPU time of the enclosed block to a phase"""
+        if not self.enabled:
+            yield
+            return
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            # calls, wall, cpu
+            stats = self.phases.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+
+    @contextmanager
+    def run(self) -> Iterator[None]:
+        """Profile the enclosed run and write the report when it finishes"""
+        if not self.enabled:
+            yield
+            return
+
+        # The SIGPROF sampler only exists on Unix; fall back to cProfile elsewhere
+        if StackSampler.available():
+            self._sampler = StackSampler()
+            self._sampler.start()
+        else:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+        try:
+            with self.phase("total"):
+                yield
+        finally:
+            if self._sampler:
+                self._sampler.stop()
+            if self._cprofile:
+                self._cprofile.disable()
+            self.write_report()
+
+    def report(self) -> str:
+        """Per-phase breakdown (and top sampled functions) as text"""
+        lines = [f"{'phase':<32} {'calls':>6} {'wall s':>10} {'cpu s':>10}"]
+        for name, (calls, wall, cpu) in self.phases.items():
+            lines.append(f"{name:<32} {calls:>6} {wall:>10.3f} {cpu:>10.3f}")
+
+        if self._sampler and self._sampler.samples:
+            total = sum(self._sampler.samples.values())
+            lines.append("")
+            lines.append(
+                f"{'top functions (self samples)':<60} {'samples':>8} {'%':>6}"
+            )
+            for function, count in self._sampler.top_functions():
+                lines.append(f"{function:<60} {count:>8} {100 * count / total:>6.1f}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_report(self) -> None:
+        """Write the phase breakdown and the profile dump next to each other"""
+        report_path = f"{self.output}.txt"
+        with open(report_path, "w") as f:
+            f.write(self.report())
+
+        if self._sampler:
+            dump_path = f"{self.output}.folded"
+            self._sampler.dump(dump_path)
+        else:
+            dump_path = f"{self.output}.prof"
+            self._cprofile.dump_stats(dump_path)
+
+        sys.stderr.write(self.report())
+        logger.info(f"Profile written to {report_path} and {dump_path}")
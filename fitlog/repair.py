@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Detect coverage gaps in stored data and re-fetch only the missing intervals
+"""
+
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import click
+from dotenv import load_dotenv
+
+from .fetch import GoogleFitClient
+from .metrics import metrics
+from .retention import RetentionPolicy
+from .storage import STORAGE_BACKENDS, StorageBackend, create_writer
+from .timeutil import NANOS_PER_SECOND
+
+# Load environment variables
+load_dotenv()
+
+# Log configuration
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class Coverage(NamedTuple):
+    """Expected sampling density of a measurement"""
+
+    window_seconds: int
+    min_count: int
+
+
+# Window size and minimum points per window for a window to count as covered.
+# Weight is logged manually and has no expected density, so it is not scanned.
+EXPECTED_COVERAGE = {
+    "steps": Coverage(86400, 1),
+    "calories": Coverage(86400, 1),
+    "heart_rate": Coverage(21600, 1),
+    "sleep": Coverage(86400, 1),
+}
+
+# Windows with fewer points than this fraction of the median non-empty window
+# are treated as partially missing
+DEFAULT_MIN_RATIO = 0.1
+
+# Longest interval fetched in a single Google Fit request
+DEFAULT_MAX_INTERVAL_SECONDS = 86400
+
+
+def find_gaps(
+    counts: List[Tuple[int, int]],
+    window_ns: int,
+    min_count: int = 1,
+    min_ratio: float = DEFAULT_MIN_RATIO,
+) -> List[Tuple[int, int]]:
+    """Merge under-filled windows into (start_ns, end_ns) gap intervals
+
+    A window is a gap when it holds fewer than max(min_count, min_ratio x the
+    median count of non-empty windows) points.
+    """
+    non_empty = [count for _, count in counts if count > 0]
+    median = statistics.median(non_empty) if non_empty else 0
+    threshold = max(min_count, min_ratio * median)
+
+    gaps: List[Tuple[int, int]] = []
+    for window_start, count in counts:
+        if count >= threshold:
+            continue
+        window_end = window_start + window_ns
+        if gaps and gaps[-1][1] == window_start:
+            gaps[-1] = (gaps[-1][0], window_end)
+        else:
+            gaps.append((window_start, window_end))
+
+    return gaps
+
+
+def split_intervals(
+    intervals: List[Tuple[int, int]], max_length_ns: int
+) -> List[Tuple[int, int]]:
+    """Split intervals into pieces no longer than max_length_ns"""
+    pieces = []
+    for start, end in intervals:
+        while start < end:
+            pieces.append((start, min(start + max_length_ns, end)))
+            start += max_length_ns
+    return pieces
+
+
+def scan_gaps(
+    writer: StorageBackend,
+    measurements: List[str],
+    start_ns: int,
+    end_ns: int,
+    min_ratio: float = DEFAULT_MIN_RATIO,
+    policy: Optional[RetentionPolicy] = None,
+) -> Dict[str, List[Tuple[int, int]]]:
+    """Find coverage gaps per measurement with one windowed count query each
+
+    Raw data of downsampled measurements is only scanned within the raw
+    retention of `policy`, since older points were pruned on purpose.
+    """
+    gaps = {}
+    for measurement in measurements:
+        coverage = EXPECTED_COVERAGE[measurement]
+        window_ns = coverage.window_seconds * NANOS_PER_SECOND
+
+        # Align to whole windows and leave out the current, incomplete one
+        aligned_start = start_ns - start_ns % window_ns
+        aligned_end = end_ns - end_ns % window_ns
+
+        cutoff_ns = policy.raw_cutoff_ns(measurement, end_ns) if policy else None
+        if cutoff_ns is not None and cutoff_ns > aligned_start:
+            # Start at the first window that was not partly pruned
+            aligned_start = -(-cutoff_ns // window_ns) * window_ns
+            if aligned_start >= aligned_end:
+                gaps[measurement] = []
+                continue
+
+        with metrics.timer("gap_scan_seconds", measurement=measurement):
+            counts = writer.count_windows(
+                measurement, aligned_start, aligned_end, window_ns
+            )
+
+        gaps[measurement] = find_gaps(counts, window_ns, coverage.min_count, min_ratio)
+        logger.info(
+            f"{measurement}: {len(gaps[measurement])} gaps in {len(counts)} windows"
+        )
+    return gaps
+
+
+def refetch_gaps(
+    fit_client: GoogleFitClient,
+    writer: StorageBackend,
+    gaps: Dict[str, List[Tuple[int, int]]],
+    workers: int = 4,
+    max_interval_ns: int = DEFAULT_MAX_INTERVAL_SECONDS * NANOS_PER_SECOND,
+) -> Dict[str, int]:
+    """Re-fetch gap intervals in parallel and write what was recovered"""
+    tasks = [
+        (measurement, start, end)
+        for measurement, intervals in gaps.items()
+        for start, end in split_intervals(intervals, max_interval_ns)
+    ]
+    if not tasks:
+        return {}
+
+    # One API client per worker thread
+    local = threading.local()
+
+    def fetch(measurement: str, start: int, end: int) -> List[Dict]:
+        if not hasattr(local, "client"):
+            local.client = fit_client.fork()
+        return local.client.get_fetchers()[measurement](start, end)
+
+    recovered: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, *task): task for task in tasks}
+
+        # Writes stay on this thread, as results arrive
+        for future in as_completed(futures):
+            measurement, start, end = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                logger.error(f"{measurement} re-fetch error ({start}-{end}): {e}")
+                continue
+
+            if not data:
+                continue
+            try:
+                written = writer.write_health_data(data)
+            except Exception as e:
+                # write_health_data has logged and counted the error; the
+                # interval stays a gap and is picked up by the next repair
+                logger.error(f"{measurement} write error ({start}-{end}): {e}")
+                continue
+            recovered[measurement] = recovered.get(measurement, 0) + written
+
+    return recovered
+
+
+@click.command()
+@click.option("--days", default=30, help="Number of days of history to scan")
+@click.option(
+    "--measurement",
+    "measurements",
+    multiple=True,
+    type=click.Choice(list(EXPECTED_COVERAGE)),
+    help="Measurement to scan (default: all with an expected density)",
+)
+@click.option(
+    "--min-ratio",
+    default=DEFAULT_MIN_RATIO,
+    help="Flag windows below this fraction of the median window count",
+)
+@click.option("--workers", default=4, help="Parallel Google Fit requests")
+@click.option(
+    "--storage",
+    envvar="FITLOG_STORAGE",
+    type=click.Choice(STORAGE_BACKENDS),
+    default="influxdb",
+    help="Storage backend to scan and repair",
+)
+@click.option("--dry-run", is_flag=True, help="Only report gaps, do not re-fetch")
+def main(
+    days: int,
+    measurements: tuple,
+    min_ratio: float,
+    workers: int,
+    storage: str,
+    dry_run: bool,
+):
+    """Find coverage gaps in stored data and re-fetch them from Google Fit"""
+    try:
+        with create_writer(storage) as writer:
+            end_ns = time.time_ns()
+            start_ns = end_ns - days * 86400 * NANOS_PER_SECOND
+
+            gaps = scan_gaps(
+                writer,
+                list(measurements or EXPECTED_COVERAGE),
+                start_ns,
+                end_ns,
+                min_ratio,
+                writer.retention,
+            )
+
+            total_gaps = sum(len(intervals) for intervals in gaps.values())
+            if dry_run or not total_gaps:
+                for measurement, intervals in gaps.items():
+                    for start, end in intervals:
+                        hours = (end - start) / NANOS_PER_SECOND / 3600
+                        since = datetime.fromtimestamp(start / NANOS_PER_SECOND)
+                        logger.info(
+                            f"{measurement}: gap of {hours:.0f}h "
+                            f"from {since.isoformat()}"
+                        )
+                logger.info(f"Found {total_gaps} gaps")
+                return
+
+            # Authenticate once here: worker threads fork this client, and
+            # concurrent first-time authentication would race on the token file
+            fit_client = GoogleFitClient()
+            fit_client.authenticate()
+
+            recovered = refetch_gaps(fit_client, writer, gaps, workers)
+            for measurement, count in recovered.items():
+                logger.info(f"{measurement}: recovered {count} data points")
+            logger.info(
+                f"Repaired {total_gaps} gaps, "
+                f"recovered {sum(recovered.values())} points"
+            )
+
+    except Exception as e:
+        logger.error(f"Repair error: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
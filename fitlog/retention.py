@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Retention tiers: raw data for a limited time, then min/mean/max rollups
+"""
+
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .metrics import metrics
+from .storage import MEASUREMENT_UNITS, Record
+from .timeutil import NANOS_PER_SECOND, parse_duration
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Rollups and pruning are opt-in, since pruning deletes raw points. The
+# recommended "raw:30d,1m:365d,1h:inf" keeps raw heart rate for 30 days,
+# 1-minute rollups for a year and hourly rollups forever.
+DEFAULT_RETENTION = "off"
+
+# Measurements that are rolled up and pruned
+DEFAULT_DOWNSAMPLE_MEASUREMENTS = "heart_rate"
+
+RAW_TIER = "raw"
+
+
+class Tier(NamedTuple):
+    """One retention tier; window_seconds is 0 for raw data"""
+
+    name: str
+    window_seconds: int
+    # None keeps the tier forever
+    retention_seconds: Optional[int]
+
+
+def parse_tiers(spec: str) -> List[Tier]:
+    """Parse 'raw:30d,1m:365d,1h:inf' into tiers ordered by window size"""
+    tiers = []
+    for part in spec.split(","):
+        name, _, retention = part.strip().partition(":")
+        if not retention:
+            raise ValueError(f"Invalid retention tier: {part!r} (expected tier:age)")
+
+        window_seconds = 0 if name == RAW_TIER else parse_duration(name)
+        retention_seconds = (
+            None if retention in ("inf", "0") else parse_duration(retention)
+        )
+        tiers.append(Tier(name, window_seconds, retention_seconds))
+
+    tiers.sort(key=lambda tier: tier.window_seconds)
+    if not tiers or tiers[0].name != RAW_TIER:
+        raise ValueError(f"Retention spec must include a raw tier: {spec!r}")
+    return tiers
+
+
+def rollup_measurement(measurement: str, tier: Tier) -> str:
+    """Measurement name that holds a tier's rollups, e.g. heart_rate_1m"""
+    if tier.name == RAW_TIER:
+        return measurement
+    return f"{measurement}_{tier.name}"
+
+
+class RetentionPolicy:
+    """Computes rollup tiers at write time and prunes expired data"""
+
+    def __init__(self, tiers: List[Tier], measurements: List[str]):
+        self.tiers = tiers
+        self.measurements = set(measurements)
+
+    @classmethod
+    def from_env(cls) -> Optional["RetentionPolicy"]:
+        """Policy from FITLOG_RETENTION / FITLOG_DOWNSAMPLE, or None if disabled"""
+        spec = os.getenv("FITLOG_RETENTION", DEFAULT_RETENTION)
+        if spec.lower() in ("", "off", "none"):
+            return None
+
+        measurements = os.getenv(
+            "FITLOG_DOWNSAMPLE", DEFAULT_DOWNSAMPLE_MEASUREMENTS
+        ).split(",")
+        return cls(parse_tiers(spec), [m.strip() for m in measurements if m.strip()])
+
+    @property
+    def rollup_tiers(self) -> List[Tier]:
+        """Tiers that hold aggregates rather than raw data"""
+        return [tier for tier in self.tiers if tier.window_seconds]
+
+    def raw_cutoff_ns(self, measurement: str, now_ns: int) -> Optional[int]:
+        """Time before which raw points of a measurement are pruned, if ever"""
+        raw = self.tiers[0]
+        if measurement not in self.measurements or raw.retention_seconds is None:
+            return None
+        return now_ns - raw.retention_seconds * NANOS_PER_SECOND
+
+    def update(self, writer, records: List[Record]) -> int:
+        """Recompute rollups for the windows touched by newly written records
+
+        Each touched window is aggregated from the raw data in storage, so
+        windows filled over several runs or batches stay exact.
+        """
+        spans: Dict[str, Tuple[int, int]] = {}
+        for record in records:
+            if record.measurement in self.measurements:
+                first, last = spans.get(
+                    record.measurement, (record.time_ns, record.time_ns)
+                )
+                spans[record.measurement] = (
+                    min(first, record.time_ns),
+                    max(last, record.time_ns),
+                )
+
+        written = 0
+        for measurement, (first, last) in spans.items():
+            for tier in self.rollup_tiers:
+                window_ns = tier.window_seconds * NANOS_PER_SECOND
+                start_ns = first - first % window_ns
+                end_ns = last - last % window_ns + window_ns
+
+                with metrics.timer("rollup_seconds", tier=tier.name):
+                    rows = writer.aggregate_windows(
+                        measurement, start_ns, end_ns, window_ns
+                    )
+                    if not rows:
+                        continue
+                    written += writer.write_records(
+                        self._rollup_records(measurement, tier, rows)
+                    )
+
+        if written:
+            metrics.increment("rollup_points_written_total", written)
+        return written
+
+    @staticmethod
+    def _rollup_records(
+        measurement: str, tier: Tier, rows: List[Tuple]
+    ) -> List[Record]:
+        """Records for (window_start_ns, min, mean, max, count) rows"""
+        target = rollup_measurement(measurement, tier)
+        tags = {"unit": MEASUREMENT_UNITS.get(measurement, "")}
+        return [
+            Record(
+                target,
+                window_start,
+                tags,
+                {"min": low, "mean": mean, "max": high, "count": count},
+            )
+            for window_start, low, mean, high, count in rows
+        ]
+
+    def backfill(self, writer, measurement: str, end_ns: int) -> int:
+        """Recompute every rollup tier from all raw data before end_ns
+
+        update() only rolls up windows touched by new writes, so history
+        written before downsampling was enabled has no rollups until this runs.
+        """
+        written = 0
+        for tier in self.rollup_tiers:
+            window_ns = tier.window_seconds * NANOS_PER_SECOND
+            with metrics.timer("rollup_seconds", tier=tier.name):
+                rows = writer.aggregate_windows(measurement, 0, end_ns, window_ns)
+                if rows:
+                    written += writer.write_records(
+                        self._rollup_records(measurement, tier, rows)
+                    )
+
+        if written:
+            metrics.increment("rollup_points_written_total", written)
+        return written
+
+    def prune(self, writer, now_ns: Optional[int] = None) -> None:
+        """Delete data older than each tier's retention
+
+        Raw data is deleted only up to a boundary of the coarsest rollup window,
+        and only after the rollups of everything being deleted were written;
+        if the backfill fails, the raw data is kept.
+        """
+        now_ns = now_ns or time.time_ns()
+        rollup_windows = [tier.window_seconds for tier in self.rollup_tiers]
+        coarsest_ns = max(rollup_windows, default=0) * NANOS_PER_SECOND
+
+        for measurement in sorted(self.measurements):
+            for tier in self.tiers:
+                if tier.retention_seconds is None:
+                    continue
+
+                cutoff_ns = now_ns - tier.retention_seconds * NANOS_PER_SECOND
+                target = rollup_measurement(measurement, tier)
+                if tier.name == RAW_TIER and coarsest_ns:
+                    # No rollup window is left with only part of its raw data
+                    cutoff_ns -= cutoff_ns % coarsest_ns
+                    self.backfill(writer, measurement, cutoff_ns)
+
+                with metrics.timer("prune_seconds", tier=tier.name):
+                    writer.delete_before(target, cutoff_ns)
+                logger.info(f"Pruned {target} older than {tier.retention_seconds}s")
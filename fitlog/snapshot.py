@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Local snapshot of recent data as memory-mappable timestamp and value arrays
+"""
+
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import click
+from dotenv import load_dotenv
+
+from .storage import MEASUREMENT_UNITS, get_timestamp_ns
+from .timeutil import NANOS_PER_SECOND
+
+# Load environment variables
+load_dotenv()
+
+# Log configuration
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = "data/snapshot"
+DEFAULT_SNAPSHOT_DAYS = 7
+
+# File layout: magic, point count, then count int64 timestamps (ns) followed
+# by count float64 values, all little-endian and 8-byte aligned
+MAGIC = b"FITSNAP1"
+HEADER = struct.Struct("<8sQ")
+
+CURRENT_SUFFIX = ".snap"
+PREVIOUS_SUFFIX = ".prev.snap"
+
+
+class Series(NamedTuple):
+    """Time-ordered points of one measurement
+
+    times and values are int64 and float64 sequences; when loaded from a
+    snapshot they are memoryviews over the mapped file, so nothing is copied.
+    """
+
+    times: Sequence[int]
+    values: Sequence[float]
+
+
+def write_series(path: str, times: array, values: array) -> None:
+    """Write arrays to a snapshot file atomically"""
+    if sys.byteorder == "big":
+        times, values = array("q", times), array("d", values)
+        times.byteswap()
+        values.byteswap()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(times)))
+        times.tofile(f)
+        values.tofile(f)
+        # Without this a power loss can leave the renamed file empty
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_series(path: str) -> Optional[Series]:
+    """Map a snapshot file; None if it does not exist or cannot be read
+
+    A damaged file is only a cache of stored data, so it is reported and
+    treated as missing; the next update writes a fresh one.
+    """
+    try:
+        return _map_series(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def _map_series(path: str) -> Series:
+    with open(path, "rb") as f:
+        magic, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("not a fitlog snapshot")
+        if not count:
+            return Series(array("q"), array("d"))
+        # The mapping stays valid after the file is closed
+        buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    end = HEADER.size + 16 * count
+    if len(buffer) < end:
+        raise ValueError(f"truncated, {len(buffer)} of {end} bytes")
+    times = buffer[HEADER.size : HEADER.size + 8 * count].cast("q")
+    values = buffer[HEADER.size + 8 * count : end].cast("d")
+    if sys.byteorder == "big":
+        times, values = array("q", times), array("d", values)
+        times.byteswap()
+        values.byteswap()
+    return Series(times, values)
+
+
+def merge_points(
+    series: Optional[Series], points: Dict[int, float], cutoff_ns: int
+) -> Tuple[array, array]:
+    """Merge new points into a series, dropping points older than cutoff_ns
+
+    A new point replaces a stored one with the same timestamp.
+    """
+    merged: Dict[int, float] = {}
+    if series is not None:
+        merged.update(zip(series.times, series.values))
+    merged.update(points)
+
+    times = array("q")
+    values = array("d")
+    for time_ns in sorted(merged):
+        if time_ns >= cutoff_ns:
+            times.append(time_ns)
+            values.append(merged[time_ns])
+    return times, values
+
+
+def summarize(series: Series) -> Dict:
+    """Point count, time span and min/mean/max of a series"""
+    count = len(series.times)
+    if not count:
+        return {"count": 0}
+    return {
+        "count": count,
+        "first_ns": series.times[0],
+        "last_ns": series.times[-1],
+        "min": min(series.values),
+        "mean": sum(series.values) / count,
+        "max": max(series.values),
+    }
+
+
+def diff_series(previous: Optional[Series], current: Optional[Series]) -> Dict:
+    """Points added, removed and changed between two snapshots of a measurement"""
+    before = dict(zip(previous.times, previous.values)) if previous else {}
+    after = dict(zip(current.times, current.values)) if current else {}
+    return {
+        "previous": len(before),
+        "current": len(after),
+        "added": sum(1 for time_ns in after if time_ns not in before),
+        "removed": sum(1 for time_ns in before if time_ns not in after),
+        "changed": sum(
+            1
+            for time_ns, value in after.items()
+            if time_ns in before and before[time_ns] != value
+        ),
+    }
+
+
+class SnapshotStore:
+    """Keeps the most recent days of each measurement in local snapshot files
+
+    Each measurement has `<name>.snap` from the latest run and `<name>.prev.snap`
+    from the run before, so runs can be compared without querying storage.
+    Only the value field is kept; sleep types and other tags are not.
+    """
+
+    def __init__(
+        self, directory: str = DEFAULT_SNAPSHOT_DIR, days: int = DEFAULT_SNAPSHOT_DAYS
+    ):
+        self.directory = directory
+        self.days = days
+        # Measurements already rotated to .prev in this run
+        self._rotated = set()
+
+    @classmethod
+    def from_env(cls) -> Optional["SnapshotStore"]:
+        """Store from FITLOG_SNAPSHOT_DIR / FITLOG_SNAPSHOT_DAYS, or None if disabled"""
+        days = int(os.getenv("FITLOG_SNAPSHOT_DAYS", DEFAULT_SNAPSHOT_DAYS))
+        if days <= 0:
+            return None
+        return cls(os.getenv("FITLOG_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR), days)
+
+    def path(self, measurement: str, previous: bool = False) -> str:
+        """Snapshot file of a measurement"""
+        suffix = PREVIOUS_SUFFIX if previous else CURRENT_SUFFIX
+        return os.path.join(self.directory, f"{measurement}{suffix}")
+
+    def measurements(self) -> List[str]:
+        """Measurements with a snapshot from the latest run"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[: -len(CURRENT_SUFFIX)]
+            for name in os.listdir(self.directory)
+            if name.endswith(CURRENT_SUFFIX) and not name.endswith(PREVIOUS_SUFFIX)
+        )
+
+    def load(self, measurement: str, previous: bool = False) -> Optional[Series]:
+        """Memory-mapped series of a measurement, or None if there is none"""
+        return read_series(self.path(measurement, previous))
+
+    def update(self, data: List[Dict], now_ns: Optional[int] = None) -> int:
+        """Merge health data items into the snapshot; returns points kept
+
+        The snapshot is a convenience copy, so failures are logged and never
+        stop the data from being stored.
+        """
+        try:
+            return self._update(data, now_ns)
+        except Exception as e:
+            logger.warning(f"Snapshot update failed: {e}")
+            return 0
+
+    def _update(self, data: List[Dict], now_ns: Optional[int]) -> int:
+        points: Dict[str, Dict[int, float]] = {}
+        for item in data:
+            measurement = item.get("measurement")
+            value = item.get("value")
+            timestamp = get_timestamp_ns(item)
+            if (
+                measurement in MEASUREMENT_UNITS
+                and value is not None
+                and timestamp is not None
+            ):
+                points.setdefault(measurement, {})[timestamp] = float(value)
+
+        now_ns = now_ns or time.time_ns()
+        cutoff_ns = now_ns - self.days * 86400 * NANOS_PER_SECOND
+        os.makedirs(self.directory, exist_ok=True)
+
+        kept = 0
+        for measurement, new_points in points.items():
+            path = self.path(measurement)
+            existing = read_series(path)
+            times, values = merge_points(existing, new_points, cutoff_ns)
+
+            if measurement not in self._rotated:
+                # The first update in a run keeps the last run's file for diffs
+                if existing is not None:
+                    os.replace(path, self.path(measurement, previous=True))
+                self._rotated.add(measurement)
+
+            write_series(path, times, values)
+            kept += len(times)
+            logger.debug(f"Snapshot {measurement}: {len(times)} points")
+        return kept
+
+    def tap(
+        self, sources: Iterable[Tuple[str, List[Dict]]]
+    ) -> Iterator[Tuple[str, List[Dict]]]:
+        """Pass (data_type, data) batches through, adding each to the snapshot"""
+        for data_type, data in sources:
+            self.update(data)
+            yield data_type, data
+
+
+def format_time(time_ns: int) -> str:
+    """Local time of a nanosecond timestamp for display"""
+    return datetime.fromtimestamp(time_ns / NANOS_PER_SECOND).strftime("%Y-%m-%d %H:%M")
+
+
+@click.group()
+@click.option(
+    "--dir",
+    "directory",
+    envvar="FITLOG_SNAPSHOT_DIR",
+    default=DEFAULT_SNAPSHOT_DIR,
+    help="Snapshot directory",
+)
+@click.pass_context
+def main(ctx: click.Context, directory: str):
+    """Inspect the local snapshot of recent data"""
+    ctx.obj = SnapshotStore(directory)
+
+
+@main.command()
+@click.option("--measurement", "-m", multiple=True, help="Only these measurements")
+@click.pass_obj
+def summary(store: SnapshotStore, measurement: tuple):
+    """Points, time span and value range per measurement"""
+    print(
+        f"{'measurement':<12} {'points':>8} {'first':>17} {'last':>17} "
+        f"{'min':>10} {'mean':>10} {'max':>10}"
+    )
+    for name in measurement or store.measurements():
+        series = store.load(name)
+        stats = summarize(series) if series is not None else {"count": 0}
+        if not stats["count"]:
+            print(f"{name:<12} {0:>8}")
+            continue
+        print(
+            f"{name:<12} {stats['count']:>8} {format_time(stats['first_ns']):>17} "
+            f"{format_time(stats['last_ns']):>17} {stats['min']:>10.1f} "
+            f"{stats['mean']:>10.1f} {stats['max']:>10.1f}"
+        )
+
+
+@main.command()
+@click.option("--measurement", "-m", multiple=True, help="Only these measurements")
+@click.pass_obj
+def diff(store: SnapshotStore, measurement: tuple):
+    """Points added, removed and changed since the previous run"""
+    print(
+        f"{'measurement':<12} {'previous':>9} {'current':>9} "
+        f"{'added':>8} {'removed':>8} {'changed':>8}"
+    )
+    for name in measurement or store.measurements():
+        result = diff_series(store.load(name, previous=True), store.load(name))
+        print(
+            f"{name:<12} {result['previous']:>9} {result['current']:>9} "
+            f"{result['added']:>8} {result['removed']:>8} {result['changed']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Embedded, file-based storage backend using SQLite
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .storage import Record, StorageBackend, fill_windows
+from .timeutil import NANOS_PER_SECOND
+
+# Load environment variables
+load_dotenv()
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# One row per field value. The primary key clusters rows by measurement and
+# field, then time, so each field is stored as its own time-sorted run (much
+# like an InfluxDB series) and range queries are index range scans. Rows with
+# the same measurement, field, time and tags overwrite each other, matching
+# InfluxDB's upsert semantics.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    measurement TEXT NOT NULL,
+    field TEXT NOT NULL,
+    time_ns INTEGER NOT NULL,
+    tags TEXT NOT NULL,
+    value,
+    PRIMARY KEY (measurement, field, time_ns, tags)
+) WITHOUT ROWID
+"""
+
+
+def encode_tags(tags: Dict[str, str]) -> str:
+    """Canonical tag set string (sorted key=value pairs)"""
+    return ",".join(f"{key}={val}" for key, val in sorted(tags.items()))
+
+
+class SQLiteWriter(StorageBackend):
+    """Class for writing data to an embedded SQLite database"""
+
+    name = "sqlite"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("FITLOG_SQLITE_PATH", "data/fitlog.db")
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Writes may come from the pipeline's writer thread
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(SCHEMA)
+            self.conn.commit()
+
+        logger.info(f"SQLite database initialized: {self.path}")
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self.conn.close()
+
+    def checkpoint(self) -> None:
+        """Move the write-ahead log into the database file and truncate it"""
+        with self._lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def write_records(self, records: List[Record]) -> int:
+        """Insert records in a single transaction"""
+        rows = [
+            (record.measurement, field, record.time_ns, encode_tags(record.tags), val)
+            for record in records
+            for field, val in record.fields.items()
+        ]
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO points "
+                "(measurement, field, time_ns, tags, value) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+        return len(records)
+
+    def test_connection(self) -> bool:
+        """Test that the database can be queried"""
+        try:
+            with self._lock:
+                self.conn.execute("SELECT 1").fetchone()
+            return True
+
+        except sqlite3.Error as e:
+            logger.error(f"SQLite connection test error: {e}")
+            return False
+
+    def get_latest_data(self, measurement: str, limit: int = 10) -> List[Dict]:
+        """Get latest data for specified measurement"""
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT time_ns, value FROM points "
+                    "WHERE measurement = ? AND field = 'value' "
+                    "ORDER BY time_ns DESC LIMIT ?",
+                    (measurement, limit),
+                ).fetchall()
+
+            return [
+                {
+                    "time": datetime.fromtimestamp(
+                        time_ns / NANOS_PER_SECOND, tz=timezone.utc
+                    ),
+                    "value": value,
+                    "measurement": measurement,
+                }
+                for time_ns, value in rows
+            ]
+
+        except sqlite3.Error as e:
+            logger.error(f"Data retrieval error: {e}")
+            return []
+
+    def query_range(
+        self, measurement: str, start_ns: int, end_ns: int, field: str = "value"
+    ) -> List[Tuple[int, Any]]:
+        """Get (time_ns, value) pairs of a field in [start_ns, end_ns), by time"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT time_ns, value FROM points "
+                "WHERE measurement = ? AND field = ? AND time_ns >= ? AND time_ns < ? "
+                "ORDER BY time_ns",
+                (measurement, field, start_ns, end_ns),
+            ).fetchall()
+
+    def get_last_timestamp_ns(
+        self, measurement: str, start_ns: int, end_ns: int
+    ) -> Optional[int]:
+        """Time of the latest point in [start_ns, end_ns), or None if empty"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(time_ns) FROM points "
+                "WHERE measurement = ? AND field = 'value' "
+                "AND time_ns >= ? AND time_ns < ?",
+                (measurement, start_ns, end_ns),
+            ).fetchone()
+        return row[0]
+
+    def count_windows(
+        self, measurement: str, start_ns: int, end_ns: int, window_ns: int
+    ) -> List[Tuple[int, int]]:
+        """Count points per epoch-aligned window in [start_ns, end_ns)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT time_ns / ? * ? AS window_start, COUNT(*) FROM points "
+                "WHERE measurement = ? AND field = 'value' "
+                "AND time_ns >= ? AND time_ns < ? GROUP BY window_start",
+                (window_ns, window_ns, measurement, start_ns, end_ns),
+            ).fetchall()
+
+        return fill_windows(start_ns, end_ns, window_ns, dict(rows))
+
+    def aggregate_windows(
+        self, measurement: str, start_ns: int, end_ns: int, window_ns: int
+    ) -> List[Tuple[int, float, float, float, int]]:
+        """(window_start_ns, min, mean, max, count) of non-empty windows, by time"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT time_ns / ? * ? AS window_start, "
+                "MIN(value), AVG(value), MAX(value), COUNT(*) FROM points "
+                "WHERE measurement = ? AND field = 'value' "
+                "AND time_ns >= ? AND time_ns < ? "
+                "GROUP BY window_start ORDER BY window_start",
+                (window_ns, window_ns, measurement, start_ns, end_ns),
+            ).fetchall()
+
+    def delete_before(self, measurement: str, cutoff_ns: int) -> None:
+        """Delete all points of a measurement older than cutoff_ns"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM points WHERE measurement = ? AND time_ns < ?",
+                (measurement, cutoff_ns),
+            )
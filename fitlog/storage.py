@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Storage backend interface shared by InfluxDB and the embedded backends
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+from .metrics import INTERNAL_MEASUREMENT, Metrics, metrics
+from .timeutil import seconds_to_ns
+from .validation import validate_records
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Available backends for FITLOG_STORAGE
+STORAGE_BACKENDS = ["influxdb", "sqlite"]
+
+# Unit tag per health measurement
+MEASUREMENT_UNITS = {
+    "steps": "count",
+    "calories": "kcal",
+    "weight": "kg",
+    "heart_rate": "bpm",
+    "sleep": "seconds",
+}
+
+SLEEP_TYPES = {
+    1: "awake",
+    2: "sleep",
+    3: "out_of_bed",
+    4: "light_sleep",
+    5: "deep_sleep",
+    6: "rem_sleep",
+}
+
+
+class Record(NamedTuple):
+    """Backend-neutral data point"""
+
+    measurement: str
+    time_ns: int
+    tags: Dict[str, str]
+    fields: Dict[str, Any]
+
+
+def get_sleep_type_name(sleep_type: int) -> str:
+    """Get sleep type name from sleep type code"""
+    return SLEEP_TYPES.get(sleep_type, "unknown")
+
+
+def get_timestamp_ns(item: Dict) -> Optional[int]:
+    """Get an item's timestamp in nanoseconds (timestamp_ns or seconds)"""
+    timestamp_ns = item.get("timestamp_ns")
+    if timestamp_ns is not None:
+        return timestamp_ns
+
+    timestamp = item.get("timestamp")
+    if timestamp is None:
+        return None
+    return seconds_to_ns(timestamp)
+
+
+def build_records(data: List[Dict]) -> Tuple[List[Record], int]:
+    """Convert health data items to records, returning (records, skipped)"""
+    records = []
+    skipped = 0
+
+    for item in data:
+        measurement = item.get("measurement")
+        value = item.get("value")
+        timestamp = get_timestamp_ns(item)
+
+        if not measurement or value is None or timestamp is None:
+            logger.warning(f"Skipping incomplete data: {item}")
+            skipped += 1
+            continue
+
+        unit = MEASUREMENT_UNITS.get(measurement)
+        if unit is None:
+            logger.warning(f"Unknown measurement type: {measurement}")
+            skipped += 1
+            continue
+
+        # Processing by measurement type
+        if measurement == "steps":
+            records.append(
+                Record("steps", timestamp, {"unit": unit}, {"value": int(value)})
+            )
+
+        elif measurement == "sleep":
+            # Sleep data requires special processing
+            sleep_type = item.get("sleep_type", 0)
+            duration = float(value)  # Sleep duration (seconds)
+
+            records.append(
+                Record(
+                    "sleep",
+                    timestamp,
+                    {"unit": unit, "sleep_type": get_sleep_type_name(sleep_type)},
+                    {
+                        "value": duration,
+                        "sleep_type_code": sleep_type,
+                        "duration_minutes": duration / 60,
+                        "duration_hours": duration / 3600,
+                    },
+                )
+            )
+
+        else:
+            records.append(
+                Record(measurement, timestamp, {"unit": unit}, {"value": float(value)})
+            )
+
+    return records, skipped
+
+
+def fill_windows(
+    start_ns: int, end_ns: int, window_ns: int, counts: Dict[int, int]
+) -> List[Tuple[int, int]]:
+    """(window_start_ns, count) for every window in range, including empty ones"""
+    first = start_ns - start_ns % window_ns
+    return [
+        (window_start, counts.get(window_start, 0))
+        for window_start in range(first, end_ns, window_ns)
+    ]
+
+
+BackendT = TypeVar("BackendT", bound="StorageBackend")
+
+
+class StorageBackend:
+    """Base class for storage backends
+
+    Subclasses implement write_records and the query methods; conversion of
+    health data items to records and run metrics are shared here.
+    """
+
+    name = "base"
+
+    # RetentionPolicy applied on write; create_writer sets it from the environment
+    retention = None
+
+    def __enter__(self: BackendT) -> BackendT:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release backend resources"""
+
+    def get_sleep_type_name(self, sleep_type: int) -> str:
+        """Get sleep type name from sleep type code"""
+        return get_sleep_type_name(sleep_type)
+
+    def write_health_data(self, data: List[Dict]) -> int:
+        """Write health data to the backend"""
+        if not data:
+            return 0
+
+        return self.write_prepared(*self.prepare_records(data))
+
+    def prepare_records(self, data: List[Dict]) -> Tuple[List[Record], List[Record]]:
+        """Build and validate health data items, returning (records, quarantined)"""
+        with metrics.timer("build_points_seconds"):
+            records, skipped = build_records(data)
+
+        if skipped:
+            metrics.increment("points_skipped_total", skipped)
+
+        with metrics.timer("validate_seconds"):
+            records, quarantined = validate_records(records)
+
+        for record in quarantined:
+            metrics.increment(
+                "points_rejected_total",
+                measurement=record.tags["measurement"],
+                reason=record.tags["reason"],
+            )
+
+        return records, quarantined
+
+    def write_prepared(self, records: List[Record], quarantined: List[Record]) -> int:
+        """Write validated records and quarantined rejects, returning points written"""
+        if not records and not quarantined:
+            return 0
+
+        try:
+            with metrics.timer("storage_write_seconds", backend=self.name):
+                written = self.write_records(records) if records else 0
+                if quarantined:
+                    self.write_records(quarantined)
+            metrics.increment("points_written_total", written)
+        except Exception as e:
+            metrics.increment("write_errors_total")
+            logger.error(f"{self.name} write error: {e}")
+            raise
+
+        if self.retention is not None and records:
+            try:
+                self.retention.update(self, records)
+            except Exception as e:
+                # The raw points are stored; the next write to these windows,
+                # or the backfill before pruning, recomputes the rollups
+                metrics.increment("rollup_errors_total")
+                logger.error(f"{self.name} rollup error: {e}")
+
+        logger.info(f"Successfully wrote {written} data points to {self.name}")
+        return written
+
+    def write_steps_data(self, steps_data: List[Dict]) -> int:
+        """Write steps data"""
+        return self.write_health_data(
+            [
+                {
+                    "measurement": "steps",
+                    "value": item["value"],
+                    "timestamp_ns": get_timestamp_ns(item),
+                }
+                for item in steps_data
+            ]
+        )
+
+    def write_weight_data(self, weight_data: List[Dict]) -> int:
+        """Write weight data"""
+        return self.write_health_data(
+            [
+                {
+                    "measurement": "weight",
+                    "value": item["value"],
+                    "timestamp_ns": get_timestamp_ns(item),
+                }
+                for item in weight_data
+            ]
+        )
+
+    def write_calories_data(self, calories_data: List[Dict]) -> int:
+        """Write calories data"""
+        return self.write_health_data(
+            [
+                {
+                    "measurement": "calories",
+                    "value": item["value"],
+                    "timestamp_ns": get_timestamp_ns(item),
+                }
+                for item in calories_data
+            ]
+        )
+
+    def write_heart_rate_data(self, heart_rate_data: List[Dict]) -> int:
+        """Write heart rate data"""
+        return self.write_health_data(
+            [
+                {
+                    "measurement": "heart_rate",
+                    "value": item["value"],
+                    "timestamp_ns": get_timestamp_ns(item),
+                }
+                for item in heart_rate_data
+            ]
+        )
+
+    def write_sleep_data(self, sleep_data: List[Dict]) -> int:
+        """Write sleep data"""
+        return self.write_health_data(
+            [
+                {
+                    "measurement": "sleep",
+                    "value": item["value"],
+                    "timestamp_ns": get_timestamp_ns(item),
+                    "sleep_type": item.get("sleep_type", 0),
+                }
+                for item in sleep_data
+            ]
+        )
+
+    def write_internal_metrics(
+        self, registry: Optional[Metrics] = None, tags: Optional[Dict] = None
+    ) -> int:
+        """Write collected run metrics to the fitlog_internal measurement"""
+        registry = registry or metrics
+        timestamp_ns = time.time_ns()
+
+        records = [
+            Record(
+                INTERNAL_MEASUREMENT,
+                timestamp_ns,
+                {
+                    "metric": entry["name"],
+                    "type": entry["type"],
+                    **(tags or {}),
+                    **entry["tags"],
+                },
+                entry["fields"],
+            )
+            for entry in registry.snapshot()
+        ]
+
+        if not records:
+            return 0
+
+        try:
+            written = self.write_records(records)
+            logger.info(f"Wrote {written} internal metric points to {self.name}")
+            return written
+        except Exception as e:
+            # Losing self-monitoring data must not fail the run
+            logger.error(f"{self.name} internal metrics write error: {e}")
+            return 0
+
+    def apply_retention(self) -> None:
+        """Prune data that has outlived its retention tier"""
+        if self.retention is not None:
+            self.retention.prune(self)
+
+    def write_records(self, records: List[Record]) -> int:
+        """Write records in bulk, returning the number written"""
+        raise NotImplementedError
+
+    def test_connection(self) -> bool:
+        """Test that the backend is reachable"""
+        raise NotImplementedError
+
+    def get_latest_data(self, measurement: str, limit: int = 10) -> List[Dict]:
+        """Get latest data for specified measurement"""
+        raise NotImplementedError
+
+    def query_range(
+        self, measurement: str, start_ns: int, end_ns: int, field: str = "value"
+    ) -> List[Tuple[int, Any]]:
+        """Get (time_ns, value) pairs of a field in [start_ns, end_ns), by time"""
+        raise NotImplementedError
+
+    def get_last_timestamp_ns(
+        self, measurement: str, start_ns: int, end_ns: int
+    ) -> Optional[int]:
+        """Time of the latest point in [start_ns, end_ns), or None if empty"""
+        raise NotImplementedError
+
+    def count_windows(
+        self, measurement: str, start_ns: int, end_ns: int, window_ns: int
+    ) -> List[Tuple[int, int]]:
+        """Count points per epoch-aligned window in [start_ns, end_ns)"""
+        raise NotImplementedError
+
+    def aggregate_windows(
+        self, measurement: str, start_ns: int, end_ns: int, window_ns: int
+    ) -> List[Tuple[int, float, float, float, int]]:
+        """(window_start_ns, min, mean, max, count) of non-empty windows, by time"""
+        raise NotImplementedError
+
+    def delete_before(self, measurement: str, cutoff_ns: int) -> None:
+        """Delete all points of a measurement older than cutoff_ns"""
+        raise NotImplementedError
+
+
+def create_writer(backend: Optional[str] = None) -> StorageBackend:
+    """Create the storage backend selected by FITLOG_STORAGE"""
+    backend = (backend or os.getenv("FITLOG_STORAGE", "influxdb")).lower()
+
+    if backend == "influxdb":
+        from .influx_writer import InfluxWriter
+
+        writer: StorageBackend = InfluxWriter()
+
+    elif backend == "sqlite":
+        from .sqlite_writer import SQLiteWriter
+
+        writer = SQLiteWriter()
+
+    else:
+        raise ValueError(
+            f"Unknown storage backend: {backend} (expected one of {STORAGE_BACKENDS})"
+        )
+
+    from .retention import RetentionPolicy
+
+    writer.retention = RetentionPolicy.from_env()
+    return writer
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Nanosecond timestamp helpers and cached timezone conversion
+"""
+
+import calendar
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+NANOS_PER_SECOND = 1000000000
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def seconds_to_ns(seconds: float) -> int:
+    """Convert epoch seconds to epoch nanoseconds"""
+    if isinstance(seconds, int):
+        return seconds * NANOS_PER_SECOND
+    return int(round(seconds * NANOS_PER_SECOND))
+
+
+def ns_to_seconds(ns: int) -> int:
+    """Convert epoch nanoseconds to whole epoch seconds"""
+    return ns // NANOS_PER_SECOND
+
+
+def datetime_to_ns(dt: datetime) -> int:
+    """Convert an aware datetime to epoch nanoseconds without float rounding"""
+    seconds = calendar.timegm(dt.utctimetuple())
+    return seconds * NANOS_PER_SECOND + dt.microsecond * 1000
+
+
+def parse_duration(text: str) -> int:
+    """Parse a duration such as 90s, 1m, 6h or 30d into seconds"""
+    match = re.fullmatch(r"(\d+)([smhd])", text.strip())
+    if not match:
+        raise ValueError(f"Invalid duration: {text!r} (expected e.g. 1m, 6h, 30d)")
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+class LocalDayCache:
+    """Local-time to epoch conversion with timezone offsets cached per day
+
+    Localizing every timestamp through pytz is slow. Instead the epoch of local
+    midnight is computed once per calendar day; when the UTC offset is the same
+    at the start and end of the day (no DST transition), any local time in it
+    is midnight plus the elapsed seconds.
+    """
+
+    def __init__(self, timezone):
+        self.timezone = timezone
+        # day -> (midnight epoch seconds, True if the offset is constant all day)
+        self._days: Dict[date, Tuple[int, bool]] = {}
+
+    def _midnight(self, day: date) -> datetime:
+        return self.timezone.localize(datetime(day.year, day.month, day.day))
+
+    def _day(self, day: date) -> Tuple[int, bool]:
+        entry = self._days.get(day)
+        if entry is None:
+            start = self._midnight(day)
+            end = self._midnight(day + timedelta(days=1))
+            stable = start.utcoffset() == end.utcoffset()
+            entry = (calendar.timegm(start.utctimetuple()), stable)
+            self._days[day] = entry
+        return entry
+
+    def local_seconds(
+        self, day: date, hour: int = 0, minute: int = 0, second: int = 0
+    ) -> int:
+        """Epoch seconds of a local wall-clock time on the given day"""
+        midnight, stable = self._day(day)
+        if stable:
+            return midnight + hour * 3600 + minute * 60 + second
+
+        # Slow path for days with a DST transition
+        local = datetime(day.year, day.month, day.day, hour, minute, second)
+        return calendar.timegm(self.timezone.localize(local).utctimetuple())
+
+    def local_ns(
+        self,
+        day: date,
+        hour: int = 0,
+        minute: int = 0,
+        second: int = 0,
+        nanos: Optional[int] = None,
+    ) -> int:
+        """Epoch nanoseconds of a local wall-clock time on the given day"""
+        ns = self.local_seconds(day, hour, minute, second) * NANOS_PER_SECOND
+        return ns + (nanos or 0)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Batch validation of health records: range, rate-of-change and duplicate checks
+"""
+
+import logging
+import math
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .timeutil import NANOS_PER_SECOND
+
+# Log configuration
+logger = logging.getLogger(__name__)
+
+# Measurement that rejected records are written to, tagged with the reason
+QUARANTINE_MEASUREMENT = "fitlog_quarantine"
+
+
+class Rule(NamedTuple):
+    """Plausibility limits for the value field of a measurement"""
+
+    min_value: float
+    max_value: float
+    # Largest believable change between points less than change_window apart
+    max_change: Optional[float] = None
+    change_window_seconds: int = 0
+
+
+# Limits per measurement, in the units of MEASUREMENT_UNITS
+VALIDATION_RULES = {
+    "steps": Rule(0, 100000),
+    "calories": Rule(0, 20000),
+    "weight": Rule(20, 300, max_change=5, change_window_seconds=86400),
+    "heart_rate": Rule(25, 250, max_change=60, change_window_seconds=10),
+    "sleep": Rule(0, 86400),
+}
+
+
+def _passes_batch_checks(rule: Rule, records: List, keys: List) -> bool:
+    """Whole-batch checks; True when no record in the batch can be rejected"""
+    min_value, max_value, max_change, change_window_seconds = rule
+    values = [record.fields["value"] for record in records]
+
+    total = sum(values)
+    if total != total:
+        # NaN somewhere in the batch
+        return False
+    if min(values) < min_value or max(values) > max_value:
+        return False
+    if len(set(keys)) != len(keys):
+        return False
+    if max_change is None:
+        return True
+
+    change_window_ns = change_window_seconds * NANOS_PER_SECOND
+    times = [record.time_ns for record in records]
+    return not any(
+        t2 - t1 < change_window_ns and abs(v2 - v1) > max_change
+        for t1, t2, v1, v2 in zip(times, times[1:], values, values[1:])
+    )
+
+
+def _check_measurement(rule: Rule, records: List, valid: List, rejected: List) -> None:
+    """Check one measurement's records, appending to valid and rejected"""
+    min_value, max_value, max_change, change_window_seconds = rule
+    if max_change is not None:
+        # Rate-of-change needs neighbours in time order
+        records.sort(key=attrgetter("time_ns"))
+
+    # Records with extra tags (e.g. sleep_type) may share a timestamp
+    if len(records[0].tags) > 1:
+        keys = [(record.time_ns, *record.tags.values()) for record in records]
+    else:
+        keys = [record.time_ns for record in records]
+
+    # Clean batches, the common case, skip the per-record pass
+    if _passes_batch_checks(rule, records, keys):
+        valid.extend(records)
+        return
+
+    change_window_ns = change_window_seconds * NANOS_PER_SECOND
+    seen: Dict = {}
+    last_time = None
+    last_value = 0.0
+
+    for record, key in zip(records, keys):
+        time_ns = record.time_ns
+        value = record.fields["value"]
+
+        previous = seen.get(key)
+        if previous is not None:
+            if previous == value:
+                # Repeated point, already accepted once
+                continue
+            reason = "duplicate_timestamp"
+        elif not min_value <= value <= max_value:
+            reason = "out_of_range"
+        elif (
+            max_change is not None
+            and last_time is not None
+            and time_ns - last_time < change_window_ns
+            and abs(value - last_value) > max_change
+        ):
+            reason = "rate_of_change"
+        else:
+            seen[key] = value
+            last_time = time_ns
+            last_value = value
+            valid.append(record)
+            continue
+
+        rejected.append(
+            record._replace(
+                measurement=QUARANTINE_MEASUREMENT,
+                tags={
+                    **record.tags,
+                    "measurement": record.measurement,
+                    "reason": reason,
+                },
+                fields=_quarantine_fields(record.fields),
+            )
+        )
+
+
+def _quarantine_fields(fields: Dict) -> Dict:
+    """Fields of a quarantined record, typed so that any mix of them is writable
+
+    Quarantine holds records of every measurement in one measurement, and
+    InfluxDB rejects a field whose type differs from earlier points in the
+    shard, so integer fields such as steps' value are stored as floats. NaN and
+    infinity cannot be written as numbers at all; they are kept as strings in a
+    raw_<field> field (e.g. raw_value="nan") so every line keeps a field.
+    """
+    quarantined = {}
+    for key, value in fields.items():
+        if isinstance(value, int):
+            value = float(value)
+        if isinstance(value, float) and not math.isfinite(value):
+            quarantined[f"raw_{key}"] = str(value)
+        else:
+            quarantined[key] = value
+    return quarantined
+
+
+def validate_records(records: List) -> Tuple[List, List]:
+    """Split a batch of records into (valid, quarantined) records
+
+    Checks run per measurement over the whole batch. Duplicates are detected
+    within the batch; a repeated identical point is dropped silently, while a
+    conflicting value at the same timestamp is quarantined. Quarantined records
+    keep their fields, with integers widened to float and non-finite values
+    moved to raw_<field> strings, and carry the original measurement and the
+    reason as tags.
+    """
+    groups: Dict[str, List] = {}
+    valid: List = []
+    # Batches usually hold long runs of one measurement
+    for measurement, run in groupby(records, key=attrgetter("measurement")):
+        if measurement in VALIDATION_RULES:
+            groups.setdefault(measurement, []).extend(run)
+        else:
+            valid.extend(run)
+
+    rejected: List = []
+    for measurement, group in groups.items():
+        _check_measurement(VALIDATION_RULES[measurement], group, valid, rejected)
+
+    for record in rejected:
+        value = record.fields.get("value", record.fields.get("raw_value"))
+        logger.warning(
+            f"Quarantined {record.tags['measurement']} point "
+            f"({record.tags['reason']}): {value} at {record.time_ns}"
+        )
+
+    return valid, rejected
@@ -0,0 +1,11 @@
+"""
+テスト共通のヘルパー
+"""
+
+
+def make_data(measurement, count):
+    """テスト用データの生成"""
+    return [
+        {"measurement": measurement, "value": i, "timestamp": 1234567890 + i}
+        for i in range(count)
+    ]
@@ -0,0 +1,109 @@
+"""
+バッチ書き込みのテスト
+"""
+
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from fitlog.batching import BatchWriter
+from fitlog.storage import Record
+
+SECOND_NS = 1000000000
+
+
+def make_records(count, start=0):
+    """テスト用の心拍数レコードを作成"""
+    return [
+        Record("heart_rate", (start + i) * SECOND_NS, {"unit": "bpm"}, {"value": 70})
+        for i in range(count)
+    ]
+
+
+class TestBatchWriter(unittest.TestCase):
+    """BatchWriterのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.writer = MagicMock()
+        self.writer.write_prepared.side_effect = lambda records, quarantined: len(
+            records
+        )
+
+    def test_flush_when_full(self):
+        """バッチサイズに達した時点での書き込みテスト"""
+        batcher = BatchWriter(self.writer, max_points=10, max_delay=60)
+        written = threading.Event()
+        self.writer.write_prepared.side_effect = lambda records, quarantined: (
+            written.set() or len(records)
+        )
+
+        self.assertTrue(batcher.add(make_records(4)))
+        self.assertTrue(batcher.add(make_records(6, start=4)))
+        self.assertTrue(written.wait(5))
+
+        records, quarantined = self.writer.write_prepared.call_args[0]
+        self.assertEqual(len(records), 10)
+        self.assertEqual(quarantined, [])
+        self.assertTrue(batcher.close(5))
+        self.assertEqual(batcher.written, 10)
+
+    def test_flush_after_delay(self):
+        """待ち時間経過後の書き込みテスト"""
+        batcher = BatchWriter(self.writer, max_points=1000, max_delay=0.05)
+        written = threading.Event()
+        self.writer.write_prepared.side_effect = lambda records, quarantined: (
+            written.set() or len(records)
+        )
+
+        batcher.add(make_records(3))
+        self.assertTrue(written.wait(5))
+        self.assertEqual(batcher.pending, 0)
+        batcher.close(5)
+
+    def test_close_flushes_buffer(self):
+        """終了時に残りのレコードが書き込まれるかのテスト"""
+        batcher = BatchWriter(self.writer, max_points=1000, max_delay=60)
+        batcher.add(make_records(5), make_records(1, start=10))
+
+        self.assertTrue(batcher.close(5))
+        self.writer.write_prepared.assert_called_once()
+        self.assertEqual(batcher.written, 5)
+        self.assertFalse(batcher.add(make_records(1)))
+
+    def test_backpressure(self):
+        """バッファ上限での受け付け拒否のテスト"""
+        release = threading.Event()
+        self.writer.write_prepared.side_effect = lambda records, quarantined: (
+            release.wait(5) and len(records)
+        )
+        batcher = BatchWriter(self.writer, max_points=5, max_delay=60, max_pending=8)
+
+        # 最初のバッチは書き込み中のまま止まる
+        self.assertTrue(batcher.add(make_records(5)))
+        for _ in range(100):
+            if batcher.pending == 0:
+                break
+            threading.Event().wait(0.01)
+
+        self.assertTrue(batcher.add(make_records(4, start=5)))
+        self.assertTrue(batcher.add(make_records(4, start=9)))
+        self.assertFalse(batcher.add(make_records(1, start=13)))
+
+        release.set()
+        self.assertTrue(batcher.close(5))
+        self.assertEqual(batcher.written, 13)
+
+    def test_failed_write(self):
+        """書き込み失敗時の件数記録のテスト"""
+        self.writer.write_prepared.side_effect = RuntimeError("write failed")
+        batcher = BatchWriter(self.writer, max_points=1000, max_delay=60)
+        batcher.add(make_records(3))
+
+        self.assertTrue(batcher.close(5))
+        self.assertEqual(batcher.failed, 3)
+        self.assertEqual(batcher.written, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
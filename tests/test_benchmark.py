@@ -0,0 +1,74 @@
+"""
+ベンチマークスイートのテスト
+"""
+
+import unittest
+
+from fitlog.benchmark import (
+    FakeInfluxServer,
+    _http_write_case,
+    _parse_case,
+    compare_results,
+    make_fit_response,
+    measure,
+)
+
+
+class TestBenchmark(unittest.TestCase):
+    """ベンチマーク関数のテスト"""
+
+    def test_make_fit_response(self):
+        """固定レスポンス生成のテスト"""
+        response = make_fit_response("heart_rate", 3)
+
+        self.assertEqual(len(response["point"]), 3)
+        self.assertIn("fpVal", response["point"][0]["value"][0])
+
+    def test_parse_case(self):
+        """固定レスポンスのパースのテスト"""
+        run = _parse_case("steps", 10)
+
+        self.assertEqual(run(), 10)
+
+    def test_measure(self):
+        """計測結果のテスト"""
+        result = measure(lambda: 100, repeat=2)
+
+        self.assertEqual(result["points"], 100)
+        self.assertGreater(result["points_per_sec"], 0)
+        self.assertGreaterEqual(result["peak_kib"], 0)
+
+    def test_compare_results(self):
+        """回帰検出のテスト"""
+        baseline = {
+            "case": {"points_per_sec": 1000.0, "peak_kib": 100.0},
+        }
+
+        ok = {"case": {"points_per_sec": 900.0, "peak_kib": 110.0}}
+        slow = {"case": {"points_per_sec": 700.0, "peak_kib": 100.0}}
+        heavy = {"case": {"points_per_sec": 1000.0, "peak_kib": 150.0}}
+        new = {"other": {"points_per_sec": 1.0, "peak_kib": 1.0}}
+
+        self.assertEqual(compare_results(ok, baseline, 0.2), [])
+        self.assertEqual(len(compare_results(slow, baseline, 0.2)), 1)
+        self.assertEqual(len(compare_results(heavy, baseline, 0.2)), 1)
+        self.assertEqual(compare_results(new, baseline, 0.2), [])
+
+    def test_http_write_case(self):
+        """ローカルHTTPシンクへの書き込みのテスト"""
+        data = {
+            "steps": [
+                {"measurement": "steps", "value": 100, "timestamp": 1234567890},
+                {"measurement": "steps", "value": 200, "timestamp": 1234567950},
+            ]
+        }
+
+        with FakeInfluxServer() as sink:
+            written = _http_write_case(sink.url, data)()
+
+        self.assertEqual(written, 2)
+        self.assertEqual(sink.lines_received, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
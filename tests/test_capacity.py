@@ -0,0 +1,144 @@
+"""
+容量見積もりのテスト
+"""
+
+import json
+import unittest
+
+from click.testing import CliRunner
+
+from fitlog.capacity import (
+    HostLimits,
+    calibrate,
+    check_limits,
+    line_sizes,
+    main,
+    measure_fetch,
+    project,
+    sample_items,
+)
+from fitlog.retention import RetentionPolicy, parse_tiers
+from fitlog.storage import build_records
+from fitlog.validation import validate_records
+
+GB = 1024**3
+
+
+class TestCapacity(unittest.TestCase):
+    """容量見積もりのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.policy = RetentionPolicy(parse_tiers("raw:30d,1h:inf"), ["heart_rate"])
+
+    def test_sample_items_are_valid(self):
+        """サンプルデータが検証を通過するかのテスト"""
+        for measurement in ("steps", "calories", "weight", "heart_rate", "sleep"):
+            records, skipped = build_records(sample_items(measurement, 200))
+            valid, quarantined = validate_records(records)
+            self.assertEqual((len(valid), skipped, quarantined), (200, 0, []))
+
+    def test_line_sizes(self):
+        """ラインプロトコルのサイズ計測のテスト"""
+        sizes = line_sizes(["steps", "heart_rate"], self.policy, sample=10)
+
+        self.assertEqual(set(sizes), {"steps", "heart_rate", "heart_rate_1h"})
+        self.assertGreater(sizes["heart_rate_1h"], sizes["heart_rate"])
+
+    def test_measure_fetch(self):
+        """API呼び出し回数の計測のテスト"""
+        fetch = measure_fetch({"steps": 10, "heart_rate": 20})
+
+        self.assertEqual(fetch["api_calls"], 2)
+        self.assertEqual(fetch["points"], 30)
+        self.assertGreater(fetch["peak_memory_bytes"], 0)
+
+    def test_calibrate_sqlite(self):
+        """SQLiteでのキャリブレーションのテスト"""
+        result = calibrate("sqlite", points=500)
+
+        self.assertEqual(result["points"], 500)
+        self.assertGreater(result["points_per_second"], 0)
+        self.assertGreater(result["disk_bytes_per_field"], 0)
+
+    def test_project(self):
+        """保持期間を考慮した見積もりのテスト"""
+        projection = project(
+            {"steps": 100, "heart_rate": 86400},
+            interval_seconds=3600,
+            users=2,
+            horizon_days=365,
+            sizes={"steps": 40, "heart_rate": 50, "heart_rate_1h": 80},
+            calibration={"points_per_second": 1000},
+            fetch={"api_calls": 2, "parse_seconds": 0.5, "peak_memory_bytes": 1},
+            policy=self.policy,
+            api_latency=0.25,
+        )
+
+        rows = {row["measurement"]: row for row in projection["measurements"]}
+        self.assertEqual(rows["steps"]["stored_bytes"], 100 * 2 * 365 * 40)
+        # 生データは30日分のみ保持
+        self.assertEqual(rows["heart_rate"]["stored_bytes"], 86400 * 2 * 30 * 50)
+        self.assertEqual(rows["heart_rate_1h"]["points_per_day"], 24 * 2)
+
+        points_per_tick = (100 + 86400) / 24 * 2
+        self.assertAlmostEqual(projection["points_per_tick"], points_per_tick)
+        self.assertEqual(projection["api_calls_per_day"], 2 * 2 * 24)
+        self.assertAlmostEqual(
+            projection["run_seconds"], (2 * 0.25 + 0.5) * 2 + points_per_tick / 1000
+        )
+
+    def test_check_limits(self):
+        """ホスト上限の判定テスト"""
+        projection = {
+            "stored_bytes": 20 * GB,
+            "peak_memory_bytes": 1024,
+            "run_seconds": 10,
+            "interval_seconds": 60,
+            "api_calls_per_day": 100,
+        }
+        checks = {
+            check["resource"]: check["ok"]
+            for check in check_limits(projection, HostLimits(disk_bytes=32 * GB))
+        }
+
+        self.assertEqual(
+            checks,
+            {
+                "storage": False,
+                "memory per run": True,
+                "run time per tick": True,
+                "API calls per day": True,
+            },
+        )
+
+    def test_cli(self):
+        """CLIのテスト"""
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "--storage",
+                "sqlite",
+                "--calibration-points",
+                "200",
+                "--rate",
+                "heart_rate=2880",
+                "-m",
+                "heart_rate",
+                "--json",
+            ],
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        report = json.loads(result.output)
+        self.assertEqual(report["fetch"]["api_calls"], 1)
+        self.assertEqual(
+            report["projection"]["measurements"][0]["points_per_day"], 2880
+        )
+
+        result = runner.invoke(main, ["--rate", "pulse=1"])
+        self.assertNotEqual(result.exit_code, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
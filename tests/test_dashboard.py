@@ -0,0 +1,102 @@
+"""
+ダッシュボードクエリ生成のテスト
+"""
+
+import unittest
+from unittest.mock import Mock
+
+from fitlog.dashboard import (
+    PANELS,
+    Panel,
+    bench_queries,
+    dashboard_queries,
+    generate_dashboard,
+    load_dashboard,
+    panel_query,
+    replay_query,
+    rollup_tier,
+)
+from fitlog.retention import RetentionPolicy, parse_tiers
+
+POLICY = RetentionPolicy(parse_tiers("raw:30d,1m:365d,1h:inf"), ["heart_rate"])
+
+
+class TestPanelQuery(unittest.TestCase):
+    """パネルクエリ生成のテスト"""
+
+    def test_field_pruned(self):
+        """value以外のフィールドを読まないテスト"""
+        query = panel_query(PANELS[3], "health_data")
+
+        self.assertIn('r._measurement == "sleep" and r._field == "value"', query)
+        # 時間換算は集計後に行う
+        self.assertLess(query.index("aggregateWindow"), query.index("map("))
+
+    def test_rollup_aware(self):
+        """ロールアップがある場合に集計済みデータを読むテスト"""
+        query = panel_query(PANELS[2], "health_data", POLICY)
+
+        self.assertIn('r._measurement == "heart_rate_1h" and r._field == "mean"', query)
+        self.assertIn('r._measurement == "heart_rate" and', panel_query(PANELS[2], "b"))
+
+    def test_rollup_tier_selection(self):
+        """集計関数に応じたティア選択のテスト"""
+        hourly_max = Panel(9, "hr_max", "heart_rate", "max", "1h")
+        six_hour_mean = Panel(9, "hr_mean", "heart_rate", "mean", "6h")
+        six_hour_max = Panel(9, "hr_max", "heart_rate", "max", "6h")
+
+        self.assertEqual(rollup_tier(hourly_max, POLICY).name, "1h")
+        # 平均の平均は窓が一致する場合のみ正確
+        self.assertIsNone(rollup_tier(six_hour_mean, POLICY))
+        self.assertEqual(rollup_tier(six_hour_max, POLICY).name, "1h")
+        self.assertIsNone(rollup_tier(PANELS[0], POLICY))
+
+
+class TestDashboard(unittest.TestCase):
+    """ダッシュボードJSONの生成とベンチマークのテスト"""
+
+    def test_generate_keeps_layout(self):
+        """レイアウトを保持してクエリのみ置き換えるテスト"""
+        dashboard = load_dashboard()
+        layout = [panel["gridPos"] for panel in dashboard["panels"]]
+
+        generated = generate_dashboard(dashboard, "health_data", POLICY)
+
+        self.assertEqual([panel["gridPos"] for panel in generated["panels"]], layout)
+        for query in dashboard_queries(generated).values():
+            self.assertIn("r._field ==", query)
+
+    def test_committed_dashboard_reads_raw_data(self):
+        """同梱のダッシュボードはロールアップの有無に依存しないテスト"""
+        committed = dashboard_queries(load_dashboard())
+        generated = dashboard_queries(
+            generate_dashboard(load_dashboard(), "health_data")
+        )
+
+        self.assertEqual(committed, generated)
+        for query in committed.values():
+            self.assertNotIn("heart_rate_1", query)
+
+    def test_replay_query(self):
+        """Grafana変数の置換のテスト"""
+        query = "range(start: v.timeRangeStart, stop: v.timeRangeStop)"
+
+        self.assertEqual(replay_query(query, "30d"), "range(start: -30d, stop: now())")
+
+    def test_bench_queries(self):
+        """クエリごと・期間ごとに計測されるテスト"""
+        query_api = Mock()
+        query_api.query.return_value = [Mock(records=[1, 2, 3])]
+
+        results = bench_queries(
+            query_api, {"steps": "v.timeRangeStart"}, ["1d", "30d"], repeat=2
+        )
+
+        self.assertEqual([r["range"] for r in results], ["1d", "30d"])
+        self.assertEqual(results[0]["rows"], 3)
+        self.assertEqual(query_api.query.call_count, 4)
+        query_api.query.assert_called_with("-30d")
+
+
+if __name__ == "__main__":
+    unittest.main()
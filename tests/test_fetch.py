@@ -0,0 +1,119 @@
+"""
+取得期間の指定と差分取得のテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from fitlog.fetch import GoogleFitClient, main, snap_to_last_sync
+from fitlog.sqlite_writer import SQLiteWriter
+
+MINUTE_NS = 60 * 1000000000
+NOW_NS = 1700000000 * 1000000000
+
+
+class TestTimeWindow(unittest.TestCase):
+    """--since/--until/--minutesによる期間指定のテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        with patch.dict(os.environ, {"TIMEZONE": "Asia/Tokyo"}):
+            self.client = GoogleFitClient()
+
+    def test_minutes_window(self):
+        """直近N分の期間のテスト"""
+        self.assertEqual(
+            self.client.get_window(minutes=5, now_ns=NOW_NS),
+            (NOW_NS - 5 * MINUTE_NS, NOW_NS),
+        )
+
+    def test_relative_and_absolute_times(self):
+        """相対時間とISO 8601時刻の解釈のテスト"""
+        self.assertEqual(
+            self.client.get_window(since="2h", until="30m", now_ns=NOW_NS),
+            (NOW_NS - 120 * MINUTE_NS, NOW_NS - 30 * MINUTE_NS),
+        )
+        # タイムゾーン指定なしはローカル時刻（Asia/Tokyo）
+        self.assertEqual(
+            self.client.parse_time("2024-01-01T09:00:00", NOW_NS),
+            self.client.parse_time("2024-01-01T00:00:00Z", NOW_NS),
+        )
+
+    def test_invalid_window(self):
+        """不正な期間指定のエラーテスト"""
+        with self.assertRaises(ValueError):
+            self.client.get_window(since="yesterday", now_ns=NOW_NS)
+        with self.assertRaises(ValueError):
+            self.client.get_window(since="1h", until="2h", now_ns=NOW_NS)
+
+    def test_cli_rejects_conflicting_options(self):
+        """--sinceと--minutesの同時指定がエラーになるテスト"""
+        result = CliRunner().invoke(main, ["--since", "1h", "--minutes", "5"])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("mutually exclusive", result.output)
+
+        result = CliRunner().invoke(main, ["--incremental", "--sync-overlap", "6x"])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("Invalid duration", result.output)
+
+
+class TestIncrementalSync(unittest.TestCase):
+    """最終同期時刻への期間スナップのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = SQLiteWriter(os.path.join(self.tmp.name, "fitlog.db"))
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def test_snap_to_last_sync(self):
+        """保存済みの最終時刻の直前から取得するテスト"""
+        start_ns = NOW_NS - 60 * MINUTE_NS
+        self.writer.write_health_data(
+            [
+                {"measurement": "steps", "value": 10, "timestamp_ns": ts}
+                for ts in (start_ns, NOW_NS - 30 * MINUTE_NS)
+            ]
+        )
+
+        ranges = snap_to_last_sync(
+            self.writer,
+            ["steps", "weight"],
+            start_ns,
+            NOW_NS,
+            overlap_ns=5 * MINUTE_NS,
+        )
+
+        self.assertEqual(ranges["steps"], (NOW_NS - 35 * MINUTE_NS, NOW_NS))
+        # データがない種別は期間全体
+        self.assertEqual(ranges["weight"], (start_ns, NOW_NS))
+
+        # 既定では数時間分を再取得するため、窓の先頭から取得する
+        ranges = snap_to_last_sync(self.writer, ["steps"], start_ns, NOW_NS)
+        self.assertEqual(ranges["steps"], (start_ns, NOW_NS))
+
+    def test_iter_data_uses_ranges(self):
+        """種別ごとの期間で取得されるテスト"""
+        client = GoogleFitClient()
+        client.service = object()
+        calls = []
+        client.fetch_dataset = lambda source, start, end: (
+            calls.append((start, end)) or []
+        )
+
+        dict(client.iter_data(ranges={"steps": (1, 2), "weight": (3, 4)}))
+
+        self.assertEqual(calls, [(1, 2), (3, 4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
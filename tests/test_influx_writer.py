@@ -6,7 +6,9 @@ import os
 import unittest
 from unittest.mock import Mock, patch
 
-from fitlog.influx_writer import InfluxWriter
+from click.testing import CliRunner
+
+from fitlog.influx_writer import InfluxWriter, main
 
 
 class TestInfluxWriter(unittest.TestCase):
@@ -33,6 +35,17 @@ class TestInfluxWriter(unittest.TestCase):
         self.assertEqual(writer.bucket, "health_data")
         mock_client.assert_called_once()
 
+    @patch.dict(os.environ, {"INFLUXDB_ADMIN_TOKEN": "test_token"})
+    @patch("fitlog.influx_writer.InfluxDBClient")
+    def test_close(self, mock_client):
+        """コンテキストマネージャーでのクローズのテスト"""
+        with InfluxWriter() as writer:
+            pass
+        writer.close()
+
+        writer.write_api.close.assert_called_once()
+        mock_client.return_value.close.assert_called_once()
+
     @patch.dict(os.environ, {})
     def test_init_without_token(self):
         """トークンなしの初期化エラーテスト"""
@@ -76,6 +89,65 @@ class TestInfluxWriter(unittest.TestCase):
         self.assertEqual(result, 2)
         mock_write_api.write.assert_called_once()
 
+    @patch.dict(os.environ, {"INFLUXDB_ADMIN_TOKEN": "test_token"})
+    @patch("fitlog.influx_writer.InfluxDBClient")
+    def test_write_nanosecond_timestamps(self, mock_client):
+        """ナノ秒タイムスタンプが保持されるテスト"""
+        mock_write_api = Mock()
+        mock_client.return_value.write_api.return_value = mock_write_api
+
+        writer = InfluxWriter()
+
+        test_data = [
+            {
+                "measurement": "heart_rate",
+                "value": 70,
+                "timestamp_ns": 1700000000100000000,
+            },
+            {
+                "measurement": "heart_rate",
+                "value": 72,
+                "timestamp_ns": 1700000000600000000,
+            },
+        ]
+
+        result = writer.write_health_data(test_data)
+
+        points = mock_write_api.write.call_args.kwargs["record"]
+        self.assertEqual(result, 2)
+        self.assertTrue(points[0].endswith("1700000000100000000"))
+        self.assertTrue(points[1].endswith("1700000000600000000"))
+
+    @patch.dict(os.environ, {"INFLUXDB_ADMIN_TOKEN": "test_token"})
+    @patch("fitlog.influx_writer.InfluxDBClient")
+    def test_write_nan_is_quarantined_as_string(self, mock_client):
+        """NaNが隔離用measurementに文字列フィールドとして書き込まれるテスト"""
+        mock_write_api = Mock()
+        mock_client.return_value.write_api.return_value = mock_write_api
+
+        writer = InfluxWriter()
+        result = writer.write_health_data(
+            [
+                {"measurement": "heart_rate", "value": 70, "timestamp_ns": 1},
+                {"measurement": "heart_rate", "value": float("nan"), "timestamp_ns": 2},
+            ]
+        )
+
+        self.assertEqual(result, 1)
+        lines = [
+            line
+            for call in mock_write_api.write.call_args_list
+            for line in call.kwargs["record"]
+        ]
+        self.assertEqual(
+            lines,
+            [
+                "heart_rate,unit=bpm value=70.0 1",
+                "fitlog_quarantine,measurement=heart_rate,reason=out_of_range,"
+                'unit=bpm raw_value="nan" 2',
+            ],
+        )
+
     @patch.dict(os.environ, {"INFLUXDB_ADMIN_TOKEN": "test_token"})
     @patch("fitlog.influx_writer.InfluxDBClient")
     def test_write_empty_data(self, mock_client):
@@ -112,6 +184,21 @@ class TestInfluxWriter(unittest.TestCase):
 
         self.assertEqual(result, 0)
 
+    def test_main_closes_writer(self):
+        """接続テストのCLIがライターを閉じるテスト"""
+        writer = Mock()
+        writer.__enter__ = Mock(return_value=writer)
+        writer.__exit__ = Mock(side_effect=lambda *exc: writer.close())
+        writer.write_health_data.return_value = 1
+        writer.get_latest_data.return_value = []
+
+        with patch("fitlog.influx_writer.create_writer", return_value=writer):
+            result = CliRunner().invoke(main)
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        writer.write_health_data.assert_called_once()
+        writer.close.assert_called_once_with()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,347 @@
+"""
+プッシュ型取り込みサーバーのテスト
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import unittest
+
+from fitlog.ingest_server import (
+    IngestServer,
+    check_item,
+    load_test,
+    make_payloads,
+    parse_json,
+    parse_line_protocol,
+)
+from fitlog.sqlite_writer import SQLiteWriter
+
+SECOND_NS = 1000000000
+
+
+class TestParseLineProtocol(unittest.TestCase):
+    """ラインプロトコルのパースのテスト"""
+
+    def test_parse_lines(self):
+        """基本的な行のパースのテスト"""
+        body = (
+            "# comment\n"
+            "heart_rate,unit=bpm value=72 1700000000000000000\n"
+            "\n"
+            "steps,unit=count value=120i 1700000000000000000\n"
+        )
+        items = parse_line_protocol(body)
+
+        self.assertEqual(
+            items,
+            [
+                {
+                    "measurement": "heart_rate",
+                    "value": 72.0,
+                    "timestamp_ns": 1700000000000000000,
+                },
+                {
+                    "measurement": "steps",
+                    "value": 120,
+                    "timestamp_ns": 1700000000000000000,
+                },
+            ],
+        )
+
+    def test_precision_and_default_time(self):
+        """時刻の精度指定と省略時の現在時刻のテスト"""
+        items = parse_line_protocol(
+            "weight value=65.5 1700000000\nweight value=65.4",
+            precision="s",
+            now_ns=42,
+        )
+        self.assertEqual(items[0]["timestamp_ns"], 1700000000 * SECOND_NS)
+        self.assertEqual(items[1]["timestamp_ns"], 42)
+
+    def test_sleep_type(self):
+        """睡眠タイプの解釈のテスト"""
+        items = parse_line_protocol(
+            "sleep,sleep_type=deep_sleep value=1800 1\n"
+            "sleep value=600,sleep_type_code=6i 2\n"
+        )
+        self.assertEqual([item["sleep_type"] for item in items], [5, 6])
+
+        items = parse_line_protocol(
+            "sleep value=60,sleep_type_code=4 1\nsleep value=60 2"
+        )
+        self.assertEqual([item["sleep_type"] for item in items], [4, 0])
+
+        for body in (
+            "sleep,unit=seconds value=100,sleep_type_code=inf 1",
+            "sleep value=100,sleep_type_code=9i 1",
+            "sleep value=100,sleep_type_code=1180591620717411303424i 1",
+            "sleep value=100,sleep_type_code=4.5 1",
+            "sleep,sleep_type=nap value=100 1",
+        ):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    parse_line_protocol(body)
+
+    def test_escapes_and_strings(self):
+        """エスケープと文字列フィールドのテスト"""
+        items = parse_line_protocol(
+            'heart_rate,source=my\\ watch value=70,note="a, b c" 1'
+        )
+        self.assertEqual(items[0]["value"], 70.0)
+
+    def test_errors(self):
+        """不正な行のエラーテスト"""
+        for body in (
+            "heart_rate",
+            "heart_rate other=1 1",
+            "heart_rate value=x 1",
+            'heart_rate value="abc" 1',
+            "heart_rate value=t 1",
+            "heart_rate value=1 9223372036854775808",
+        ):
+            with self.assertRaises(ValueError):
+                parse_line_protocol(body)
+        with self.assertRaises(ValueError):
+            parse_line_protocol("heart_rate value=1 1", precision="h")
+
+
+class TestParseJson(unittest.TestCase):
+    """JSONのパースのテスト"""
+
+    def test_parse_json(self):
+        """リスト形式とrecords形式のテスト"""
+        item = {"measurement": "steps", "value": 10, "timestamp_ns": 1}
+        self.assertEqual(parse_json(json.dumps([item]).encode()), [item])
+        self.assertEqual(parse_json(json.dumps({"records": [item]}).encode()), [item])
+
+    def test_parse_json_errors(self):
+        """不正なJSONのエラーテスト"""
+        for body in (b"{", b'{"items": []}', b"[1, 2]"):
+            with self.assertRaises(ValueError):
+                parse_json(body)
+
+    def test_check_item(self):
+        """フィールドの型検証のテスト"""
+        valid = {"measurement": "steps", "value": 10, "timestamp_ns": 1}
+        check_item(valid)
+        check_item({"measurement": "weight", "value": 65.5, "timestamp": 1.5})
+        # 欠けているフィールドはbuild_recordsでスキップされる
+        check_item({"measurement": "steps", "value": None})
+        check_item({"measurement": "sleep", "value": 60, "sleep_type": 0})
+
+        for field, value in (
+            ("measurement", 1),
+            ("value", "abc"),
+            ("value", [1]),
+            ("value", True),
+            ("value", float("nan")),
+            ("value", 10**30),
+            ("timestamp_ns", 1.7e18),
+            ("timestamp_ns", "1"),
+            ("timestamp_ns", -1),
+            ("timestamp_ns", 2**63),
+            ("timestamp", "1700000000"),
+            ("timestamp", 1e12),
+            ("sleep_type", "deep"),
+            ("sleep_type", 2**70),
+            ("sleep_type", 9),
+        ):
+            with self.subTest(field=field, value=value):
+                with self.assertRaises(ValueError):
+                    check_item({**valid, field: value})
+
+
+class TestIngestServer(unittest.TestCase):
+    """取り込みサーバーのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = SQLiteWriter(os.path.join(self.tmp.name, "fitlog.db"))
+        self.server = IngestServer(
+            self.writer, port=0, token="secret", max_delay=0.01
+        ).__enter__()
+        self.connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.httpd.server_address[1]
+        )
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.connection.close()
+        self.server.close(5)
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def request(self, method, path, body=None, token="secret"):
+        """リクエストを送信してステータスと本文を返す"""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.connection.request(method, path, body, headers)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def test_ingest_json(self):
+        """JSONの取り込みと検証のテスト"""
+        items = [
+            {"measurement": "heart_rate", "value": 70, "timestamp_ns": SECOND_NS},
+            {"measurement": "heart_rate", "value": 400, "timestamp_ns": 60 * SECOND_NS},
+            {"measurement": "steps", "value": None, "timestamp_ns": SECOND_NS},
+        ]
+        status, body = self.request("POST", "/ingest", json.dumps(items))
+
+        self.assertEqual(status, 202)
+        self.assertEqual(
+            json.loads(body),
+            {"received": 3, "accepted": 1, "quarantined": 1, "skipped": 1},
+        )
+
+        self.assertTrue(self.server.close(5))
+        self.assertEqual(
+            self.writer.query_range("heart_rate", 0, 120 * SECOND_NS),
+            [(SECOND_NS, 70.0)],
+        )
+
+    def test_influx_write_endpoint(self):
+        """InfluxDB互換の書き込みエンドポイントのテスト"""
+        status, body = self.request(
+            "POST",
+            "/api/v2/write?org=o&bucket=b&precision=s",
+            "heart_rate,unit=bpm value=65 10\nheart_rate,unit=bpm value=66 11",
+            token=None,
+        )
+        self.assertEqual(status, 401)
+
+        self.connection.request(
+            "POST",
+            "/api/v2/write?org=o&bucket=b&precision=s",
+            "heart_rate,unit=bpm value=65 10\nheart_rate,unit=bpm value=66 11",
+            {"Authorization": "Token secret"},
+        )
+        response = self.connection.getresponse()
+        self.assertEqual(response.status, 204)
+        response.read()
+
+        self.assertTrue(self.server.close(5))
+        self.assertEqual(
+            self.writer.query_range("heart_rate", 0, 20 * SECOND_NS),
+            [(10 * SECOND_NS, 65.0), (11 * SECOND_NS, 66.0)],
+        )
+
+    def test_bad_requests(self):
+        """不正なリクエストのテスト"""
+        self.assertEqual(self.request("POST", "/ingest", "{")[0], 400)
+        self.assertEqual(self.request("POST", "/write", "heart_rate 1")[0], 400)
+        self.assertEqual(self.request("POST", "/unknown", "[]")[0], 404)
+        self.assertEqual(self.request("GET", "/unknown")[0], 404)
+
+        for record in (
+            {"measurement": "heart_rate", "value": "abc", "timestamp_ns": 1},
+            {"measurement": "heart_rate", "value": [1], "timestamp_ns": 1},
+            {"measurement": "heart_rate", "value": 70, "timestamp": "1" * 1000},
+            {"measurement": "heart_rate", "value": 70, "timestamp_ns": 1.7e18},
+        ):
+            with self.subTest(record=record):
+                status, body = self.request("POST", "/ingest", json.dumps([record]))
+                self.assertEqual(status, 400)
+                self.assertIn(b"error", body)
+        self.assertEqual(self.server.batcher.pending, 0)
+
+    def test_bad_sleep_type_does_not_fail_shared_batch(self):
+        """不正な睡眠タイプが他クライアントのバッチを巻き込まないテスト"""
+        # 両方のリクエストが同じバッチに入るよう自動フラッシュを遅らせる
+        server = IngestServer(self.writer, port=0, max_delay=60).__enter__()
+        connection = http.client.HTTPConnection(
+            "127.0.0.1", server.httpd.server_address[1], timeout=5
+        )
+        bad = {
+            "measurement": "sleep",
+            "value": 60,
+            "timestamp_ns": 1,
+            "sleep_type": 2**70,
+        }
+        good = {"measurement": "heart_rate", "value": 70, "timestamp_ns": 2}
+        try:
+            statuses = []
+            for record in (bad, good):
+                connection.request("POST", "/ingest", json.dumps([record]))
+                response = connection.getresponse()
+                response.read()
+                statuses.append(response.status)
+            self.assertEqual(statuses, [400, 202])
+        finally:
+            connection.close()
+            self.assertTrue(server.close(5))
+
+        self.assertEqual((server.batcher.written, server.batcher.failed), (1, 0))
+        self.assertEqual(self.writer.query_range("heart_rate", 0, 10), [(2, 70.0)])
+
+    def test_line_protocol_overflow(self):
+        """数値変換のオーバーフローが400になるテスト"""
+        status, _ = self.request(
+            "POST", "/write", "sleep,unit=seconds value=100,sleep_type_code=inf 1"
+        )
+        self.assertEqual(status, 400)
+        # 接続は切断されずに次のリクエストを処理できる
+        self.assertEqual(self.request("GET", "/health")[0], 200)
+
+    def test_auth_checked_before_body(self):
+        """本文を読む前に認証を確認するテスト"""
+        connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.httpd.server_address[1], timeout=5
+        )
+        connection.putrequest("POST", "/ingest")
+        connection.putheader("Content-Length", str(1024 * 1024))
+        connection.putheader("Authorization", "Bearer wrong")
+        connection.endheaders()
+        response = connection.getresponse()
+
+        self.assertEqual(response.status, 401)
+        self.assertEqual(response.getheader("Connection"), "close")
+        connection.close()
+
+    def test_invalid_content_length(self):
+        """不正なContent-Lengthのテスト"""
+        for length in ("abc", "-1"):
+            with self.subTest(length=length):
+                connection = http.client.HTTPConnection(
+                    "127.0.0.1", self.server.httpd.server_address[1], timeout=5
+                )
+                connection.putrequest("POST", "/ingest")
+                connection.putheader("Content-Length", length)
+                connection.putheader("Authorization", "Bearer secret")
+                connection.endheaders()
+                self.assertEqual(connection.getresponse().status, 400)
+                connection.close()
+
+    def test_wrong_token(self):
+        """誤ったトークンが拒否されるテスト"""
+        self.assertEqual(self.request("POST", "/ingest", "[]", token="wrong")[0], 401)
+        self.assertEqual(self.request("POST", "/ingest", "[]", token="sécret")[0], 401)
+
+    def test_health_and_metrics(self):
+        """ヘルスチェックとメトリクスのテスト"""
+        status, body = self.request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["status"], "ok")
+
+        self.request("POST", "/ingest", "[]")
+        status, body = self.request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        self.assertIn(b"ingest_requests_total", body)
+
+    def test_load_test(self):
+        """負荷テストの集計のテスト"""
+        payloads = make_payloads(8, 5, "line_protocol", start_ns=SECOND_NS)
+        result = load_test(self.server.url, payloads, concurrency=2, token="secret")
+
+        self.assertEqual(result["requests"], 8)
+        self.assertEqual(result["errors"], 0)
+        self.assertTrue(self.server.close(5))
+        self.assertEqual(
+            len(self.writer.query_range("heart_rate", 0, 100 * SECOND_NS)), 40
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+シャットダウン処理と書き込みレポートのテスト
+"""
+
+import os
+import signal
+import unittest
+from unittest.mock import Mock
+
+from fitlog.lifecycle import GracefulShutdown, PartialWriteError, write_all
+from tests.helpers import make_data
+
+
+class TestGracefulShutdown(unittest.TestCase):
+    """GracefulShutdownクラスのテスト"""
+
+    def test_signal_requests_shutdown(self):
+        """SIGTERMでシャットダウンが要求されるテスト"""
+        previous = signal.getsignal(signal.SIGTERM)
+        with GracefulShutdown(timeout=5) as shutdown:
+            self.assertIsNone(shutdown.remaining())
+            os.kill(os.getpid(), signal.SIGTERM)
+
+            self.assertTrue(shutdown.requested.is_set())
+            self.assertGreater(shutdown.remaining(), 0)
+            self.assertFalse(shutdown.expired())
+
+            # 2回目のシグナルで即時終了
+            with self.assertRaises(KeyboardInterrupt):
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        self.assertIs(signal.getsignal(signal.SIGTERM), previous)
+
+    def test_deadline(self):
+        """期限切れの判定テスト"""
+        shutdown = GracefulShutdown(timeout=0)
+        self.assertFalse(shutdown.expired())
+        shutdown.request()
+        self.assertTrue(shutdown.expired())
+        self.assertEqual(shutdown.remaining(), 0)
+
+    def test_until_requested(self):
+        """シャットダウン要求後にデータ取得を止めるテスト"""
+        shutdown = GracefulShutdown(timeout=5)
+
+        def sources():
+            yield "steps", [1]
+            shutdown.request()
+            yield "weight", [2]
+            yield "sleep", [3]
+
+        self.assertEqual(
+            [data_type for data_type, _ in shutdown.until_requested(sources())],
+            ["steps", "weight"],
+        )
+
+
+class TestWriteAll(unittest.TestCase):
+    """write_all関数のテスト"""
+
+    def test_writes_all(self):
+        """全データ種別が書き込まれるテスト"""
+        writer = Mock()
+        writer.write_health_data.side_effect = len
+
+        written = write_all(
+            writer, {"steps": make_data("steps", 3), "sleep": [], "weight": [{}]}
+        )
+
+        self.assertEqual(written, {"steps": 3, "weight": 1})
+
+    def test_continues_after_failure(self):
+        """1種別の失敗後も残りを書き込むテスト"""
+        writer = Mock()
+        writer.write_health_data.side_effect = [RuntimeError("down"), 2]
+
+        with self.assertRaises(PartialWriteError) as context:
+            write_all(
+                writer,
+                {"steps": make_data("steps", 3), "weight": make_data("weight", 2)},
+            )
+
+        report = context.exception.report
+        self.assertEqual(report.written, {"weight": 2})
+        self.assertEqual(report.dropped, {"steps": 3})
+        self.assertEqual(len(report.errors), 1)
+        self.assertIn("dropped 3", str(context.exception))
+
+    def test_drops_after_deadline(self):
+        """期限切れ後は書き込まずに破棄数を数えるテスト"""
+        writer = Mock()
+        shutdown = GracefulShutdown(timeout=0)
+        shutdown.request()
+
+        with self.assertRaises(PartialWriteError) as context:
+            write_all(writer, {"steps": make_data("steps", 3)}, shutdown=shutdown)
+
+        self.assertEqual(context.exception.report.dropped, {"steps": 3})
+        writer.write_health_data.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+内部メトリクスのテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from googleapiclient.errors import HttpError
+
+from fitlog.fetch import DATA_SOURCES, GoogleFitClient
+from fitlog.influx_writer import InfluxWriter
+from fitlog.metrics import INTERNAL_MEASUREMENT, Metrics, metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Metricsクラスのテスト"""
+
+    def test_counters_and_timers(self):
+        """カウンタとタイマーのテスト"""
+        registry = Metrics()
+        registry.increment("points_total", 3, measurement="steps")
+        registry.increment("points_total", 2, measurement="steps")
+        registry.observe("write_seconds", 0.5)
+        registry.observe("write_seconds", 1.5)
+
+        self.assertEqual(registry.counter_value("points_total", measurement="steps"), 5)
+
+        timer = [e for e in registry.snapshot() if e["type"] == "timer"][0]
+        self.assertEqual(timer["fields"]["count"], 2)
+        self.assertEqual(timer["fields"]["sum"], 2.0)
+        self.assertEqual(timer["fields"]["max"], 1.5)
+
+    def test_timer_records_on_error(self):
+        """例外発生時もタイマーが記録されるテスト"""
+        registry = Metrics()
+
+        with self.assertRaises(RuntimeError):
+            with registry.timer("failing_seconds"):
+                raise RuntimeError("boom")
+
+        self.assertEqual(registry.snapshot()[0]["fields"]["count"], 1)
+
+    def test_write_prometheus(self):
+        """Prometheusテキスト出力のテスト"""
+        registry = Metrics()
+        registry.increment("fetch_requests_total", data_type="steps")
+        registry.observe("fetch_dataset_seconds", 0.25, data_type="steps")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fitlog.prom")
+            registry.write_prometheus(path)
+            with open(path) as f:
+                text = f.read()
+
+        self.assertIn("# TYPE fitlog_fetch_requests_total counter", text)
+        self.assertIn('fitlog_fetch_requests_total{data_type="steps"} 1.0', text)
+        self.assertIn('fitlog_fetch_dataset_seconds_count{data_type="steps"} 1', text)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """計測ポイントのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        metrics.reset()
+
+    @patch.dict(os.environ, {"INFLUXDB_ADMIN_TOKEN": "test_token"})
+    @patch("fitlog.influx_writer.InfluxDBClient")
+    def test_write_health_data_metrics(self, mock_client):
+        """書き込みメトリクスのテスト"""
+        writer = InfluxWriter()
+        writer.write_health_data(
+            [
+                {"measurement": "steps", "value": 1000, "timestamp": 1234567890},
+                {"measurement": "unknown", "value": 1, "timestamp": 1234567890},
+            ]
+        )
+
+        self.assertEqual(metrics.counter_value("points_written_total"), 1)
+        self.assertEqual(metrics.counter_value("points_skipped_total"), 1)
+
+    @patch.dict(os.environ, {"INFLUXDB_ADMIN_TOKEN": "test_token"})
+    @patch("fitlog.influx_writer.InfluxDBClient")
+    def test_write_internal_metrics(self, mock_client):
+        """内部メトリクス書き込みのテスト"""
+        mock_write_api = Mock()
+        mock_client.return_value.write_api.return_value = mock_write_api
+        metrics.increment("fetch_requests_total", data_type="steps")
+
+        writer = InfluxWriter()
+        written = writer.write_internal_metrics(tags={"command": "fetch"})
+
+        self.assertEqual(written, 1)
+        record = mock_write_api.write.call_args.kwargs["record"][0]
+        self.assertIn(INTERNAL_MEASUREMENT, record)
+        self.assertIn("command=fetch", record)
+
+    @patch("fitlog.fetch.time.sleep")
+    def test_fetch_dataset_retries(self, mock_sleep):
+        """一時的なAPIエラーのリトライのテスト"""
+        request = Mock(spec=["execute"])
+        request.execute.side_effect = [
+            HttpError(Mock(status=503), b"unavailable"),
+            {"point": [{"startTimeNanos": "0"}]},
+        ]
+
+        client = GoogleFitClient(max_retries=2)
+        client.service = Mock()
+        datasets = client.service.users.return_value.dataSources.return_value
+        datasets.datasets.return_value.get.return_value = request
+
+        points = client.fetch_dataset(DATA_SOURCES["steps"], 0, 1)
+
+        self.assertEqual(len(points), 1)
+        self.assertEqual(
+            metrics.counter_value("fetch_retries_total", data_type="steps"), 1
+        )
+        self.assertEqual(
+            metrics.counter_value("fetch_requests_total", data_type="steps"), 2
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+モックデータ生成と並列投入のテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fitlog.metrics import percentile
+from fitlog.mock_data import MockDataGenerator, run_parallel_ingest, split_days
+from fitlog.sqlite_writer import SQLiteWriter
+
+
+class TestSharding(unittest.TestCase):
+    """日付範囲の分割のテスト"""
+
+    def test_split_days(self):
+        """日数がシャードに均等に分割されるテスト"""
+        self.assertEqual(split_days(10, 3), [(0, 4), (4, 3), (7, 3)])
+        self.assertEqual(split_days(2, 8), [(0, 1), (1, 1)])
+
+    def test_shards_cover_same_days(self):
+        """分割生成と一括生成で同じ日時が生成されるテスト"""
+        generator = MockDataGenerator(seed=1)
+        whole = generator.generate_calories_data(6)
+        parts = generator.generate_calories_data(
+            2, start_day=0
+        ) + generator.generate_calories_data(4, start_day=2)
+
+        self.assertEqual(
+            [item["timestamp_ns"] for item in whole],
+            [item["timestamp_ns"] for item in parts],
+        )
+
+    def test_seed_fixes_weight_baseline(self):
+        """同じシードの生成器で体重の基準値が一致するテスト"""
+        self.assertEqual(
+            MockDataGenerator(seed=7).base_weight, MockDataGenerator(seed=7).base_weight
+        )
+
+    def test_percentile(self):
+        """パーセンタイル計算のテスト"""
+        values = [float(i) for i in range(1, 101)]
+
+        self.assertEqual(percentile(values, 0.5), 51.0)
+        self.assertEqual(percentile(values, 0.99), 100.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class TestParallelIngest(unittest.TestCase):
+    """複数プロセスでの投入のテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "fitlog.db")
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.tmp.cleanup()
+
+    def test_run_parallel_ingest(self):
+        """全シャードのデータが書き込まれ集計されるテスト"""
+        env = {"FITLOG_SQLITE_PATH": self.path, "FITLOG_RETENTION": "off"}
+        with patch.dict(os.environ, env):
+            summary = run_parallel_ingest(4, 2, "sqlite", batch_size=50, seed=0)
+
+        self.assertEqual(summary["workers"], 2)
+        self.assertEqual(summary["points"], summary["generated"])
+        self.assertGreater(summary["batches"], 2)
+        self.assertGreater(summary["points_per_second"], 0)
+
+        with SQLiteWriter(self.path) as writer:
+            weights = writer.query_range("weight", 0, 2**62)
+        self.assertEqual(len(weights), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
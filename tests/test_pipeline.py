@@ -0,0 +1,121 @@
+"""
+パイプライン書き込みのテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from fitlog.lifecycle import GracefulShutdown, PartialWriteError
+from fitlog.pipeline import run_pipeline
+from fitlog.sqlite_writer import SQLiteWriter
+from fitlog.validation import QUARANTINE_MEASUREMENT
+from tests.helpers import make_data
+
+
+def make_writer(write=len):
+    """prepare_records/write_prepared を持つモックライターの生成"""
+    writer = Mock()
+    writer.prepare_records.side_effect = lambda data: (list(data), [])
+    writer.write_prepared.side_effect = lambda records, quarantined: write(records)
+    return writer
+
+
+class TestPipeline(unittest.TestCase):
+    """run_pipeline関数のテスト"""
+
+    def test_writes_all_sources(self):
+        """全データ種別が書き込まれるテスト"""
+        writer = make_writer()
+
+        sources = [("steps", make_data("steps", 5)), ("weight", make_data("weight", 2))]
+        written = run_pipeline(iter(sources), writer)
+
+        self.assertEqual(written, {"steps": 5, "weight": 2})
+
+    def test_batches_large_sources(self):
+        """大きなデータがバッチに分割されるテスト"""
+        writer = make_writer()
+
+        sources = [("heart_rate", make_data("heart_rate", 25))]
+        written = run_pipeline(iter(sources), writer, queue_size=1, batch_size=10)
+
+        self.assertEqual(written, {"heart_rate": 25})
+        self.assertEqual(writer.write_prepared.call_count, 3)
+        # 検証は分割前にデータ種別ごとに一度だけ行う
+        writer.prepare_records.assert_called_once()
+
+    def test_skips_empty_sources(self):
+        """空データは書き込まないテスト"""
+        writer = make_writer()
+
+        written = run_pipeline(iter([("sleep", [])]), writer)
+
+        self.assertEqual(written, {})
+        writer.write_prepared.assert_not_called()
+
+    def test_write_error_is_raised(self):
+        """書き込みエラーが呼び出し元に伝播するテスト"""
+        writer = make_writer()
+        writer.write_prepared.side_effect = RuntimeError("write failed")
+
+        sources = [
+            ("steps", make_data("steps", 50)),
+            ("weight", make_data("weight", 50)),
+        ]
+
+        with self.assertRaises(RuntimeError):
+            run_pipeline(iter(sources), writer, queue_size=1, batch_size=5)
+
+    def test_failure_does_not_stop_other_types(self):
+        """1種別の失敗後も残りを書き込むテスト"""
+        writer = make_writer(
+            lambda batch: len(batch) if batch[0]["measurement"] == "weight" else 1 / 0
+        )
+
+        sources = [("steps", make_data("steps", 4)), ("weight", make_data("weight", 3))]
+        with self.assertRaises(PartialWriteError) as context:
+            run_pipeline(iter(sources), writer, queue_size=1, batch_size=2)
+
+        report = context.exception.report
+        self.assertEqual(report.written, {"weight": 3})
+        self.assertEqual(report.dropped, {"steps": 4})
+
+    def test_shutdown_stops_fetching(self):
+        """シャットダウン要求後は次のデータを取得しないテスト"""
+        writer = make_writer()
+        shutdown = GracefulShutdown(timeout=5)
+
+        def sources():
+            yield "steps", make_data("steps", 5)
+            shutdown.request()
+            yield "weight", make_data("weight", 2)
+            self.fail("fetched after shutdown")
+
+        written = run_pipeline(sources(), writer, shutdown=shutdown)
+
+        self.assertEqual(written, {"steps": 5, "weight": 2})
+
+    def test_validates_across_batches(self):
+        """バッチ境界をまたぐ重複もシリアル書き込みと同様に隔離されるテスト"""
+        data = [
+            {"measurement": "heart_rate", "value": 70, "timestamp_ns": ts}
+            for ts in range(4)
+        ]
+        # 別バッチに入る同時刻の異なる値
+        data.append({"measurement": "heart_rate", "value": 71, "timestamp_ns": 0})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with SQLiteWriter(os.path.join(tmp, "fitlog.db")) as writer:
+                written = run_pipeline(
+                    iter([("heart_rate", data)]), writer, batch_size=2
+                )
+                quarantined = writer.query_range(QUARANTINE_MEASUREMENT, 0, 10)
+
+        self.assertEqual(written, {"heart_rate": 4})
+        self.assertEqual(quarantined, [(0, 71.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+プロファイリング機能のテスト
+"""
+
+import os
+import tempfile
+import unittest
+
+from fitlog.profiling import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    """Profilerクラスのテスト"""
+
+    def test_disabled_profiler(self):
+        """無効時は何も記録しないテスト"""
+        profiler = Profiler(enabled=False)
+
+        with profiler.run():
+            with profiler.phase("fetch_all_data"):
+                pass
+
+        self.assertEqual(profiler.phases, {})
+
+    def test_phase_breakdown(self):
+        """フェーズ別の計測とレポート出力のテスト"""
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "profile")
+            profiler = Profiler(enabled=True, output=output)
+
+            with profiler.run():
+                for _ in range(2):
+                    with profiler.phase("write_health_data:steps"):
+                        sum(range(10000))
+
+            self.assertEqual(profiler.phases["write_health_data:steps"][0], 2)
+            self.assertIn("total", profiler.phases)
+            self.assertTrue(os.path.exists(f"{output}.txt"))
+            self.assertTrue(
+                os.path.exists(f"{output}.folded") or os.path.exists(f"{output}.prof")
+            )
+
+            with open(f"{output}.txt") as f:
+                self.assertIn("write_health_data:steps", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
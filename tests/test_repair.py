@@ -0,0 +1,166 @@
+"""
+欠損検出と再取得のテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from click.testing import CliRunner
+
+from fitlog.repair import (
+    find_gaps,
+    main,
+    refetch_gaps,
+    scan_gaps,
+    split_intervals,
+)
+from fitlog.retention import RetentionPolicy, parse_tiers
+from fitlog.sqlite_writer import SQLiteWriter
+
+HOUR_NS = 3600 * 1000000000
+DAY_NS = 24 * HOUR_NS
+
+
+class TestGapDetection(unittest.TestCase):
+    """欠損区間検出のテスト"""
+
+    def test_find_gaps_merges_adjacent_windows(self):
+        """連続する欠損ウィンドウが結合されるテスト"""
+        counts = [(0, 10), (1, 0), (2, 0), (3, 12), (4, 0)]
+
+        self.assertEqual(find_gaps(counts, 1), [(1, 3), (4, 5)])
+
+    def test_find_gaps_partial_window(self):
+        """中央値に対して少なすぎるウィンドウも欠損とするテスト"""
+        counts = [(0, 100), (1, 5), (2, 90), (3, 110)]
+
+        self.assertEqual(find_gaps(counts, 1, min_ratio=0.1), [(1, 2)])
+        self.assertEqual(find_gaps(counts, 1, min_ratio=0.01), [])
+
+    def test_split_intervals(self):
+        """長い区間の分割のテスト"""
+        self.assertEqual(
+            split_intervals([(0, 25), (30, 35)], 10),
+            [(0, 10), (10, 20), (20, 25), (30, 35)],
+        )
+
+
+class TestRepair(unittest.TestCase):
+    """ストレージを使った欠損検出と再取得のテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = SQLiteWriter(os.path.join(self.tmp.name, "fitlog.db"))
+
+        # 3日分のうち2日目の歩数データが欠損
+        self.writer.write_health_data(
+            [
+                {"measurement": "steps", "value": 100, "timestamp_ns": ts}
+                for day in (0, 2)
+                for ts in range(day * DAY_NS, (day + 1) * DAY_NS, HOUR_NS)
+            ]
+        )
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def test_scan_gaps(self):
+        """ウィンドウ集計による欠損検出のテスト"""
+        gaps = scan_gaps(self.writer, ["steps"], 0, 3 * DAY_NS)
+
+        self.assertEqual(gaps, {"steps": [(DAY_NS, 2 * DAY_NS)]})
+
+    def test_scan_gaps_skips_pruned_raw_data(self):
+        """保持期間を過ぎて削除された生データは欠損としないテスト"""
+        self.writer.write_health_data(
+            [
+                {"measurement": "heart_rate", "value": 70, "timestamp_ns": ts}
+                for ts in range(2 * DAY_NS, 3 * DAY_NS, HOUR_NS)
+            ]
+        )
+        policy = RetentionPolicy(parse_tiers("raw:1d,1h:inf"), ["heart_rate"])
+
+        gaps = scan_gaps(
+            self.writer, ["steps", "heart_rate"], 0, 3 * DAY_NS, policy=policy
+        )
+
+        # 歩数はダウンサンプリング対象外なので全期間を走査する
+        self.assertEqual(gaps, {"steps": [(DAY_NS, 2 * DAY_NS)], "heart_rate": []})
+        self.assertEqual(
+            scan_gaps(self.writer, ["heart_rate"], 0, 3 * DAY_NS)["heart_rate"],
+            [(0, 2 * DAY_NS)],
+        )
+
+    def test_refetch_gaps(self):
+        """欠損区間のみが再取得・書き込みされるテスト"""
+        fetch_steps = Mock(
+            return_value=[
+                {"measurement": "steps", "value": 50, "timestamp_ns": ts}
+                for ts in range(DAY_NS, 2 * DAY_NS, HOUR_NS)
+            ]
+        )
+        fit_client = Mock()
+        fit_client.fork.return_value.get_fetchers.return_value = {"steps": fetch_steps}
+
+        recovered = refetch_gaps(
+            fit_client, self.writer, {"steps": [(DAY_NS, 2 * DAY_NS)]}, workers=2
+        )
+
+        self.assertEqual(recovered, {"steps": 24})
+        fetch_steps.assert_called_once_with(DAY_NS, 2 * DAY_NS)
+        self.assertEqual(
+            scan_gaps(self.writer, ["steps"], 0, 3 * DAY_NS), {"steps": []}
+        )
+
+    def test_refetch_gaps_continues_after_write_error(self):
+        """書き込みに失敗した区間があっても残りを書き込むテスト"""
+        fit_client = Mock()
+        fit_client.fork.return_value.get_fetchers.return_value = {
+            "steps": lambda start, end: [
+                {"measurement": "steps", "value": 50, "timestamp_ns": start}
+            ]
+        }
+        writer = Mock()
+        writer.write_health_data.side_effect = [RuntimeError("write failed"), 1]
+
+        recovered = refetch_gaps(
+            fit_client,
+            writer,
+            {"steps": [(0, DAY_NS), (2 * DAY_NS, 3 * DAY_NS)]},
+            workers=1,
+        )
+
+        self.assertEqual(recovered, {"steps": 1})
+        self.assertEqual(writer.write_health_data.call_count, 2)
+
+    def test_main_authenticates_once_and_closes_writer(self):
+        """認証がワーカー起動前に一度だけ行われ、ライターが閉じられるテスト"""
+        writer = Mock()
+        writer.__enter__ = Mock(return_value=writer)
+        writer.__exit__ = Mock(side_effect=lambda *exc: writer.close())
+        gaps = {"steps": [(DAY_NS, 2 * DAY_NS)]}
+
+        with patch("fitlog.repair.create_writer", return_value=writer), patch(
+            "fitlog.repair.scan_gaps", return_value=gaps
+        ), patch("fitlog.repair.GoogleFitClient") as client_class, patch(
+            "fitlog.repair.refetch_gaps", return_value={"steps": 24}
+        ) as refetch:
+            fit_client = client_class.return_value
+            fit_client.authenticate.side_effect = lambda: self.assertFalse(
+                refetch.called
+            )
+            result = CliRunner().invoke(main, ["--storage", "sqlite"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        fit_client.authenticate.assert_called_once_with()
+        refetch.assert_called_once_with(fit_client, writer, gaps, 4)
+        writer.close.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+保持期間とダウンサンプリングのテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fitlog.metrics import metrics
+from fitlog.retention import RetentionPolicy, Tier, parse_tiers
+from fitlog.sqlite_writer import SQLiteWriter
+from fitlog.storage import create_writer
+
+SECOND_NS = 1000000000
+DAY_NS = 86400 * SECOND_NS
+
+
+class TestParseTiers(unittest.TestCase):
+    """保持期間設定のパースのテスト"""
+
+    def test_parse_tiers(self):
+        """設定文字列からティアへの変換のテスト"""
+        self.assertEqual(
+            parse_tiers("1h:inf,raw:7d,1m:90d"),
+            [
+                Tier("raw", 0, 7 * 86400),
+                Tier("1m", 60, 90 * 86400),
+                Tier("1h", 3600, None),
+            ],
+        )
+
+    def test_parse_tiers_errors(self):
+        """不正な設定のエラーテスト"""
+        for spec in ("1m:30d", "raw", "raw:7x"):
+            with self.assertRaises(ValueError):
+                parse_tiers(spec)
+
+    def test_from_env(self):
+        """環境変数によるポリシー設定のテスト"""
+        with patch.dict(os.environ, {"FITLOG_RETENTION": "off"}):
+            self.assertIsNone(RetentionPolicy.from_env())
+
+        # 未設定時は集計も削除も行わない
+        with patch.dict(os.environ):
+            os.environ.pop("FITLOG_RETENTION", None)
+            self.assertIsNone(RetentionPolicy.from_env())
+
+        env = {"FITLOG_RETENTION": "raw:1d,1m:inf", "FITLOG_DOWNSAMPLE": "heart_rate"}
+        with patch.dict(os.environ, env):
+            policy = RetentionPolicy.from_env()
+        self.assertEqual([t.name for t in policy.rollup_tiers], ["1m"])
+        self.assertEqual(policy.measurements, {"heart_rate"})
+
+
+class TestRetentionPolicy(unittest.TestCase):
+    """書き込み時のロールアップと削除のテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = SQLiteWriter(os.path.join(self.tmp.name, "fitlog.db"))
+        self.writer.retention = RetentionPolicy(
+            parse_tiers("raw:1d,1m:7d,1h:inf"), ["heart_rate"]
+        )
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def write_heart_rate(self, start_ns, values):
+        """1秒間隔の心拍数データを書き込み"""
+        return self.writer.write_health_data(
+            [
+                {
+                    "measurement": "heart_rate",
+                    "value": value,
+                    "timestamp_ns": start_ns + i * SECOND_NS,
+                }
+                for i, value in enumerate(values)
+            ]
+        )
+
+    def test_rollups_on_write(self):
+        """書き込み時に分・時間単位の集計が作成されるテスト"""
+        self.write_heart_rate(0, [60, 70, 80])
+        self.write_heart_rate(60 * SECOND_NS, [90])
+
+        self.assertEqual(
+            self.writer.query_range("heart_rate_1m", 0, DAY_NS, field="mean"),
+            [(0, 70.0), (60 * SECOND_NS, 90.0)],
+        )
+        self.assertEqual(
+            self.writer.query_range("heart_rate_1m", 0, DAY_NS, field="max"),
+            [(0, 80.0), (60 * SECOND_NS, 90.0)],
+        )
+        self.assertEqual(
+            self.writer.query_range("heart_rate_1h", 0, DAY_NS, field="count"),
+            [(0, 4)],
+        )
+
+    def test_rollup_windows_stay_exact(self):
+        """複数回に分けた書き込みでも集計が正確なテスト"""
+        self.write_heart_rate(0, [60, 70])
+        self.write_heart_rate(2 * SECOND_NS, [90])
+
+        self.assertEqual(
+            self.writer.query_range("heart_rate_1m", 0, DAY_NS, field="mean"),
+            [(0, 220 / 3)],
+        )
+
+    def test_other_measurements_not_rolled_up(self):
+        """対象外の測定値は集計されないテスト"""
+        self.writer.write_health_data(
+            [{"measurement": "steps", "value": 100, "timestamp_ns": 0}]
+        )
+
+        self.assertEqual(self.writer.query_range("steps_1m", 0, DAY_NS), [])
+
+    def test_prune(self):
+        """保持期間を過ぎたデータが削除されるテスト"""
+        self.write_heart_rate(0, [60])
+        self.write_heart_rate(9 * DAY_NS, [70])
+
+        self.writer.retention.prune(self.writer, now_ns=10 * DAY_NS)
+
+        self.assertEqual(
+            self.writer.query_range("heart_rate", 0, 10 * DAY_NS),
+            [(9 * DAY_NS, 70.0)],
+        )
+        self.assertEqual(
+            len(self.writer.query_range("heart_rate_1m", 0, 10 * DAY_NS, "mean")), 1
+        )
+        self.assertEqual(
+            len(self.writer.query_range("heart_rate_1h", 0, 10 * DAY_NS, "mean")), 2
+        )
+
+    def test_prune_backfills_rollups(self):
+        """集計のない過去データは削除前に集計されるテスト"""
+        policy = self.writer.retention
+        # ダウンサンプリング導入前に書き込まれたデータ
+        self.writer.retention = None
+        self.write_heart_rate(0, [60, 80])
+        self.write_heart_rate(DAY_NS + 1800 * SECOND_NS, [70])
+        self.writer.retention = policy
+
+        # 生データの保持期限(1日)はDAY_NS + 30分だが、1時間境界まで残す
+        policy.prune(self.writer, now_ns=2 * DAY_NS + 1800 * SECOND_NS)
+
+        self.assertEqual(
+            self.writer.query_range("heart_rate", 0, 3 * DAY_NS),
+            [(DAY_NS + 1800 * SECOND_NS, 70.0)],
+        )
+        self.assertEqual(
+            self.writer.query_range("heart_rate_1h", 0, 3 * DAY_NS, field="mean"),
+            [(0, 70.0)],
+        )
+        self.assertEqual(
+            self.writer.query_range("heart_rate_1m", 0, 3 * DAY_NS, field="count"),
+            [(0, 2)],
+        )
+
+    def test_prune_keeps_raw_when_backfill_fails(self):
+        """集計の書き込みに失敗した場合は生データを削除しないテスト"""
+        self.write_heart_rate(0, [60])
+
+        with patch.object(
+            self.writer, "write_records", side_effect=RuntimeError("write failed")
+        ):
+            with self.assertRaises(RuntimeError):
+                self.writer.retention.prune(self.writer, now_ns=10 * DAY_NS)
+
+        self.assertEqual(self.writer.query_range("heart_rate", 0, DAY_NS), [(0, 60.0)])
+
+    def test_rollup_error_keeps_written_count(self):
+        """集計の失敗で書き込み済みの生データを失敗扱いにしないテスト"""
+        errors = metrics.counter_value("rollup_errors_total")
+
+        with patch.object(
+            self.writer, "aggregate_windows", side_effect=RuntimeError("query failed")
+        ):
+            written = self.write_heart_rate(0, [60])
+
+        self.assertEqual(written, 1)
+        self.assertEqual(self.writer.query_range("heart_rate", 0, DAY_NS), [(0, 60.0)])
+        self.assertEqual(metrics.counter_value("rollup_errors_total"), errors + 1)
+
+    def test_create_writer_sets_policy(self):
+        """create_writerで保持ポリシーが設定されるテスト"""
+        env = {
+            "FITLOG_SQLITE_PATH": os.path.join(self.tmp.name, "env.db"),
+            "FITLOG_RETENTION": "raw:30d,1m:365d",
+        }
+        with patch.dict(os.environ, env):
+            with create_writer("sqlite") as writer:
+                self.assertEqual(len(writer.retention.tiers), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+ローカルスナップショットのテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from fitlog.snapshot import (
+    SnapshotStore,
+    diff_series,
+    main,
+    read_series,
+    summarize,
+)
+
+SECOND_NS = 1000000000
+DAY_NS = 86400 * SECOND_NS
+NOW_NS = 100 * DAY_NS
+
+
+def heart_rate(offsets, value=70):
+    """テスト用の心拍数データを作成"""
+    return [
+        {
+            "measurement": "heart_rate",
+            "value": value,
+            "timestamp_ns": NOW_NS - offset * SECOND_NS,
+        }
+        for offset in offsets
+    ]
+
+
+class TestSnapshotStore(unittest.TestCase):
+    """SnapshotStoreのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SnapshotStore(self.tmp.name, days=1)
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.tmp.cleanup()
+
+    def test_update_and_load(self):
+        """書き込みと読み込みのテスト"""
+        data = heart_rate([30, 10, 20]) + [
+            {"measurement": "steps", "value": 12, "timestamp_ns": NOW_NS},
+            {"measurement": "steps", "value": None, "timestamp_ns": NOW_NS},
+            {"measurement": "unknown", "value": 1, "timestamp_ns": NOW_NS},
+        ]
+        self.assertEqual(self.store.update(data, now_ns=NOW_NS), 4)
+
+        series = self.store.load("heart_rate")
+        self.assertIsInstance(series.times, memoryview)
+        self.assertEqual(
+            list(series.times),
+            [NOW_NS - 30 * SECOND_NS, NOW_NS - 20 * SECOND_NS, NOW_NS - 10 * SECOND_NS],
+        )
+        self.assertEqual(list(series.values), [70.0, 70.0, 70.0])
+        self.assertEqual(self.store.measurements(), ["heart_rate", "steps"])
+        self.assertIsNone(self.store.load("weight"))
+
+    def test_incremental_merge(self):
+        """増分更新と古いデータの削除のテスト"""
+        self.store.update(heart_rate([2 * 86400, 20, 10]), now_ns=NOW_NS)
+        self.assertEqual(len(self.store.load("heart_rate").times), 2)
+
+        # 次回の実行: 重複は新しい値で置き換え
+        store = SnapshotStore(self.tmp.name, days=1)
+        store.update(heart_rate([10, 0], value=80), now_ns=NOW_NS)
+
+        series = store.load("heart_rate")
+        self.assertEqual(list(series.values), [70.0, 80.0, 80.0])
+        self.assertEqual(
+            diff_series(store.load("heart_rate", previous=True), series),
+            {"previous": 2, "current": 3, "added": 1, "removed": 0, "changed": 1},
+        )
+
+    def test_rotate_once_per_run(self):
+        """1回の実行で前回分が上書きされないかのテスト"""
+        self.store.update(heart_rate([30]), now_ns=NOW_NS)
+        store = SnapshotStore(self.tmp.name, days=1)
+        store.update(heart_rate([20]), now_ns=NOW_NS)
+        store.update(heart_rate([10]), now_ns=NOW_NS)
+
+        self.assertEqual(len(store.load("heart_rate", previous=True).times), 1)
+        self.assertEqual(len(store.load("heart_rate").times), 3)
+
+    def test_summarize(self):
+        """集計のテスト"""
+        self.store.update(heart_rate([20]) + heart_rate([10], value=90), now_ns=NOW_NS)
+        stats = summarize(self.store.load("heart_rate"))
+
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["first_ns"], NOW_NS - 20 * SECOND_NS)
+        self.assertEqual((stats["min"], stats["mean"], stats["max"]), (70, 80, 90))
+
+    def test_invalid_file(self):
+        """空・途中で切れた・不正なファイルは存在しないものとして扱うテスト"""
+        self.store.update(heart_rate([10, 20]), now_ns=NOW_NS)
+        with open(self.store.path("heart_rate"), "rb") as f:
+            valid = f.read()
+
+        for content in (b"", valid[:10], valid[:-8], b"x" * 16):
+            with self.subTest(size=len(content)):
+                path = os.path.join(self.tmp.name, "bad.snap")
+                with open(path, "wb") as f:
+                    f.write(content)
+                self.assertIsNone(read_series(path))
+
+    def test_rebuilds_unreadable_file(self):
+        """読めないファイルは次の更新で作り直されるテスト"""
+        os.makedirs(self.tmp.name, exist_ok=True)
+        with open(self.store.path("heart_rate"), "wb"):
+            pass
+
+        self.assertEqual(self.store.update(heart_rate([10]), now_ns=NOW_NS), 1)
+        self.assertEqual(list(self.store.load("heart_rate").values), [70.0])
+
+    def test_update_failure_is_not_raised(self):
+        """スナップショットの失敗で取り込みを止めないテスト"""
+        store = SnapshotStore(os.path.join(self.tmp.name, "file"), days=1)
+        with open(store.directory, "w"):
+            pass
+
+        self.assertEqual(store.update(heart_rate([10]), now_ns=NOW_NS), 0)
+        batches = [("heart_rate", heart_rate([10]))]
+        self.assertEqual(list(store.tap(iter(batches))), batches)
+
+    def test_from_env(self):
+        """環境変数による設定のテスト"""
+        with patch.dict(os.environ, {"FITLOG_SNAPSHOT_DAYS": "0"}):
+            self.assertIsNone(SnapshotStore.from_env())
+
+        env = {"FITLOG_SNAPSHOT_DAYS": "3", "FITLOG_SNAPSHOT_DIR": self.tmp.name}
+        with patch.dict(os.environ, env):
+            store = SnapshotStore.from_env()
+        self.assertEqual((store.directory, store.days), (self.tmp.name, 3))
+
+    def test_cli(self):
+        """summary / diff コマンドのテスト"""
+        self.store.update(heart_rate([20]), now_ns=NOW_NS)
+        SnapshotStore(self.tmp.name, days=1).update(heart_rate([10]), now_ns=NOW_NS)
+
+        runner = CliRunner()
+        result = runner.invoke(main, ["--dir", self.tmp.name, "summary"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("heart_rate", result.output)
+
+        result = runner.invoke(main, ["--dir", self.tmp.name, "diff"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            result.output.splitlines()[1].split()[1:], ["1", "2", "1", "0", "0"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
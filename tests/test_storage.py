@@ -0,0 +1,104 @@
+"""
+ストレージバックエンドのテスト
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fitlog.sqlite_writer import SQLiteWriter
+from fitlog.storage import build_records, create_writer
+
+
+class TestBuildRecords(unittest.TestCase):
+    """build_records関数のテスト"""
+
+    def test_build_records(self):
+        """測定種別ごとのレコード変換のテスト"""
+        records, skipped = build_records(
+            [
+                {"measurement": "steps", "value": 100.0, "timestamp": 1234567890},
+                {
+                    "measurement": "sleep",
+                    "value": 3600,
+                    "timestamp_ns": 1234567890000000001,
+                    "sleep_type": 5,
+                },
+                {"measurement": "unknown", "value": 1, "timestamp": 1234567890},
+            ]
+        )
+
+        self.assertEqual(skipped, 1)
+        self.assertEqual(records[0].fields, {"value": 100})
+        self.assertEqual(records[0].time_ns, 1234567890000000000)
+        self.assertEqual(records[1].tags["sleep_type"], "deep_sleep")
+        self.assertEqual(records[1].fields["duration_hours"], 1.0)
+
+    def test_create_writer_unknown_backend(self):
+        """未知のバックエンド指定のエラーテスト"""
+        with self.assertRaises(ValueError):
+            create_writer("unknown")
+
+
+class TestSQLiteWriter(unittest.TestCase):
+    """SQLiteWriterクラスのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "fitlog.db")
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.tmp.cleanup()
+
+    def test_create_writer_from_env(self):
+        """環境変数によるバックエンド選択のテスト"""
+        env = {"FITLOG_STORAGE": "sqlite", "FITLOG_SQLITE_PATH": self.path}
+        with patch.dict(os.environ, env):
+            with create_writer() as writer:
+                self.assertIsInstance(writer, SQLiteWriter)
+                self.assertTrue(writer.test_connection())
+
+    def test_write_and_query(self):
+        """書き込みと時間範囲クエリのテスト"""
+        with SQLiteWriter(self.path) as writer:
+            written = writer.write_health_data(
+                [
+                    {
+                        "measurement": "heart_rate",
+                        "value": 60 + i,
+                        "timestamp_ns": 1700000000000000000 + i * 500000000,
+                    }
+                    for i in range(10)
+                ]
+            )
+
+            rows = writer.query_range(
+                "heart_rate", 1700000001000000000, 1700000002000000000
+            )
+            latest = writer.get_latest_data("heart_rate", 3)
+
+        self.assertEqual(written, 10)
+        self.assertEqual(
+            rows, [(1700000001000000000, 62.0), (1700000001500000000, 63.0)]
+        )
+        self.assertEqual([item["value"] for item in latest], [69.0, 68.0, 67.0])
+
+    def test_overwrite_same_timestamp(self):
+        """同一時刻のデータが上書きされるテスト"""
+        with SQLiteWriter(self.path) as writer:
+            for value in [1000, 2000]:
+                writer.write_health_data(
+                    [{"measurement": "steps", "value": value, "timestamp": 1234567890}]
+                )
+
+            latest = writer.get_latest_data("steps")
+
+        self.assertEqual(len(latest), 1)
+        self.assertEqual(latest[0]["value"], 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+タイムスタンプ変換のテスト
+"""
+
+import unittest
+from datetime import date, datetime
+
+import pytz
+
+from fitlog.fetch import GoogleFitClient
+from fitlog.timeutil import (
+    LocalDayCache,
+    datetime_to_ns,
+    ns_to_seconds,
+    seconds_to_ns,
+)
+
+
+class TestTimeutil(unittest.TestCase):
+    """タイムスタンプ変換関数のテスト"""
+
+    def test_conversions(self):
+        """秒とナノ秒の変換のテスト"""
+        self.assertEqual(seconds_to_ns(1234567890), 1234567890000000000)
+        self.assertEqual(seconds_to_ns(1.5), 1500000000)
+        self.assertEqual(ns_to_seconds(1234567890999999999), 1234567890)
+
+    def test_datetime_to_ns(self):
+        """datetimeからナノ秒への変換で精度が落ちないテスト"""
+        dt = datetime(2024, 1, 1, 23, 59, 59, 999999, tzinfo=pytz.utc)
+
+        self.assertEqual(datetime_to_ns(dt), 1704153599999999000)
+
+    def test_local_day_cache_matches_pytz(self):
+        """キャッシュ変換がpytzのlocalizeと一致するテスト"""
+        timezone = pytz.timezone("America/New_York")
+        cache = LocalDayCache(timezone)
+
+        # 通常日とDST切替日（2024-03-10, 2024-11-03）
+        for day in [date(2024, 6, 1), date(2024, 3, 10), date(2024, 11, 3)]:
+            for hour in [0, 1, 3, 12, 23]:
+                expected = timezone.localize(
+                    datetime(day.year, day.month, day.day, hour, 30)
+                )
+                self.assertEqual(
+                    cache.local_seconds(day, hour, 30),
+                    int(expected.timestamp()),
+                    f"{day} {hour}:30",
+                )
+
+
+class TestNanosecondParsing(unittest.TestCase):
+    """取得データのナノ秒精度のテスト"""
+
+    def test_heart_rate_keeps_subsecond_precision(self):
+        """同一秒内の心拍数サンプルが区別されるテスト"""
+        client = GoogleFitClient()
+        client.fetch_dataset = lambda source, start, end: [
+            {"startTimeNanos": "1700000000100000000", "value": [{"fpVal": 70.0}]},
+            {"startTimeNanos": "1700000000600000000", "value": [{"fpVal": 72.0}]},
+            {"startTimeNanos": "1700000001000000000", "value": []},
+        ]
+
+        data = client.fetch_heart_rate(0, 1)
+
+        self.assertEqual(
+            [item["timestamp_ns"] for item in data],
+            [1700000000100000000, 1700000000600000000],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
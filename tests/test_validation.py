@@ -0,0 +1,163 @@
+"""
+データ検証のテスト
+"""
+
+import os
+import tempfile
+import unittest
+
+from fitlog.influx_writer import InfluxWriter
+from fitlog.metrics import metrics
+from fitlog.sqlite_writer import SQLiteWriter
+from fitlog.storage import Record, build_records
+from fitlog.validation import QUARANTINE_MEASUREMENT, validate_records
+
+SECOND_NS = 1000000000
+DAY_NS = 86400 * SECOND_NS
+
+
+def heart_rate(time_ns, value):
+    """心拍数レコードを作成"""
+    return Record("heart_rate", time_ns, {"unit": "bpm"}, {"value": float(value)})
+
+
+class TestValidateRecords(unittest.TestCase):
+    """validate_records関数のテスト"""
+
+    def test_clean_batch(self):
+        """正常なバッチがすべて通過するテスト"""
+        records = [heart_rate(i * 60 * SECOND_NS, 70 + i % 5) for i in range(100)]
+
+        valid, rejected = validate_records(records)
+
+        self.assertEqual(len(valid), 100)
+        self.assertEqual(rejected, [])
+
+    def test_range_check(self):
+        """範囲外の値が隔離されるテスト"""
+        records = [
+            heart_rate(0, 70),
+            heart_rate(60 * SECOND_NS, 0),
+            heart_rate(120 * SECOND_NS, float("nan")),
+            Record("weight", 0, {"unit": "kg"}, {"value": 500.0}),
+            Record(
+                "sleep",
+                0,
+                {"unit": "seconds", "sleep_type": "light_sleep"},
+                {"value": -60.0},
+            ),
+        ]
+
+        valid, rejected = validate_records(records)
+
+        self.assertEqual(valid, [records[0]])
+        self.assertEqual(
+            [(r.tags["measurement"], r.tags["reason"]) for r in rejected],
+            [
+                ("heart_rate", "out_of_range"),
+                ("heart_rate", "out_of_range"),
+                ("weight", "out_of_range"),
+                ("sleep", "out_of_range"),
+            ],
+        )
+        self.assertTrue(all(r.measurement == QUARANTINE_MEASUREMENT for r in rejected))
+
+    def test_rate_of_change(self):
+        """急激な変化が検出され、時系列順で判定されるテスト"""
+        records = [
+            heart_rate(2 * SECOND_NS, 72),
+            heart_rate(0, 70),
+            heart_rate(1 * SECOND_NS, 180),
+            heart_rate(60 * SECOND_NS, 180),
+        ]
+
+        valid, rejected = validate_records(records)
+
+        self.assertEqual([r.time_ns for r in valid], [0, 2 * SECOND_NS, 60 * SECOND_NS])
+        self.assertEqual(rejected[0].time_ns, SECOND_NS)
+        self.assertEqual(rejected[0].tags["reason"], "rate_of_change")
+
+    def test_duplicate_timestamps(self):
+        """重複タイムスタンプの処理のテスト"""
+        records = [heart_rate(0, 70), heart_rate(0, 70), heart_rate(0, 90)]
+        sleep = [
+            Record("sleep", 0, {"unit": "seconds", "sleep_type": t}, {"value": 60.0})
+            for t in ("light_sleep", "deep_sleep")
+        ]
+
+        valid, rejected = validate_records(records + sleep)
+
+        # 同一の値は重複排除、異なる値は隔離、睡眠種別が異なれば別の点
+        self.assertEqual(len(valid), 3)
+        self.assertEqual([r.tags["reason"] for r in rejected], ["duplicate_timestamp"])
+
+    def test_zero_timestamp_is_kept(self):
+        """タイムスタンプ0のデータがスキップされないテスト"""
+        records, skipped = build_records(
+            [{"measurement": "steps", "value": 0, "timestamp_ns": 0}]
+        )
+
+        self.assertEqual(skipped, 0)
+        self.assertEqual(records[0].time_ns, 0)
+
+
+class TestQuarantine(unittest.TestCase):
+    """隔離データの書き込みのテスト"""
+
+    def setUp(self):
+        """テストの前処理"""
+        metrics.reset()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = SQLiteWriter(os.path.join(self.tmp.name, "fitlog.db"))
+
+    def tearDown(self):
+        """テストの後処理"""
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def test_write_health_data_quarantines_rejects(self):
+        """不正値が隔離用measurementに書き込まれるテスト"""
+        written = self.writer.write_health_data(
+            [
+                {"measurement": "weight", "value": 65.0, "timestamp_ns": DAY_NS},
+                {"measurement": "weight", "value": 500.0, "timestamp_ns": 2 * DAY_NS},
+            ]
+        )
+
+        self.assertEqual(written, 1)
+        self.assertEqual(
+            self.writer.query_range("weight", 0, 3 * DAY_NS), [(DAY_NS, 65.0)]
+        )
+        self.assertEqual(
+            self.writer.query_range(QUARANTINE_MEASUREMENT, 0, 3 * DAY_NS),
+            [(2 * DAY_NS, 500.0)],
+        )
+        self.assertEqual(
+            metrics.counter_value(
+                "points_rejected_total", measurement="weight", reason="out_of_range"
+            ),
+            1,
+        )
+
+    def test_quarantined_fields_are_float(self):
+        """隔離されたレコードの整数フィールドが浮動小数点になるテスト"""
+        records, _ = build_records(
+            [
+                {"measurement": "steps", "value": 500000, "timestamp_ns": DAY_NS},
+                {"measurement": "weight", "value": 500, "timestamp_ns": DAY_NS},
+            ]
+        )
+
+        _, rejected = validate_records(records)
+
+        self.assertEqual(
+            [(r.tags["measurement"], r.fields["value"]) for r in rejected],
+            [("steps", 500000.0), ("weight", 500.0)],
+        )
+        self.assertTrue(all(type(r.fields["value"]) is float for r in rejected))
+        lines = [InfluxWriter.record_to_line(r) for r in rejected]
+        self.assertFalse(any("i " in line for line in lines), lines)
+
+
+if __name__ == "__main__":
+    unittest.main()